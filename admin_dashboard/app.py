@@ -4,17 +4,22 @@ Admin Dashboard - FastAPI Application
 from fastapi import FastAPI, Request, Depends, HTTPException, status
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 import secrets
 from loguru import logger
 from pathlib import Path
 import json
+from datetime import datetime
+from typing import Optional
 
 from config.settings import settings
 from database.connection import init_db
 from database.models.user import User
 from database.models.notification import Notification
+from utils.telegram_client import telegram_client
+from utils.broadcast import BroadcastManager
+from beanie.operators import In
 
 
 app = FastAPI(title="Educational Platform - Admin Dashboard")
@@ -50,6 +55,7 @@ async def startup_event():
     print("Starting Admin Dashboard...", flush=True)
     try:
         await init_db()
+        await BroadcastManager.resume_pending_jobs()
         logger.info("Admin Dashboard ready!")
         print("Admin Dashboard ready!", flush=True)
     except Exception as e:
@@ -59,6 +65,13 @@ async def startup_event():
         raise
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release shared resources on shutdown"""
+    await BroadcastManager.shutdown()
+    await telegram_client.close()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def dashboard(request: Request, username: str = Depends(verify_admin)):
     """Main dashboard"""
@@ -74,9 +87,7 @@ async def dashboard(request: Request, username: str = Depends(verify_admin)):
         
         # Get pending approvals - handle potential errors
         try:
-            pending_approvals = await User.find(
-                User.courses.approval_status == "pending"
-            ).count()
+            pending_approvals = await User.find(User.pending_filter()).count()
         except Exception as e:
             error_msg = f"Error fetching pending approvals: {repr(e)}"
             logger.error(error_msg, exc_info=True)
@@ -107,16 +118,30 @@ async def dashboard(request: Request, username: str = Depends(verify_admin)):
 
 
 @app.get("/students", response_class=HTMLResponse)
-async def students_list(request: Request, username: str = Depends(verify_admin)):
-    """Students list"""
+async def students_list(
+    request: Request,
+    q: Optional[str] = None,
+    after: Optional[str] = None,
+    username: str = Depends(verify_admin)
+):
+    """Students list (newest first, keyset-paginated, searchable)"""
     try:
-        students = await User.find().sort(-User.registered_at).to_list()
+        try:
+            students, next_cursor = await User.find_page(after=after, search=q, limit=settings.ADMIN_PAGE_SIZE)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
         
         return templates.TemplateResponse("students.html", {
             "request": request,
             "students": students,
+            "total_students": await User.find().count() if not q else None,
+            "q": q,
+            "after": after,
+            "next_cursor": next_cursor,
             "username": username
         })
+    except HTTPException:
+        raise
     except Exception as e:
         error_msg = f"Students list error: {repr(e)}"
         logger.error(error_msg, exc_info=True)
@@ -226,8 +251,6 @@ async def approve_course(telegram_id: int, course_id: str, username: str = Depen
             await notification.insert()
             
             # Send telegram message directly
-            from config.settings import settings
-            import httpx
             try:
                 from config.courses_config import get_course
                 course = get_course(course_id)
@@ -257,15 +280,7 @@ async def approve_course(telegram_id: int, course_id: str, username: str = Depen
 شكراً لثقتك! 🙏
                 """
                 
-                async with httpx.AsyncClient() as client:
-                    await client.post(
-                        f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage",
-                        json={
-                            "chat_id": telegram_id,
-                            "text": text,
-                            "parse_mode": "Markdown"
-                        }
-                    )
+                await telegram_client.send_message(telegram_id, text)
                 logger.info(f"Notification sent to {telegram_id}")
             except Exception as e:
                 logger.error(f"Failed to send telegram notification: {e}")
@@ -333,8 +348,6 @@ async def approve_material(telegram_id: int, material_id: str, username: str = D
             await notification.insert()
             
             # Send telegram message directly
-            from config.settings import settings
-            import httpx
             try:
                 from config.materials_config import get_material
                 material = get_material(material_id)
@@ -364,15 +377,7 @@ async def approve_material(telegram_id: int, material_id: str, username: str = D
 شكراً لثقتك! 🙏
                 """
                 
-                async with httpx.AsyncClient() as client:
-                    await client.post(
-                        f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage",
-                        json={
-                            "chat_id": telegram_id,
-                            "text": text,
-                            "parse_mode": "Markdown"
-                        }
-                    )
+                await telegram_client.send_message(telegram_id, text)
                 logger.info(f"Notification sent to {telegram_id}")
             except Exception as e:
                 logger.error(f"Failed to send telegram notification: {e}")
@@ -412,57 +417,81 @@ async def reject_material(telegram_id: int, material_id: str, username: str = De
     raise HTTPException(status_code=404, detail="Enrollment not found")
 
 
+def _pending_enrollments(array: str, id_field: str, kind: str) -> dict:
+    """Aggregation expression: pending enrollments of `array`, tagged with their type"""
+    return {
+        "$map": {
+            "input": {
+                "$filter": {
+                    "input": {"$ifNull": [f"${array}", []]},
+                    "cond": {"$eq": ["$$this.approval_status", "pending"]},
+                }
+            },
+            "in": {"$mergeObjects": ["$$this", {"type": kind, "item_id": f"$$this.{id_field}"}]},
+        }
+    }
+
+
 @app.get("/pending-approvals", response_class=HTMLResponse)
-async def pending_approvals(request: Request, username: str = Depends(verify_admin)):
-    """Show pending approvals"""
-    from config.settings import settings
-    users = await User.find().to_list()
+async def pending_approvals(request: Request, page: int = 1, username: str = Depends(verify_admin)):
+    """Show pending approvals (oldest first, paginated)"""
+    from config.courses_config import get_course
+    from config.materials_config import get_material
+    
+    page = max(page, 1)
+    page_size = settings.ADMIN_PAGE_SIZE
+    
+    # Only users in the partial pending_queue index are scanned
+    result = await User.find(User.pending_filter()).aggregate([
+        {"$project": {
+            "telegram_id": 1,
+            "full_name": 1,
+            "email": 1,
+            "phone": 1,
+            "pending": {"$concatArrays": [
+                _pending_enrollments("courses", "course_id", "course"),
+                _pending_enrollments("materials", "material_id", "material"),
+            ]},
+        }},
+        {"$unwind": "$pending"},
+        {"$sort": {"pending.enrolled_at": 1, "_id": 1}},
+        {"$facet": {
+            "items": [{"$skip": (page - 1) * page_size}, {"$limit": page_size}],
+            "total": [{"$count": "count"}],
+        }},
+    ]).to_list()
+    
+    items = result[0]["items"] if result else []
+    total = result[0]["total"][0]["count"] if result and result[0]["total"] else 0
     
     pending_enrollments = []
-    for user in users:
-        # Check course enrollments
-        for enrollment in user.courses:
-            if enrollment.approval_status == "pending":
-                from config.courses_config import get_course
-                course = get_course(enrollment.course_id)
-                
-                # Create enrollment object with all needed data
-                enrollment_data = {
-                    "user": user,
-                    "course_id": enrollment.course_id,
-                    "course_name": course["name"] if course else enrollment.course_id,
-                    "enrolled_at": enrollment.enrolled_at,
-                    "payment_method": enrollment.payment_method,
-                    "payment_proof_file_id": enrollment.payment_proof_file_id,
-                    "status": enrollment.approval_status,
-                    "bot_token": settings.TELEGRAM_BOT_TOKEN,
-                    "type": "course"
-                }
-                pending_enrollments.append(enrollment_data)
+    for doc in items:
+        enrollment = doc.pop("pending")
+        if enrollment["type"] == "course":
+            course = get_course(enrollment["item_id"])
+            name = course["name"] if course else enrollment["item_id"]
+        else:
+            material = get_material(enrollment["item_id"])
+            name = f"{material['name']} - السنة {enrollment.get('year')} - الفصل {enrollment.get('semester')}" if material else enrollment["item_id"]
         
-        # Check material enrollments (جديد)
-        for enrollment in user.materials:
-            if enrollment.approval_status == "pending":
-                from config.materials_config import get_material
-                material = get_material(enrollment.material_id)
-                
-                # Create enrollment object with all needed data
-                enrollment_data = {
-                    "user": user,
-                    "course_id": enrollment.material_id,
-                    "course_name": f"{material['name']} - السنة {enrollment.year} - الفصل {enrollment.semester}" if material else enrollment.material_id,
-                    "enrolled_at": enrollment.enrolled_at,
-                    "payment_method": enrollment.payment_method,
-                    "payment_proof_file_id": enrollment.payment_proof_file_id,
-                    "status": enrollment.approval_status,
-                    "bot_token": settings.TELEGRAM_BOT_TOKEN,
-                    "type": "material"
-                }
-                pending_enrollments.append(enrollment_data)
+        pending_enrollments.append({
+            "user": doc,
+            "course_id": enrollment["item_id"],
+            "course_name": name,
+            "enrolled_at": enrollment.get("enrolled_at"),
+            "payment_method": enrollment.get("payment_method"),
+            "payment_proof_file_id": enrollment.get("payment_proof_file_id"),
+            "status": enrollment["approval_status"],
+            "bot_token": settings.TELEGRAM_BOT_TOKEN,
+            "type": enrollment["type"]
+        })
     
     return templates.TemplateResponse("pending_approvals.html", {
         "request": request,
         "pending_enrollments": pending_enrollments,
+        "total_pending": total,
+        "page": page,
+        "total_pages": max((total + page_size - 1) // page_size, 1),
         "username": username
     })
 
@@ -480,6 +509,25 @@ async def courses_list(request: Request, username: str = Depends(verify_admin)):
     })
 
 
+@app.get("/courses/{course_id}/report-pack")
+async def course_report_pack(course_id: str, username: str = Depends(verify_admin)):
+    """Download the ZIP of all approved students' PDF reports of a course"""
+    from config.courses_config import get_course
+    from utils.report_jobs import report_jobs
+    
+    if not get_course(course_id):
+        raise HTTPException(status_code=404, detail="Course not found")
+    
+    artifact = await report_jobs.get("course_pack", {"course_id": course_id})
+    if artifact and not Path(artifact.path).exists():
+        # Only the Telegram copy is cached on this instance
+        artifact = await report_jobs.get("course_pack", {"course_id": course_id}, force=True)
+    if not artifact:
+        raise HTTPException(status_code=404, detail="No approved students to export")
+    
+    return FileResponse(artifact.path, media_type="application/zip", filename=artifact.filename)
+
+
 @app.get("/materials", response_class=HTMLResponse)
 async def materials_list(request: Request, username: str = Depends(verify_admin)):
     """Materials management"""
@@ -503,14 +551,26 @@ async def materials_list(request: Request, username: str = Depends(verify_admin)
 @app.get("/assignments", response_class=HTMLResponse)
 async def assignments_list(request: Request, username: str = Depends(verify_admin)):
     """Assignments management"""
-    from database.models.assignment import Assignment
+    from database.models.assignment import Assignment, AssignmentSubmission
     
     assignments = await Assignment.find().sort(-Assignment.created_at).to_list()
     
+    # Submission counts for all assignments in a single grouped query
+    counts = {}
+    async for row in AssignmentSubmission.find().aggregate([
+        {"$group": {
+            "_id": "$assignment_id",
+            "total": {"$sum": 1},
+            "graded": {"$sum": {"$cond": [{"$eq": ["$status", "graded"]}, 1, 0]}}
+        }}
+    ]):
+        counts[row["_id"]] = row
+    
     # Calculate statistics for each assignment
     for assignment in assignments:
-        assignment.total_submissions = len(assignment.submissions)
-        assignment.graded_submissions = len([s for s in assignment.submissions if s.status == "graded"])
+        row = counts.get(assignment.id, {})
+        assignment.total_submissions = row.get("total", 0)
+        assignment.graded_submissions = row.get("graded", 0)
         assignment.pending_submissions = assignment.total_submissions - assignment.graded_submissions
     
     return templates.TemplateResponse("assignments.html", {
@@ -561,71 +621,71 @@ async def send_notification(
         if not message:
             return {"success": False, "error": "الرسالة مطلوبة"}
         
-        # Import telegram bot configuration
-        from telegram import Bot
-        from config.settings import settings
-        
-        bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
+        notification_type = data.get('type') or 'admin'
         notification_text = f"🔔 **{title}**\n\n{message}"
         
-        sent_count = 0
-        
         if recipients == 'specific' and student_id:
             # Send to specific student
             try:
-                await bot.send_message(
-                    chat_id=student_id,
-                    text=notification_text
+                response = await telegram_client.send_message(
+                    int(student_id), notification_text, parse_mode=None
                 )
+                if response.status_code != 200:
+                    raise Exception(response.text)
                 
                 # Save to database
                 notification = Notification(
                     user_id=student_id,
                     title=title,
                     message=message,
-                    type="admin",
-                    read=False
+                    notification_type=notification_type,
+                    sent=True,
+                    sent_at=datetime.utcnow()
                 )
                 await notification.insert()
-                sent_count = 1
             except Exception as e:
                 logger.error(f"Failed to send to {student_id}: {e}")
                 return {"success": False, "error": f"فشل الإرسال: {str(e)}"}
-                
-        elif recipients == 'all':
-            # Send to all registered users
-            users = await User.find_all().to_list()
             
-            for user in users:
-                try:
-                    await bot.send_message(
-                        chat_id=user.telegram_id,
-                        text=notification_text
-                    )
-                    
-                    # Save to database
-                    notification = Notification(
-                        user_id=user.telegram_id,
-                        title=title,
-                        message=message,
-                        type="admin",
-                        read=False
-                    )
-                    await notification.insert()
-                    sent_count += 1
-                except Exception as e:
-                    logger.error(f"Failed to send to {user.telegram_id}: {e}")
-                    
-        return {
-            "success": True, 
-            "message": f"تم إرسال الإشعار إلى {sent_count} طالب"
-        }
+            return {
+                "success": True,
+                "message": "تم إرسال الإشعار إلى 1 طالب"
+            }
+        
+        elif recipients == 'all':
+            # Broadcast in the background; progress at /api/broadcasts/{job_id}
+            job = await BroadcastManager.create_job(
+                title=title,
+                message=message,
+                text=notification_text,
+                created_by=username,
+                notification_type=notification_type
+            )
+            return {
+                "success": True,
+                "job_id": str(job.id),
+                "message": f"بدأ إرسال الإشعار إلى {job.total} طالب في الخلفية"
+            }
+        
+        return {"success": False, "error": "المستلمون غير صالحين"}
         
     except Exception as e:
         logger.error(f"Error sending notification: {e}")
         return {"success": False, "error": str(e)}
 
 
+@app.get("/api/broadcasts/{job_id}")
+async def broadcast_progress(job_id: str, username: str = Depends(verify_admin)):
+    """Progress of a background broadcast"""
+    try:
+        progress = await BroadcastManager.get_progress(job_id)
+    except Exception:
+        progress = None
+    if not progress:
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+    return progress
+
+
 @app.get("/videos", response_class=HTMLResponse)
 async def videos_list(request: Request, username: str = Depends(verify_admin)):
     """Videos management"""
@@ -671,10 +731,15 @@ async def assignment_submissions(
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
     
-    # Get user details for each submission
+    # Get user details for each submission (one query for all users)
+    submissions = await assignment.get_submissions()
+    telegram_ids = [int(s.user_id) for s in submissions]
+    users = await User.find(In(User.telegram_id, telegram_ids)).to_list() if telegram_ids else []
+    users_by_id = {u.telegram_id: u for u in users}
+    
     submissions_with_users = []
-    for submission in assignment.submissions:
-        user = await User.find_one(User.telegram_id == int(submission.user_id))
+    for submission in submissions:
+        user = users_by_id.get(int(submission.user_id))
         if user:
             submissions_with_users.append({
                 "submission": submission,
@@ -730,16 +795,7 @@ async def grade_submission(request: Request, username: str = Depends(verify_admi
             if feedback:
                 notification_text += f"\n\n💬 **ملاحظات المدرس:**\n{feedback}"
             
-            import httpx
-            async with httpx.AsyncClient() as client:
-                await client.post(
-                    f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage",
-                    json={
-                        "chat_id": int(user_id),
-                        "text": notification_text,
-                        "parse_mode": "Markdown"
-                    }
-                )
+            await telegram_client.send_message(int(user_id), notification_text)
             
             # Create notification record
             notification = Notification(
@@ -766,19 +822,24 @@ async def student_grades(
     username: str = Depends(verify_admin)
 ):
     """View student's grades"""
-    from database.models.assignment import Assignment
+    from database.models.assignment import Assignment, AssignmentSubmission
     
     student = await User.find_one(User.telegram_id == telegram_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
-    # Get all assignments with this student's submissions
-    all_assignments = await Assignment.find().to_list()
+    # Get this student's submissions and the assignments they belong to
+    submissions = await AssignmentSubmission.find(
+        AssignmentSubmission.user_id == str(telegram_id)
+    ).to_list()
+    assignment_ids = [s.assignment_id for s in submissions]
+    assignments = await Assignment.find(In(Assignment.id, assignment_ids)).to_list() if assignment_ids else []
+    assignments_by_id = {a.id: a for a in assignments}
     student_grades = []
     
-    for assignment in all_assignments:
-        submission = assignment.get_submission(str(telegram_id))
-        if submission:
+    for submission in submissions:
+        assignment = assignments_by_id.get(submission.assignment_id)
+        if assignment:
             student_grades.append({
                 "assignment": assignment,
                 "submission": submission
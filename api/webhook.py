@@ -1,10 +1,12 @@
-from typing import Any, Dict
-
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from loguru import logger
-from telegram import Update
 
-from server import telegram_app, BOT_WEBHOOK_URL
+from config.settings import settings
+from server import telegram_app, BOT_WEBHOOK_URL, process_update_data
+from utils.update_queue import update_queue
+from utils.json_store import close_stores
+from utils.webhook_guard import SECRET_TOKEN_HEADER, update_deduplicator, verify_secret_token
 
 
 app = FastAPI()
@@ -18,23 +20,32 @@ async def on_startup() -> None:
 
     webhook_url = BOT_WEBHOOK_URL
     if webhook_url:
-        await telegram_app.bot.set_webhook(url=webhook_url)
+        await telegram_app.bot.set_webhook(url=webhook_url, secret_token=settings.WEBHOOK_SECRET_TOKEN)
         logger.info(f"Webhook set to {webhook_url}")
     else:
         logger.warning("BOT_WEBHOOK_URL is not set; skipping set_webhook")
 
+    if settings.WEBHOOK_ASYNC_INGESTION:
+        await update_queue.start(process_update_data)
+
 
 @app.on_event("shutdown")
 async def on_shutdown() -> None:
     """Shutdown the shared Telegram application."""
+    await update_queue.stop()
+    await close_stores()
     await telegram_app.stop()
     await telegram_app.shutdown()
 
 
 @app.post("/")
 @app.post("/api/webhook")
-async def telegram_webhook(request: Request) -> Dict[str, Any]:
+async def telegram_webhook(request: Request):
     """Telegram webhook endpoint (POST-only)."""
+    if not verify_secret_token(request.headers.get(SECRET_TOKEN_HEADER)):
+        logger.warning("[WEBHOOK] Request rejected: bad secret token")
+        return JSONResponse({"ok": False, "error": "forbidden"}, status_code=403)
+
     # Ensure database is initialized (critical for Vercel cold starts)
     try:
         from database.connection import Database
@@ -50,12 +61,31 @@ async def telegram_webhook(request: Request) -> Dict[str, Any]:
         # Continue anyway - handlers will catch the error
     
     data = await request.json()
-    logger.debug(f"Webhook received raw JSON: {data}")
-    update = Update.de_json(data, telegram_app.bot)
+    if not isinstance(data, dict) or not isinstance(data.get("update_id"), int):
+        return JSONResponse({"ok": False, "error": "invalid update"}, status_code=400)
+
+    update_id = data["update_id"]
+    if not await update_deduplicator.claim(update_id):
+        logger.debug(f"Duplicate update {update_id} ignored")
+        return {"ok": True}
+
+    # The queue runs when WEBHOOK_ASYNC_INGESTION is on (never on Vercel,
+    # where work after the response may be frozen) and the startup hook
+    # started it; otherwise the update is processed inside the request
+    if update_queue.running:
+        if not await update_queue.enqueue(data):
+            await update_deduplicator.release(update_id)
+            return JSONResponse({"ok": False, "error": "busy"}, status_code=503)
+        logger.debug("Webhook update queued")
+        return {"ok": True}
+
     try:
-        logger.debug(f"Webhook Update.to_dict: {update.to_dict() if isinstance(update, Update) else update}")
+        await process_update_data(data)
     except Exception as e:
-        logger.error(f"Failed to serialize Update in webhook debug logging: {e}")
-    await telegram_app.process_update(update)
+        # Let Telegram redeliver it; the retry must not be dropped as a duplicate
+        await update_deduplicator.release(update_id)
+        logger.error(f"[WEBHOOK] Processing update {update_id} failed: {repr(e)}", exc_info=True)
+        print(f"[WEBHOOK] ERROR: Processing update {update_id} failed: {repr(e)}", flush=True)
+        return JSONResponse({"ok": False, "error": "processing failed"}, status_code=500)
     logger.debug("Webhook update processed successfully")
     return {"ok": True}
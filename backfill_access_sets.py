@@ -0,0 +1,81 @@
+"""
+Backfill Access Sets Script
+سكريبت تعبئة قوائم الوصول المعتمدة
+
+Fills users.approved_course_ids / approved_material_ids and pending_since
+from the embedded enrollments with one server-side update. Users keep them
+in sync on every save afterwards. Safe to run more than once.
+"""
+import asyncio
+
+from loguru import logger
+
+from database.connection import init_db, close_db
+from database.models.user import User
+
+
+def _approved_ids(array: str, id_field: str) -> dict:
+    """Aggregation expression: ids of approved enrollments in `array`"""
+    return {
+        "$map": {
+            "input": {
+                "$filter": {
+                    "input": {"$ifNull": [f"${array}", []]},
+                    "cond": {"$eq": ["$$this.approval_status", "approved"]},
+                }
+            },
+            "in": f"$$this.{id_field}",
+        }
+    }
+
+
+def _pending_since() -> dict:
+    """Aggregation expression: oldest enrolled_at of pending enrollments (null if none)"""
+    return {
+        "$min": {
+            "$map": {
+                "input": {
+                    "$filter": {
+                        "input": {"$concatArrays": [
+                            {"$ifNull": ["$courses", []]},
+                            {"$ifNull": ["$materials", []]},
+                        ]},
+                        "cond": {"$eq": ["$$this.approval_status", "pending"]},
+                    }
+                },
+                "in": "$$this.enrolled_at",
+            }
+        }
+    }
+
+
+async def backfill_access_sets():
+    """Recompute the access sets of every user"""
+    print("\n" + "="*60)
+    print("🔑 تعبئة قوائم الدورات والمواد المعتمدة")
+    print("="*60)
+
+    await init_db()
+
+    try:
+        result = await User.find_all().update([
+            {"$set": {
+                "approved_course_ids": _approved_ids("courses", "course_id"),
+                "approved_material_ids": _approved_ids("materials", "material_id"),
+                "pending_since": _pending_since(),
+            }}
+        ])
+        modified = getattr(result, "modified_count", 0)
+        logger.info(f"Access sets backfilled for {modified} users")
+        print(f"✅ تم تحديث {modified} مستخدم")
+
+    except Exception as e:
+        logger.error(f"Error backfilling access sets: {e}")
+        print(f"❌ خطأ: {e}")
+
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(backfill_access_sets())
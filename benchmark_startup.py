@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+"""
+Startup Benchmark
+قياس زمن بدء التشغيل
+
+Measures, each in a fresh interpreter and as the median of several runs:
+  - import time of server (total, per project module, per package)
+  - handler registration time of create_application()
+  - Database.connect() / init_beanie time
+  - latency of the first update (/start) through the bot
+
+Telegram is replaced by an offline stand-in that answers every Bot API
+call. MongoDB is the configured MONGODB_URL (a local mongod, using a
+separate *_benchmark database) or, with --mock-db, mongomock-motor
+(not in requirements.txt: pip install mongomock-motor).
+
+    python benchmark_startup.py --save-baseline   # record startup_baseline.json
+    python benchmark_startup.py                   # compare, exit 1 on regression
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from profile_startup import package_times, profile_imports
+
+
+BASELINE_PATH = Path("startup_baseline.json")
+
+# Import times of these modules are checked against the baseline
+PROJECT_MODULES = ["bot.main", "database.connection", "admin_dashboard.app", "config.settings"]
+
+# Measured by the database steps (absent with --skip-db)
+DB_METRICS = {"db_connect_ms", "first_update_ms"}
+
+# A metric regresses when it exceeds baseline * (1 + threshold) + slack
+DEFAULT_THRESHOLD = 0.25
+SLACK_MS = 20.0
+
+
+# ----------------------------------------------------------------------
+# Child steps (run in a fresh interpreter, print one JSON line)
+# ----------------------------------------------------------------------
+
+def _fake_request():
+    """Bot API transport that answers every call without the network"""
+    from telegram.request import BaseRequest
+
+    class OfflineRequest(BaseRequest):
+        @property
+        def read_timeout(self) -> Optional[float]:
+            return None
+
+        async def initialize(self):
+            pass
+
+        async def shutdown(self):
+            pass
+
+        async def do_request(self, url, method, request_data=None, **kwargs):
+            api_method = url.rsplit("/", 1)[-1]
+            if api_method == "getMe":
+                result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+            elif api_method.startswith(("send", "edit")):
+                chat_id = (request_data.parameters if request_data else {}).get("chat_id", 1)
+                result = {"message_id": 1, "date": int(time.time()), "chat": {"id": chat_id, "type": "private"}}
+            else:
+                result = True
+            return 200, json.dumps({"ok": True, "result": result}).encode()
+
+    return OfflineRequest()
+
+
+async def _connect_db(mock_db: bool) -> float:
+    from database.connection import DOCUMENT_MODELS, Database
+
+    start = time.perf_counter()
+    if mock_db:
+        from beanie import init_beanie
+        from mongomock_motor import AsyncMongoMockClient
+        Database.client = AsyncMongoMockClient()
+        await init_beanie(database=Database.client["benchmark"], document_models=DOCUMENT_MODELS)
+        Database.beanie_initialized = True
+    else:
+        await Database.connect()
+    return (time.perf_counter() - start) * 1000
+
+
+def _start_update(bot) -> "Update":
+    from telegram import Update
+    now = int(time.time())
+    user = {"id": 424242, "is_bot": False, "first_name": "Benchmark"}
+    return Update.de_json({
+        "update_id": 1,
+        "message": {
+            "message_id": 1,
+            "date": now,
+            "chat": {"id": 424242, "type": "private"},
+            "from": user,
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    }, bot)
+
+
+async def _child(step: str, mock_db: bool) -> Dict[str, float]:
+    from loguru import logger
+    logger.remove()
+
+    if step == "app":
+        import bot.main
+        start = time.perf_counter()
+        bot.main.create_application()
+        return {"create_application_ms": (time.perf_counter() - start) * 1000}
+
+    if step == "db":
+        return {"db_connect_ms": await _connect_db(mock_db)}
+
+    if step == "first_update":
+        from bot.main import create_application
+        await _connect_db(mock_db)
+        application = create_application(request=_fake_request())
+        await application.initialize()
+        try:
+            update = _start_update(application.bot)
+            start = time.perf_counter()
+            await application.update_processor.process_update(update, application.process_update(update))
+            return {"first_update_ms": (time.perf_counter() - start) * 1000}
+        finally:
+            await application.shutdown()
+
+    raise SystemExit(f"unknown step {step}")
+
+
+# ----------------------------------------------------------------------
+# Parent
+# ----------------------------------------------------------------------
+
+def _run_child(step: str, mock_db: bool) -> Dict[str, float]:
+    env = dict(os.environ)
+    env["MONGODB_DB_NAME"] = (env.get("MONGODB_DB_NAME") or "educational_platform") + "_benchmark"
+    args = [sys.executable, __file__, "--child", step] + (["--mock-db"] if mock_db else [])
+    result = subprocess.run(args, capture_output=True, text=True, env=env, timeout=180)
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        raise RuntimeError(f"{step} failed:\n{result.stderr[-1500:]}")
+    return json.loads(lines[-1])
+
+
+def _median_runs(func, runs: int) -> Dict[str, float]:
+    samples: Dict[str, List[float]] = {}
+    for _ in range(runs):
+        for key, value in func().items():
+            samples.setdefault(key, []).append(value)
+    return {key: round(statistics.median(values), 1) for key, values in samples.items()}
+
+
+def _import_metrics() -> Dict[str, float]:
+    rows = profile_imports("server")
+    cumulative = {name: cum for name, _, cum in rows}
+    metrics = {"import_server_ms": cumulative.get("server", 0) / 1000}
+    for module in PROJECT_MODULES:
+        if module in cumulative:
+            metrics[f"import_{module}_ms"] = cumulative[module] / 1000
+    return metrics
+
+
+def collect(runs: int, mock_db: bool, skip_db: bool) -> Dict[str, float]:
+    print(f"⏱️  قياس الاستيراد ({runs} مرات)...")
+    metrics = _median_runs(_import_metrics, runs)
+
+    print("⏱️  قياس تسجيل المعالجات...")
+    metrics.update(_median_runs(lambda: _run_child("app", mock_db), runs))
+
+    if skip_db:
+        print("⚠️  تم تخطي قياسات قاعدة البيانات")
+        return metrics
+    try:
+        print("⏱️  قياس تهيئة قاعدة البيانات...")
+        metrics.update(_median_runs(lambda: _run_child("db", mock_db), runs))
+        print("⏱️  قياس زمن أول تحديث...")
+        metrics.update(_median_runs(lambda: _run_child("first_update", mock_db), runs))
+    except RuntimeError as e:
+        print(f"⚠️  تعذر قياس قاعدة البيانات: {e}")
+    return metrics
+
+
+def compare(metrics: Dict[str, float], baseline: Dict[str, float], threshold: float, skip_db: bool = False) -> bool:
+    """False on a regression, or when a baseline metric was not measured (e.g. the DB step failed)"""
+    ok = True
+    print(f"\n{'metric':<40}{'baseline':>12}{'current':>12}")
+    for key, base in baseline.items():
+        if key in metrics or (skip_db and key in DB_METRICS):
+            continue
+        ok = False
+        print(f"{key:<40}{base:>12.1f}{'-':>12}  ❌ not measured")
+    for key, value in metrics.items():
+        base = baseline.get(key)
+        if base is None:
+            print(f"{key:<40}{'-':>12}{value:>12.1f}")
+            continue
+        limit = base * (1 + threshold) + SLACK_MS
+        regressed = value > limit
+        ok = ok and not regressed
+        print(f"{key:<40}{base:>12.1f}{value:>12.1f}  {'❌ regression' if regressed else '✅'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup-time benchmark")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--mock-db", action="store_true", help="use mongomock-motor instead of MONGODB_URL")
+    parser.add_argument("--skip-db", action="store_true", help="only measure imports and handler registration")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_child(args.child, args.mock_db))))
+        return
+
+    if args.mock_db and importlib.util.find_spec("mongomock_motor") is None:
+        print("❌ --mock-db يحتاج mongomock-motor: pip install mongomock-motor")
+        sys.exit(2)
+
+    print("\n" + "="*60)
+    print("🚀 قياس زمن بدء التشغيل")
+    print("="*60)
+    metrics = collect(args.runs, args.mock_db, args.skip_db)
+
+    packages = sorted(package_times(profile_imports("server")).items(), key=lambda item: -item[1])
+    print("\n📦 زمن الاستيراد حسب الحزمة:")
+    for name, package_us in packages[:10]:
+        print(f"  {package_us / 1000:9.1f} ms  {name}")
+
+    if args.save_baseline:
+        BASELINE_PATH.write_text(json.dumps(metrics, indent=2))
+        print(f"\n✅ تم حفظ خط الأساس في {BASELINE_PATH}")
+        for key, value in metrics.items():
+            print(f"  {key:<40}{value:>10.1f}")
+        return
+
+    if not BASELINE_PATH.exists():
+        print(f"\n⚠️  لا يوجد خط أساس، شغّل: python {Path(__file__).name} --save-baseline")
+        for key, value in metrics.items():
+            print(f"  {key:<40}{value:>10.1f}")
+        return
+
+    baseline = json.loads(BASELINE_PATH.read_text())
+    if compare(metrics, baseline, args.threshold, args.skip_db):
+        print("\n✅ لا يوجد تراجع في زمن بدء التشغيل")
+    else:
+        print("\n❌ تراجع في زمن بدء التشغيل")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Lazy Handler Registry - import heavy handler modules on first use
+سجل المعالجات الكسول - تحميل وحدات المعالجات الثقيلة عند أول استخدام
+"""
+import importlib
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from loguru import logger
+
+
+class LazyHandlerRegistry:
+    """
+    Hands out stand-in callbacks for handler functions whose module is only
+    imported when one of its callbacks first runs (i.e. when its pattern
+    first matches). The module-level import cost (openpyxl, reportlab...)
+    moves from cold start to the first use of the feature.
+    """
+
+    def __init__(self):
+        self._callbacks: Dict[str, Callable[..., Awaitable[Any]]] = {}
+        self.import_ms: Dict[str, float] = {}
+
+    def _resolve(self, module_path: str, name: str) -> Callable[..., Awaitable[Any]]:
+        key = f"{module_path}.{name}"
+        callback = self._callbacks.get(key)
+        if callback is None:
+            start = time.perf_counter()
+            module = importlib.import_module(module_path)
+            if module_path not in self.import_ms:
+                self.import_ms[module_path] = round((time.perf_counter() - start) * 1000, 1)
+                logger.info(f"Lazy handlers: imported {module_path} in {self.import_ms[module_path]} ms")
+            callback = self._callbacks[key] = getattr(module, name)
+        return callback
+
+    def callback(self, module_path: str, name: str) -> Callable[..., Awaitable[Any]]:
+        """Async callback that imports `module_path` and calls `name` from it"""
+        async def lazy_callback(*args, **kwargs):
+            return await self._resolve(module_path, name)(*args, **kwargs)
+
+        lazy_callback.__name__ = name
+        lazy_callback.__qualname__ = f"lazy:{module_path}.{name}"
+        return lazy_callback
+
+    def stats(self) -> Dict[str, Any]:
+        return {"loaded_modules": dict(self.import_ms)}
+
+
+# Shared instance
+lazy_handlers = LazyHandlerRegistry()
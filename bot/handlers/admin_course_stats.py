@@ -5,10 +5,10 @@ Admin Course Statistics and Management
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from loguru import logger
-from pathlib import Path
-import json
 
 from config.settings import settings
+from utils.content_catalog import content_catalog
+from utils.json_store import submissions_store
 
 
 async def show_course_statistics(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -20,55 +20,15 @@ async def show_course_statistics(update: Update, context: ContextTypes.DEFAULT_T
         return
     
     try:
-        # Load all data
-        courses_path = Path('data/courses.json')
-        videos_path = Path('data/videos.json')
-        assignments_path = Path('data/assignments.json')
-        exams_path = Path('data/exams.json')
-        submissions_path = Path('data/submissions.json')
+        # Content comes from the shared catalog; submissions change constantly
+        courses = content_catalog.all('courses')
+        videos = content_catalog.all('videos')
+        assignments = content_catalog.all('assignments')
+        exams = content_catalog.all('exams')
         
-        courses = []
-        videos = []
-        assignments = []
-        exams = []
         submissions = []
-        
-        try:
-            if courses_path.exists():
-                with open(courses_path, 'r', encoding='utf-8') as f:
-                    courses = json.load(f)
-        except Exception as e:
-            logger.error(f"Error loading courses.json: {repr(e)}")
-            print(f"ERROR: Error loading courses.json: {repr(e)}", flush=True)
-        
-        try:
-            if videos_path.exists():
-                with open(videos_path, 'r', encoding='utf-8') as f:
-                    videos = json.load(f)
-        except Exception as e:
-            logger.error(f"Error loading videos.json: {repr(e)}")
-            print(f"ERROR: Error loading videos.json: {repr(e)}", flush=True)
-        
-        try:
-            if assignments_path.exists():
-                with open(assignments_path, 'r', encoding='utf-8') as f:
-                    assignments = json.load(f)
-        except Exception as e:
-            logger.error(f"Error loading assignments.json: {repr(e)}")
-            print(f"ERROR: Error loading assignments.json: {repr(e)}", flush=True)
-        
         try:
-            if exams_path.exists():
-                with open(exams_path, 'r', encoding='utf-8') as f:
-                    exams = json.load(f)
-        except Exception as e:
-            logger.error(f"Error loading exams.json: {repr(e)}")
-            print(f"ERROR: Error loading exams.json: {repr(e)}", flush=True)
-        
-        try:
-            if submissions_path.exists():
-                with open(submissions_path, 'r', encoding='utf-8') as f:
-                    submissions = json.load(f)
+            submissions = await submissions_store.all()
         except Exception as e:
             logger.error(f"Error loading submissions.json: {repr(e)}")
             print(f"ERROR: Error loading submissions.json: {repr(e)}", flush=True)
@@ -97,9 +57,9 @@ async def show_course_statistics(update: Update, context: ContextTypes.DEFAULT_T
             course_title = course.get('title', 'دورة بدون عنوان')
             
             # Count items for this course
-            course_videos = [v for v in videos if v.get('item_id') == course_id]
-            course_assignments = [a for a in assignments if a.get('item_id') == course_id]
-            course_exams = [e for e in exams if e.get('course_id') == course_id]
+            course_videos = content_catalog.for_course('videos', course_id)
+            course_assignments = content_catalog.for_course('assignments', course_id)
+            course_exams = content_catalog.exams(course_id)
             course_submissions = [s for s in submissions if s.get('course_id') == course_id]
             
             text += f"📚 **{course_title}**\n"
@@ -139,49 +99,19 @@ async def show_detailed_course_stats(update: Update, context: ContextTypes.DEFAU
     
     course_id = query.data.replace("course_stats_", "")
     
-    # Load all data
-    courses_path = Path('data/courses.json')
-    videos_path = Path('data/videos.json')
-    assignments_path = Path('data/assignments.json')
-    exams_path = Path('data/exams.json')
-    submissions_path = Path('data/submissions.json')
-    
-    courses = []
-    videos = []
-    assignments = []
-    exams = []
-    submissions = []
-    
-    if courses_path.exists():
-        with open(courses_path, 'r', encoding='utf-8') as f:
-            courses = json.load(f)
-    
-    if videos_path.exists():
-        with open(videos_path, 'r', encoding='utf-8') as f:
-            videos = json.load(f)
-    
-    if assignments_path.exists():
-        with open(assignments_path, 'r', encoding='utf-8') as f:
-            assignments = json.load(f)
-    
-    if exams_path.exists():
-        with open(exams_path, 'r', encoding='utf-8') as f:
-            exams = json.load(f)
-    
-    if submissions_path.exists():
-        with open(submissions_path, 'r', encoding='utf-8') as f:
-            submissions = json.load(f)
+    # Load submissions (content comes from the shared catalog)
+    submissions = await submissions_store.all()
     
     # Find course
-    course = next((c for c in courses if c.get('id') == course_id), None)
+    course = content_catalog.get_course(course_id)
     if not course:
         await query.edit_message_text("❌ الدورة غير موجودة!")
         return
     
     # Get items for this course
-    course_videos = [v for v in videos if v.get('item_id') == course_id]
-    course_assignments = [a for a in assignments if a.get('item_id') == course_id]
-    course_exams = [e for e in exams if e.get('course_id') == course_id]
+    course_videos = content_catalog.for_course('videos', course_id)
+    course_assignments = content_catalog.for_course('assignments', course_id)
+    course_exams = content_catalog.exams(course_id)
     course_submissions = [s for s in submissions if s.get('course_id') == course_id]
     
     text = f"📚 **{course.get('title')}**\n\n"
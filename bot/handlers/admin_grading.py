@@ -6,11 +6,13 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from loguru import logger
 from datetime import datetime
-from pathlib import Path
-import json
 
 from database.models.user import User
+from database.models.grade_summary import StudentGradeSummary
 from config.settings import settings
+from utils.content_catalog import content_catalog
+from utils.json_store import submissions_store
+from utils.achievements import EVENT_GRADE, record_achievement_event
 
 # Conversation states
 SELECTING_ASSIGNMENT, SELECTING_STUDENT, ENTERING_GRADE, ENTERING_FEEDBACK = range(4)
@@ -25,17 +27,14 @@ async def start_grading_menu(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return ConversationHandler.END
     
     # Load submissions
-    submissions_file = Path('data/submissions.json')
-    if not submissions_file.exists():
+    submissions = await submissions_store.all()
+    if not submissions:
         await update.message.reply_text(
             "❌ لا توجد تسليمات بعد!\n\n"
             "انتظر حتى يسلم الطلاب واجباتهم."
         )
         return ConversationHandler.END
     
-    with open(submissions_file, 'r', encoding='utf-8') as f:
-        submissions = json.load(f)
-    
     # Get pending submissions (not graded yet)
     pending = [s for s in submissions if s.get('status') == 'pending']
     
@@ -102,17 +101,12 @@ async def select_assignment_for_grading(update: Update, context: ContextTypes.DE
     assignment_index = int(parts[-1])
     course_id = '_'.join(parts[:-1])
     
-    # Load assignments
-    assignments_file = Path('data/assignments.json')
-    with open(assignments_file, 'r', encoding='utf-8') as f:
-        assignments = json.load(f)
-    
     # Get assignment from assignments by matching index position
     max_grade = 100  # Default
     assignment_title = 'الواجب'
     
-    # Filter assignments for this course
-    course_assignments = [a for a in assignments if a.get('item_id') == course_id]
+    # Assignments for this course
+    course_assignments = content_catalog.for_course('assignments', course_id)
     
     if assignment_index < len(course_assignments):
         assignment = course_assignments[assignment_index]
@@ -125,18 +119,12 @@ async def select_assignment_for_grading(update: Update, context: ContextTypes.DE
     context.user_data['grading_course_id'] = course_id
     context.user_data['grading_max_grade'] = max_grade
     
-    # Load submissions
-    submissions_file = Path('data/submissions.json')
-    with open(submissions_file, 'r', encoding='utf-8') as f:
-        submissions = json.load(f)
-    
-    # Filter pending submissions for this assignment
-    pending = [
-        s for s in submissions 
-        if s.get('course_id') == course_id 
-        and s.get('assignment_index') == assignment_index
-        and s.get('status') == 'pending'
-    ]
+    # Pending submissions for this assignment
+    pending = await submissions_store.find(
+        course_id=course_id,
+        assignment_index=assignment_index,
+        status='pending'
+    )
     
     if not pending:
         await query.edit_message_text("❌ لا توجد تسليمات بانتظار التقييم لهذا الواجب.")
@@ -191,20 +179,10 @@ async def select_student_for_grading(update: Update, context: ContextTypes.DEFAU
     context.user_data['grading_student_name'] = user.full_name
     
     # Load submission
-    submissions_file = Path('data/submissions.json')
-    with open(submissions_file, 'r', encoding='utf-8') as f:
-        submissions = json.load(f)
-    
     course_id = context.user_data['grading_course_id']
     assignment_index = context.user_data['grading_assignment_index']
     
-    submission = None
-    for s in submissions:
-        if (s.get('student_id') == student_id and
-            s.get('course_id') == course_id and
-            s.get('assignment_index') == assignment_index):
-            submission = s
-            break
+    submission = await submissions_store.get(student_id, course_id, assignment_index)
     
     if not submission:
         await query.edit_message_text("❌ التسليم غير موجود!")
@@ -319,32 +297,31 @@ async def enter_feedback_and_save(update: Update, context: ContextTypes.DEFAULT_
     grade = context.user_data.get('grading_grade')
     max_grade = context.user_data.get('grading_max_grade', 100)
     
-    # Load submissions
-    submissions_file = Path('data/submissions.json')
-    with open(submissions_file, 'r', encoding='utf-8') as f:
-        submissions = json.load(f)
-    
     # Find and update submission
-    submission = None
-    for s in submissions:
-        if (s.get('student_id') == student_id and
-            s.get('course_id') == course_id and
-            s.get('assignment_index') == assignment_index):
-            submission = s
-            s['status'] = 'graded'
-            s['grade'] = grade
-            s['feedback'] = feedback
-            s['graded_at'] = datetime.now().isoformat()
-            break
+    previous, submission = await submissions_store.update(
+        (student_id, course_id, assignment_index),
+        {
+            'status': 'graded',
+            'grade': grade,
+            'max_grade': max_grade,
+            'feedback': feedback,
+            'graded_at': datetime.now().isoformat()
+        },
+        return_previous=True
+    )
     
     if not submission:
         await update.message.reply_text("❌ حدث خطأ! التسليم غير موجود.")
         context.user_data.clear()
         return ConversationHandler.END
     
-    # Save submissions
-    with open(submissions_file, 'w', encoding='utf-8') as f:
-        json.dump(submissions, f, ensure_ascii=False, indent=2)
+    await StudentGradeSummary.apply_grade_change(
+        student_id, previous.get('grade'), grade, max_grade, previous.get('max_grade')
+    )
+    await record_achievement_event(
+        student_id, EVENT_GRADE, grade=grade, previous_grade=previous.get('grade'),
+        max_grade=max_grade, previous_max_grade=previous.get('max_grade')
+    )
     
     # Determine pass/fail (50% of max grade)
     passing_grade = max_grade / 2
@@ -6,11 +6,13 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from loguru import logger
 from datetime import datetime
-from pathlib import Path
-import json
 
-from database.models.user import User
+from utils.user_cache import user_cache
+from database.models.grade_summary import StudentGradeSummary
 from config.settings import settings
+from utils.content_catalog import content_catalog
+from utils.json_store import submissions_store
+from utils.achievements import EVENT_GRADE, EVENT_SUBMISSION, record_achievement_event
 import httpx
 
 
@@ -18,6 +20,15 @@ import httpx
 WAITING_FOR_FILE = 1
 
 
+def _submitted_on_time(assignment: dict, submitted_at: datetime) -> bool:
+    """Submitted before the assignment's deadline (False without a valid deadline)"""
+    try:
+        deadline = datetime.fromisoformat(assignment['deadline'])
+    except (KeyError, TypeError, ValueError):
+        return False
+    return submitted_at <= deadline
+
+
 async def start_assignment_submission(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """بدء عملية تسليم واجب"""
     query = update.callback_query
@@ -33,15 +44,11 @@ async def start_assignment_submission(update: Update, context: ContextTypes.DEFA
     context.user_data['submitting_course_id'] = course_id
     
     # Load assignment
-    assignments_file = Path('data/assignments.json')
-    if not assignments_file.exists():
+    assignments = content_catalog.assignments(course_id)
+    if not assignments:
         await query.message.reply_text("❌ الواجبات غير موجودة")
         return
     
-    with open(assignments_file, 'r', encoding='utf-8') as f:
-        all_assignments = json.load(f)
-        assignments = [a for a in all_assignments if a.get('type') == 'courses' and a.get('item_id') == course_id]
-    
     if assignment_index >= len(assignments):
         await query.message.reply_text("❌ الواجب غير موجود")
         return
@@ -80,7 +87,7 @@ async def receive_submission_file(update: Update, context: ContextTypes.DEFAULT_
         return  # Silently ignore files not part of submission process
     
     # Get user
-    user = await User.find_one(User.telegram_id == update.effective_user.id)
+    user = await user_cache.get(update.effective_user.id)
     if not user:
         await update.message.reply_text("❌ يرجى التسجيل أولاً")
         return
@@ -109,27 +116,16 @@ async def receive_submission_file(update: Update, context: ContextTypes.DEFAULT_
         )
         return
     
-    # Load assignments
-    assignments_file = Path('data/assignments.json')
-    with open(assignments_file, 'r', encoding='utf-8') as f:
-        all_assignments = json.load(f)
-    
     # Find assignment
-    assignments = [a for a in all_assignments if a.get('type') == 'courses' and a.get('item_id') == course_id]
+    assignments = content_catalog.assignments(course_id)
     if assignment_index >= len(assignments):
         await update.message.reply_text("❌ الواجب غير موجود")
         return
     
     assignment = assignments[assignment_index]
     
-    # Load submissions
-    submissions_file = Path('data/submissions.json')
-    submissions = []
-    if submissions_file.exists():
-        with open(submissions_file, 'r', encoding='utf-8') as f:
-            submissions = json.load(f)
-    
     # Create submission
+    submitted_at = datetime.now()
     submission = {
         'student_id': str(update.effective_user.id),
         'student_name': user.full_name,
@@ -139,26 +135,34 @@ async def receive_submission_file(update: Update, context: ContextTypes.DEFAULT_
         'file_id': file_id,
         'file_type': file_type,
         'file_name': file_name,
-        'submitted_at': datetime.now().isoformat(),
+        'submitted_at': submitted_at.isoformat(),
         'status': 'pending',  # pending, graded
         'grade': None,
         'feedback': None,
         'graded_at': None
     }
     
-    # Remove old submission if exists
-    submissions = [s for s in submissions if not (
-        s.get('student_id') == str(update.effective_user.id) and
-        s.get('course_id') == course_id and
-        s.get('assignment_index') == assignment_index
-    )]
-    
-    # Add new submission
-    submissions.append(submission)
+    # Save submission (replaces the old one if it exists)
+    previous, _ = await submissions_store.put(submission, move_to_end=True, return_previous=True)
     
-    # Save submissions
-    with open(submissions_file, 'w', encoding='utf-8') as f:
-        json.dump(submissions, f, ensure_ascii=False, indent=2)
+    # A resubmission clears the previous grade
+    if previous and previous.get('grade') is not None:
+        await StudentGradeSummary.apply_grade_change(
+            submission['student_id'], previous['grade'], None,
+            previous.get('max_grade') or assignment.get('max_grade', 100)
+        )
+        await record_achievement_event(
+            submission['student_id'], EVENT_GRADE, grade=None, previous_grade=previous['grade'],
+            max_grade=previous.get('max_grade') or assignment.get('max_grade', 100)
+        )
+    elif not previous:
+        await record_achievement_event(
+            submission['student_id'], EVENT_SUBMISSION,
+            on_time=_submitted_on_time(assignment, submitted_at),
+            first_submitter=len(await submissions_store.find(
+                course_id=course_id, assignment_index=assignment_index
+            )) == 1
+        )
     
     # Confirmation message
     text = f"""
@@ -250,37 +254,28 @@ async def grade_assignment(update: Update, context: ContextTypes.DEFAULT_TYPE):
         grade = float(args[3])
         feedback = ' '.join(args[4:]) if len(args) > 4 else "لا توجد ملاحظات"
         
-        # Load submissions
-        submissions_file = Path('data/submissions.json')
-        if not submissions_file.exists():
-            await update.message.reply_text("❌ لا توجد تسليمات")
-            return
-        
-        with open(submissions_file, 'r', encoding='utf-8') as f:
-            submissions = json.load(f)
-        
-        # Find submission
-        submission = None
-        for s in submissions:
-            if (s.get('student_id') == student_id and
-                s.get('course_id') == course_id and
-                s.get('assignment_index') == assignment_index):
-                submission = s
-                break
+        # Update submission
+        previous, submission = await submissions_store.update(
+            (student_id, course_id, assignment_index),
+            {
+                'status': 'graded',
+                'grade': grade,
+                'max_grade': 100,  # /grade scores out of 100
+                'feedback': feedback,
+                'graded_at': datetime.now().isoformat()
+            },
+            return_previous=True
+        )
         
         if not submission:
             await update.message.reply_text("❌ التسليم غير موجود")
             return
         
-        # Update submission
-        submission['status'] = 'graded'
-        submission['grade'] = grade
-        submission['feedback'] = feedback
-        submission['graded_at'] = datetime.now().isoformat()
-        
-        # Save
-        with open(submissions_file, 'w', encoding='utf-8') as f:
-            json.dump(submissions, f, ensure_ascii=False, indent=2)
+        await StudentGradeSummary.apply_grade_change(student_id, previous.get('grade'), grade, 100, previous.get('max_grade'))
+        await record_achievement_event(
+            student_id, EVENT_GRADE, grade=grade, previous_grade=previous.get('grade'),
+            max_grade=100, previous_max_grade=previous.get('max_grade')
+        )
         
         # Confirm to admin
         await update.message.reply_text(
@@ -350,24 +345,11 @@ async def view_submission_status_json(update: Update, context: ContextTypes.DEFA
     
     student_id = str(update.effective_user.id)
     
-    # Load submissions
-    submissions_file = Path('data/submissions.json')
-    submission = None
-    if submissions_file.exists():
-        with open(submissions_file, 'r', encoding='utf-8') as f:
-            submissions = json.load(f)
-            for s in submissions:
-                if (s.get('student_id') == student_id and
-                    s.get('course_id') == course_id and
-                    s.get('assignment_index') == assignment_index):
-                    submission = s
-                    break
+    # Load submission
+    submission = await submissions_store.get(student_id, course_id, assignment_index)
     
     # Load assignment
-    assignments_file = Path('data/assignments.json')
-    with open(assignments_file, 'r', encoding='utf-8') as f:
-        all_assignments = json.load(f)
-        assignments = [a for a in all_assignments if a.get('type') == 'courses' and a.get('item_id') == course_id]
+    assignments = content_catalog.assignments(course_id)
     
     if assignment_index >= len(assignments):
         await query.message.reply_text("❌ الواجب غير موجود")
@@ -5,11 +5,11 @@ Certificate and Messages Handlers
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from loguru import logger
-import json
-from pathlib import Path
 
 from database.models.user import User
+from utils.user_cache import user_cache
 from config.settings import settings
+from utils.content_catalog import content_catalog
 
 
 async def request_certificate(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -18,7 +18,7 @@ async def request_certificate(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     try:
         # Get user
-        user = await User.find_one(User.telegram_id == user_id)
+        user = await user_cache.get(user_id)
         if not user:
             await update.message.reply_text("❌ يرجى التسجيل أولاً.")
             return
@@ -37,13 +37,8 @@ async def request_certificate(update: Update, context: ContextTypes.DEFAULT_TYPE
             )
             return
         
-        # Load courses from JSON
-        courses_path = Path("data/courses.json")
-        courses_data = {}
-        if courses_path.exists():
-            with open(courses_path, 'r', encoding='utf-8') as f:
-                courses_list = json.load(f)
-                courses_data = {c['id']: c for c in courses_list}
+        # Courses from the shared catalog
+        courses_data = content_catalog.courses_by_id()
         
         # Show available certificates
         keyboard = []
@@ -342,15 +337,10 @@ async def process_certificate_request(update: Update, context: ContextTypes.DEFA
     user_id = query.from_user.id
     
     try:
-        user = await User.find_one(User.telegram_id == user_id)
+        user = await user_cache.get(user_id)
         
-        # Load course from JSON
-        courses_path = Path("data/courses.json")
-        course = None
-        if courses_path.exists():
-            with open(courses_path, 'r', encoding='utf-8') as f:
-                courses_list = json.load(f)
-                course = next((c for c in courses_list if c['id'] == course_id), None)
+        # Course from the shared catalog
+        course = content_catalog.get_course(course_id)
         
         if not user or not course:
             await query.edit_message_text("❌ حدث خطأ. يرجى المحاولة لاحقاً.")
@@ -8,6 +8,7 @@ from loguru import logger
 from datetime import datetime
 
 from database.models.user import User
+from utils.user_cache import user_cache
 from config.settings import settings
 
 
@@ -22,7 +23,7 @@ async def start_chat_with_instructor(update: Update, context: ContextTypes.DEFAU
     if query:
         await query.answer()
     
-    user = await User.find_one(User.telegram_id == update.effective_user.id)
+    user = await user_cache.get(update.effective_user.id)
     if not user:
         target = update.callback_query.message if query else update.message
         await target.reply_text(
@@ -56,7 +57,7 @@ async def start_chat_with_instructor(update: Update, context: ContextTypes.DEFAU
 
 async def receive_chat_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Receive and forward message to instructor"""
-    user = await User.find_one(User.telegram_id == update.effective_user.id)
+    user = await user_cache.get(update.effective_user.id)
     if not user:
         await update.message.reply_text("❌ حدث خطأ. يرجى المحاولة مرة أخرى.")
         return ConversationHandler.END
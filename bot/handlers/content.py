@@ -4,14 +4,15 @@ Content Handlers - Videos, Lectures, Assignments
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from loguru import logger
-from pathlib import Path
-import json
 from datetime import datetime
 
 from database.models.user import User
+from utils.content_catalog import content_catalog
+from utils.user_cache import with_user
 
 
-async def show_lectures(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user(course_prefix="lectures_")
+async def show_lectures(update: Update, context: ContextTypes.DEFAULT_TYPE, user: User):
     """Show lectures for course"""
     query = update.callback_query
     await query.answer()
@@ -19,19 +20,6 @@ async def show_lectures(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         course_id = query.data.replace("lectures_", "")
         
-        # Verify user has access
-        try:
-            user = await User.find_one(User.telegram_id == update.effective_user.id)
-        except Exception as db_error:
-            logger.error(f"Database error while fetching user {update.effective_user.id}: {repr(db_error)}")
-            await query.message.reply_text("❌ خطأ في قاعدة البيانات. يرجى المحاولة لاحقاً.")
-            return
-        
-        if not user or not user.has_approved_course(course_id):
-            logger.warning(f"User {update.effective_user.id} attempted to access lectures for course {course_id} without approval")
-            await query.message.reply_text("❌ ليس لديك صلاحية الوصول لهذا المحتوى")
-            return
-        
         # If a group link is configured, show it instead of content
         link = None
         try:
@@ -40,11 +28,7 @@ async def show_lectures(update: Update, context: ContextTypes.DEFAULT_TYPE):
             if course and course.get('group_link'):
                 link = course['group_link']
             else:
-                gl_path = Path('data/group_links.json')
-                if gl_path.exists():
-                    with open(gl_path, 'r', encoding='utf-8') as f:
-                        gl = json.load(f)
-                        link = gl.get('courses', {}).get(course_id) or gl.get(course_id)
+                link = content_catalog.group_link(course_id)
         except Exception as e:
             logger.error(f"Error loading course group link: {e}")
         
@@ -82,7 +66,8 @@ async def show_lectures(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.message.reply_text("❌ حدث خطأ. يرجى المحاولة لاحقاً.")
 
 
-async def show_videos(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user(course_prefix="videos_")
+async def show_videos(update: Update, context: ContextTypes.DEFAULT_TYPE, user: User):
     """Show videos for course"""
     query = update.callback_query
     await query.answer()
@@ -90,19 +75,6 @@ async def show_videos(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         course_id = query.data.replace("videos_", "")
         
-        # Verify user has access
-        try:
-            user = await User.find_one(User.telegram_id == update.effective_user.id)
-        except Exception as db_error:
-            logger.error(f"Database error while fetching user {update.effective_user.id}: {repr(db_error)}")
-            await query.message.reply_text("❌ خطأ في قاعدة البيانات. يرجى المحاولة لاحقاً.")
-            return
-            
-        if not user or not user.has_approved_course(course_id):
-            logger.warning(f"User {update.effective_user.id} attempted to access videos for course {course_id} without approval")
-            await query.message.reply_text("❌ ليس لديك صلاحية الوصول لهذا المحتوى")
-            return
-        
         # If a group link is configured, show it instead of content
         link = None
         try:
@@ -111,11 +83,7 @@ async def show_videos(update: Update, context: ContextTypes.DEFAULT_TYPE):
             if course and course.get('group_link'):
                 link = course['group_link']
             else:
-                gl_path = Path('data/group_links.json')
-                if gl_path.exists():
-                    with open(gl_path, 'r', encoding='utf-8') as f:
-                        gl = json.load(f)
-                        link = gl.get('courses', {}).get(course_id) or gl.get(course_id)
+                link = content_catalog.group_link(course_id)
         except Exception as e:
             logger.error(f"Error loading course group link: {e}")
         
@@ -132,21 +100,8 @@ async def show_videos(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
         
-        # Load videos from JSON
-        import json
-        from pathlib import Path
-        
-        videos_file = Path('data/videos.json')
-        course_videos = []
-        
-        if videos_file.exists():
-            try:
-                with open(videos_file, 'r', encoding='utf-8') as f:
-                    all_videos = json.load(f)
-                    # Filter videos for this course
-                    course_videos = [v for v in all_videos if v.get('type') == 'courses' and v.get('item_id') == course_id]
-            except Exception as e:
-                logger.error(f"Error loading videos: {e}")
+        # Videos for this course from the shared catalog
+        course_videos = content_catalog.videos(course_id)
         
         if course_videos:
             text = f"🎥 **الفيديوهات المتاحة** ({len(course_videos)} فيديو)\n\n"
@@ -225,21 +180,11 @@ async def watch_video(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Get videos from context OR reload from JSON
     videos = context.user_data.get(f'videos_{course_id}', [])
     
-    # If no videos in context, reload from JSON
+    # If no videos in context, get them from the catalog
     if not videos:
-        import json
-        from pathlib import Path
-        
-        videos_file = Path('data/videos.json')
-        if videos_file.exists():
-            try:
-                with open(videos_file, 'r', encoding='utf-8') as f:
-                    all_videos = json.load(f)
-                    videos = [v for v in all_videos if v.get('type') == 'courses' and v.get('item_id') == course_id]
-                    # Store back in context
-                    context.user_data[f'videos_{course_id}'] = videos
-            except Exception as e:
-                logger.error(f"Error loading videos: {e}")
+        videos = content_catalog.videos(course_id)
+        # Store back in context
+        context.user_data[f'videos_{course_id}'] = videos
     
     if videos and video_index < len(videos):
         video = videos[video_index]
@@ -279,7 +224,8 @@ async def watch_video(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.message.reply_text("❌ الفيديو غير موجود")
 
 
-async def show_assignments(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user(course_prefix="assignments_")
+async def show_assignments(update: Update, context: ContextTypes.DEFAULT_TYPE, user: User):
     """Show assignments for course"""
     query = update.callback_query
     await query.answer()
@@ -287,19 +233,6 @@ async def show_assignments(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         course_id = query.data.replace("assignments_", "")
         
-        # Verify user has access
-        try:
-            user = await User.find_one(User.telegram_id == update.effective_user.id)
-        except Exception as db_error:
-            logger.error(f"Database error while fetching user {update.effective_user.id}: {repr(db_error)}")
-            await query.message.reply_text("❌ خطأ في قاعدة البيانات. يرجى المحاولة لاحقاً.")
-            return
-        
-        if not user or not user.has_approved_course(course_id):
-            logger.warning(f"User {update.effective_user.id} attempted to access assignments for course {course_id} without approval")
-            await query.message.reply_text("❌ ليس لديك صلاحية الوصول لهذا المحتوى")
-            return
-        
         # If a group link is configured, show it instead of content
         link = None
         try:
@@ -308,11 +241,7 @@ async def show_assignments(update: Update, context: ContextTypes.DEFAULT_TYPE):
             if course and course.get('group_link'):
                 link = course['group_link']
             else:
-                gl_path = Path('data/group_links.json')
-                if gl_path.exists():
-                    with open(gl_path, 'r', encoding='utf-8') as f:
-                        gl = json.load(f)
-                        link = gl.get('courses', {}).get(course_id) or gl.get(course_id)
+                link = content_catalog.group_link(course_id)
         except Exception as e:
             logger.error(f"Error loading course group link: {e}")
         
@@ -329,22 +258,8 @@ async def show_assignments(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
         
-        # Load assignments from JSON
-        import json
-        from pathlib import Path
-        from datetime import datetime
-        
-        assignments_file = Path('data/assignments.json')
-        course_assignments = []
-        
-        if assignments_file.exists():
-            try:
-                with open(assignments_file, 'r', encoding='utf-8') as f:
-                    all_assignments = json.load(f)
-                    # Filter assignments for this course
-                    course_assignments = [a for a in all_assignments if a.get('type') == 'courses' and a.get('item_id') == course_id]
-            except Exception as e:
-                logger.error(f"Error loading assignments: {e}")
+        # Assignments for this course from the shared catalog
+        course_assignments = content_catalog.assignments(course_id)
         
         if course_assignments:
             # Remove duplicates by title
@@ -420,21 +335,11 @@ async def view_assignment(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Get assignments from context OR reload from JSON
     assignments = context.user_data.get(f'assignments_{course_id}', [])
     
-    # If no assignments in context, reload from JSON
+    # If no assignments in context, get them from the catalog
     if not assignments:
-        import json
-        from pathlib import Path
-        
-        assignments_file = Path('data/assignments.json')
-        if assignments_file.exists():
-            try:
-                with open(assignments_file, 'r', encoding='utf-8') as f:
-                    all_assignments = json.load(f)
-                    assignments = [a for a in all_assignments if a.get('type') == 'courses' and a.get('item_id') == course_id]
-                    # Store back in context
-                    context.user_data[f'assignments_{course_id}'] = assignments
-            except Exception as e:
-                logger.error(f"Error loading assignments: {e}")
+        assignments = content_catalog.assignments(course_id)
+        # Store back in context
+        context.user_data[f'assignments_{course_id}'] = assignments
     
     if assignments and assignment_index < len(assignments):
         from datetime import datetime
@@ -515,7 +420,8 @@ async def view_assignment(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.message.reply_text("❌ الواجب غير موجود")
 
 
-async def show_exams(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user(course_prefix="exams_")
+async def show_exams(update: Update, context: ContextTypes.DEFAULT_TYPE, user: User):
     """Show exams for course"""
     query = update.callback_query
     await query.answer()
@@ -524,19 +430,6 @@ async def show_exams(update: Update, context: ContextTypes.DEFAULT_TYPE):
         course_id = query.data.replace("exams_", "")
         logger.info(f"Show exams for course: {course_id}")
         
-        # Verify user has access
-        try:
-            user = await User.find_one(User.telegram_id == update.effective_user.id)
-        except Exception as db_error:
-            logger.error(f"Database error while fetching user {update.effective_user.id}: {repr(db_error)}")
-            await query.edit_message_text("❌ خطأ في قاعدة البيانات. يرجى المحاولة لاحقاً.")
-            return
-        
-        if not user or not user.has_approved_course(course_id):
-            logger.warning(f"User {update.effective_user.id} attempted to access exams for course {course_id} without approval")
-            await query.edit_message_text("❌ ليس لديك صلاحية الوصول لهذا المحتوى")
-            return
-        
         # If a group link is configured, show it instead of content
         link = None
         try:
@@ -545,11 +438,7 @@ async def show_exams(update: Update, context: ContextTypes.DEFAULT_TYPE):
             if course and course.get('group_link'):
                 link = course['group_link']
             else:
-                gl_path = Path('data/group_links.json')
-                if gl_path.exists():
-                    with open(gl_path, 'r', encoding='utf-8') as f:
-                        gl = json.load(f)
-                        link = gl.get('courses', {}).get(course_id) or gl.get(course_id)
+                link = content_catalog.group_link(course_id)
         except Exception as e:
             logger.error(f"Error loading course group link: {e}")
         if link:
@@ -565,23 +454,9 @@ async def show_exams(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
         
-        # Load exams from JSON
-        exams_path = Path("data/exams.json")
-        exams = []
-        
-        if exams_path.exists():
-            try:
-                with open(exams_path, 'r', encoding='utf-8') as f:
-                    all_exams = json.load(f)
-                    exams = [e for e in all_exams if e.get('course_id') == course_id]
-                    logger.info(f"Found {len(exams)} exams for course {course_id}")
-            except Exception as e:
-                logger.error(f"Error loading exams file: {e}")
-                await query.edit_message_text(
-                    "❌ حدث خطأ في تحميل الاختبارات\n\n"
-                    "يرجى المحاولة لاحقاً أو التواصل مع الإدارة."
-                )
-                return
+        # Exams for this course from the shared catalog
+        exams = content_catalog.exams(course_id)
+        logger.info(f"Found {len(exams)} exams for course {course_id}")
         
         if not exams:
             text = "📋 **الاختبارات**\n\n❌ لا توجد اختبارات متاحة حالياً."
@@ -655,7 +530,8 @@ async def show_exams(update: Update, context: ContextTypes.DEFAULT_TYPE):
             pass
 
 
-async def show_links(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user(course_prefix="links_")
+async def show_links(update: Update, context: ContextTypes.DEFAULT_TYPE, user: User):
     """Show important links"""
     query = update.callback_query
     await query.answer()
@@ -663,53 +539,13 @@ async def show_links(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         course_id = query.data.replace("links_", "")
         
-        # Verify user has access
-        try:
-            user = await User.find_one(User.telegram_id == update.effective_user.id)
-        except Exception as db_error:
-            logger.error(f"Database error while fetching user {update.effective_user.id}: {repr(db_error)}")
-            await query.message.reply_text("❌ خطأ في قاعدة البيانات. يرجى المحاولة لاحقاً.")
-            return
-        
-        if not user or not user.has_approved_course(course_id):
-            logger.warning(f"User {update.effective_user.id} attempted to access links for course {course_id} without approval")
-            await query.message.reply_text("❌ ليس لديك صلاحية الوصول لهذا المحتوى")
-            return
-        
-        # Try to load links from data/links.json
-        links = []
-        try:
-            links_path = Path('data/links.json')
-            if links_path.exists():
-                with open(links_path, 'r', encoding='utf-8') as f:
-                    import json
-                    all_links = json.load(f)
-                    # Support both nested and flat structures
-                    course_links = (
-                        all_links.get('courses', {}).get(course_id)
-                        if isinstance(all_links, dict) else None
-                    )
-                    if course_links and isinstance(course_links, list):
-                        links = [l for l in course_links if isinstance(l, dict) and l.get('url')]
-                    elif isinstance(all_links, dict) and all_links.get(course_id):
-                        # Flat mapping
-                        raw = all_links.get(course_id)
-                        if isinstance(raw, list):
-                            links = [l for l in raw if isinstance(l, dict) and l.get('url')]
-        except Exception as e:
-            logger.error(f"Error loading course links: {e}")
+        # Course links from data/links.json (nested or flat structure)
+        links = content_catalog.course_links(course_id)
         
         # Fallback to single group link from group_links.json
         group_link = None
         if not links:
-            try:
-                gl_path = Path('data/group_links.json')
-                if gl_path.exists():
-                    with open(gl_path, 'r', encoding='utf-8') as f:
-                        gl = json.load(f)
-                        group_link = gl.get('courses', {}).get(course_id) or gl.get(course_id)
-            except Exception as e:
-                logger.error(f"Error loading course group link (fallback): {e}")
+            group_link = content_catalog.group_link(course_id)
         
         if links:
             text = "🔗 **روابط مهمة**\n\nاختر ما تريد فتحه:"
@@ -749,7 +585,8 @@ async def show_links(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.message.reply_text("❌ حدث خطأ. يرجى المحاولة لاحقاً.")
 
 
-async def show_certificate(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user(course_prefix="certificate_")
+async def show_certificate(update: Update, context: ContextTypes.DEFAULT_TYPE, user: User):
     """Show certificate"""
     query = update.callback_query
     await query.answer()
@@ -757,19 +594,6 @@ async def show_certificate(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         course_id = query.data.replace("certificate_", "")
         
-        # Verify user has access
-        try:
-            user = await User.find_one(User.telegram_id == update.effective_user.id)
-        except Exception as db_error:
-            logger.error(f"Database error while fetching user {update.effective_user.id}: {repr(db_error)}")
-            await query.message.reply_text("❌ خطأ في قاعدة البيانات. يرجى المحاولة لاحقاً.")
-            return
-        
-        if not user or not user.has_approved_course(course_id):
-            logger.warning(f"User {update.effective_user.id} attempted to access certificate for course {course_id} without approval")
-            await query.message.reply_text("❌ ليس لديك صلاحية الوصول لهذا المحتوى")
-            return
-        
         # Check if course is completed
         enrollment = user.get_course_enrollment(course_id)
         if enrollment and enrollment.completed:
@@ -8,6 +8,8 @@ from pathlib import Path
 import json
 
 from database.models.user import User
+from utils.user_cache import user_cache
+from utils.achievements import EVENT_ENROLLMENT, record_achievement_event
 from config.courses_config import get_course, get_all_courses
 from bot.keyboards.main_keyboards import (
     get_courses_keyboard,
@@ -63,7 +65,7 @@ async def show_course_details(update: Update, context: ContextTypes.DEFAULT_TYPE
         
         # Get user
         try:
-            user = await User.find_one(User.telegram_id == update.effective_user.id)
+            user = await user_cache.get(update.effective_user.id)
         except Exception as db_error:
             logger.error(f"Database error while fetching user {update.effective_user.id}: {repr(db_error)}")
             await query.edit_message_text("❌ خطأ في قاعدة البيانات. يرجى المحاولة لاحقاً.")
@@ -251,6 +253,7 @@ async def receive_payment_proof(update: Update, context: ContextTypes.DEFAULT_TY
                 payment_method=payment_data['method'].upper(),
                 payment_proof_file_id=file_id
             )
+            await record_achievement_event(user.telegram_id, EVENT_ENROLLMENT)
             
             logger.info(f"Course enrollment payment received: {user.full_name} -> {payment_data['id']}")
             
@@ -6,10 +6,11 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from loguru import logger
 
-from database.models.user import User
 from utils.statistics import StatisticsManager
 from utils.achievements import AchievementManager
-from utils.reports import ReportGenerator
+from config.settings import settings
+from config.courses_config import get_all_courses, get_course
+from utils.report_jobs import report_jobs
 
 
 async def show_my_statistics(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -209,19 +210,15 @@ async def export_user_report(update: Update, context: ContextTypes.DEFAULT_TYPE)
     user_id = int(query.data.split('_')[-1])
     
     try:
-        pdf_buffer = await ReportGenerator.generate_student_report_pdf(user_id)
+        sent = await report_jobs.send(
+            context.bot,
+            chat_id=user_id,
+            report_type="student_pdf",
+            params={"telegram_id": user_id},
+            caption="📊 تقريرك الأكاديمي"
+        )
         
-        if pdf_buffer:
-            user = await User.find_one(User.telegram_id == user_id)
-            filename = f"report_{user.full_name.replace(' ', '_')}.pdf"
-            
-            await context.bot.send_document(
-                chat_id=user_id,
-                document=pdf_buffer,
-                filename=filename,
-                caption="📊 تقريرك الأكاديمي"
-            )
-            
+        if sent:
             await query.message.reply_text("✅ تم إرسال التقرير بنجاح!")
         else:
             await query.message.reply_text("❌ حدث خطأ في إنشاء التقرير")
@@ -245,6 +242,7 @@ async def show_admin_reports_menu(update: Update, context: ContextTypes.DEFAULT_
     keyboard = [
         [InlineKeyboardButton("👥 تقرير الطلاب (Excel)", callback_data="export_students_excel")],
         [InlineKeyboardButton("📊 تقرير الدرجات (Excel)", callback_data="export_grades_excel")],
+        [InlineKeyboardButton("📦 حزمة تقارير دورة (PDF)", callback_data="course_pack_menu")],
         [InlineKeyboardButton("« رجوع", callback_data="back_admin_stats")]
     ]
     
@@ -260,16 +258,15 @@ async def export_students_excel(update: Update, context: ContextTypes.DEFAULT_TY
     await query.answer("جاري تحضير التقرير...")
     
     try:
-        excel_buffer = await ReportGenerator.generate_students_excel()
+        sent = await report_jobs.send(
+            context.bot,
+            chat_id=update.effective_user.id,
+            report_type="students_excel",
+            params={},
+            caption="📊 تقرير الطلاب"
+        )
         
-        if excel_buffer:
-            await context.bot.send_document(
-                chat_id=update.effective_user.id,
-                document=excel_buffer,
-                filename=f"students_report_{datetime.now().strftime('%Y%m%d')}.xlsx",
-                caption="📊 تقرير الطلاب"
-            )
-            
+        if sent:
             await query.message.reply_text("✅ تم إرسال التقرير بنجاح!")
         else:
             await query.message.reply_text("❌ حدث خطأ في إنشاء التقرير")
@@ -277,3 +274,64 @@ async def export_students_excel(update: Update, context: ContextTypes.DEFAULT_TY
     except Exception as e:
         logger.error(f"Error exporting Excel: {e}")
         await query.message.reply_text("❌ حدث خطأ في تصدير التقرير")
+
+
+async def show_course_pack_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Choose the course of a report pack"""
+    query = update.callback_query
+    await query.answer()
+    
+    if update.effective_user.id != settings.TELEGRAM_ADMIN_ID:
+        return
+    
+    text = """
+📦 **حزمة تقارير دورة**
+
+ملف ZIP يحتوي تقرير PDF لكل طالب معتمد في الدورة.
+اختر الدورة:
+    """
+    
+    keyboard = [
+        [InlineKeyboardButton(course["name"], callback_data=f"export_course_pack_{course['id']}")]
+        for course in get_all_courses()
+    ]
+    keyboard.append([InlineKeyboardButton("« رجوع", callback_data="admin_reports")])
+    
+    await query.message.edit_text(
+        text,
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode="Markdown"
+    )
+
+
+async def export_course_pack(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Export the PDF reports of all students of a course as one ZIP"""
+    query = update.callback_query
+    await query.answer("جاري تحضير حزمة التقارير...")
+    
+    if update.effective_user.id != settings.TELEGRAM_ADMIN_ID:
+        return
+    
+    course_id = query.data.replace("export_course_pack_", "")
+    course = get_course(course_id)
+    if not course:
+        await query.message.reply_text("❌ الدورة غير موجودة")
+        return
+    
+    try:
+        sent = await report_jobs.send(
+            context.bot,
+            chat_id=update.effective_user.id,
+            report_type="course_pack",
+            params={"course_id": course_id},
+            caption=f"📦 تقارير طلاب {course['name']}"
+        )
+        
+        if sent:
+            await query.message.reply_text("✅ تم إرسال حزمة التقارير بنجاح!")
+        else:
+            await query.message.reply_text("❌ لا يوجد طلاب معتمدون في هذه الدورة أو تعذر إنشاء التقارير")
+            
+    except Exception as e:
+        logger.error(f"Error exporting course report pack: {e}")
+        await query.message.reply_text("❌ حدث خطأ في تصدير حزمة التقارير")
@@ -5,12 +5,12 @@ Exam Grading System
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from loguru import logger
-from pathlib import Path
-import json
 from datetime import datetime
 
 from config.settings import settings
 from database.models.user import User
+from utils.content_catalog import content_catalog
+from utils.json_store import exam_grades_store
 
 # Conversation states
 SELECTING_EXAM = 1
@@ -28,30 +28,21 @@ async def start_exam_grading_menu(update: Update, context: ContextTypes.DEFAULT_
         return ConversationHandler.END
     
     # Load exams
-    exams_path = Path('data/exams.json')
-    if not exams_path.exists():
+    exams = content_catalog.all('exams')
+    
+    if not exams:
         await update.message.reply_text(
             "❌ لا توجد اختبارات بعد!\n\n"
             "أضف اختبار باستخدام زر \"📋 إنشاء اختبار\" أولاً."
         )
         return ConversationHandler.END
     
-    with open(exams_path, 'r', encoding='utf-8') as f:
-        exams = json.load(f)
-    
-    if not exams:
-        await update.message.reply_text("❌ لا توجد اختبارات بعد!")
-        return ConversationHandler.END
-    
-    # Create exam grades file if not exists
-    grades_path = Path('data/exam_grades.json')
-    if not grades_path.exists():
-        with open(grades_path, 'w', encoding='utf-8') as f:
-            json.dump([], f, ensure_ascii=False, indent=2)
-    
     # Load exam grades
-    with open(grades_path, 'r', encoding='utf-8') as f:
-        exam_grades = json.load(f)
+    exam_grades = await exam_grades_store.all()
+    graded_counts = {}
+    for g in exam_grades:
+        if g.get('status') == 'graded':
+            graded_counts[g.get('exam_index')] = graded_counts.get(g.get('exam_index'), 0) + 1
     
     text = "📊 **تقييم الاختبارات**\n\n"
     text += "اختر الاختبار الذي تريد تقييمه:\n\n"
@@ -63,7 +54,7 @@ async def start_exam_grading_menu(update: Update, context: ContextTypes.DEFAULT_
         course_id = exam.get('course_id', 'unknown')
         
         # Count graded students for this exam
-        graded_count = len([g for g in exam_grades if g.get('exam_index') == i and g.get('status') == 'graded'])
+        graded_count = graded_counts.get(i, 0)
         
         button_text = f"📋 {title}"
         if graded_count > 0:
@@ -92,9 +83,7 @@ async def select_exam_for_grading(update: Update, context: ContextTypes.DEFAULT_
     exam_index = int(query.data.split('_')[2])
     
     # Load exams
-    exams_path = Path('data/exams.json')
-    with open(exams_path, 'r', encoding='utf-8') as f:
-        exams = json.load(f)
+    exams = content_catalog.all('exams')
     
     if exam_index >= len(exams):
         await query.edit_message_text("❌ الاختبار غير موجود!")
@@ -124,9 +113,8 @@ async def select_exam_for_grading(update: Update, context: ContextTypes.DEFAULT_
         return ConversationHandler.END
     
     # Load exam grades
-    grades_path = Path('data/exam_grades.json')
-    with open(grades_path, 'r', encoding='utf-8') as f:
-        exam_grades = json.load(f)
+    exam_grades = await exam_grades_store.find(exam_index=exam_index)
+    grades_by_student = {g.get('student_id'): g for g in exam_grades}
     
     text = f"📋 **{exam.get('title')}**\n\n"
     text += "اختر الطالب لتقييم اختباره:\n\n"
@@ -135,12 +123,7 @@ async def select_exam_for_grading(update: Update, context: ContextTypes.DEFAULT_
     
     for student in students:
         # Check if already graded
-        existing_grade = next(
-            (g for g in exam_grades 
-             if g.get('student_id') == str(student.telegram_id) 
-             and g.get('exam_index') == exam_index),
-            None
-        )
+        existing_grade = grades_by_student.get(str(student.telegram_id))
         
         button_text = f"👤 {student.full_name}"
         if existing_grade:
@@ -188,9 +171,7 @@ async def select_student_for_exam_grading(update: Update, context: ContextTypes.
         return ConversationHandler.END
     
     # Load exams
-    exams_path = Path('data/exams.json')
-    with open(exams_path, 'r', encoding='utf-8') as f:
-        exams = json.load(f)
+    exams = content_catalog.all('exams')
     
     exam = exams[exam_index]
     max_grade = exam.get('max_grade', 100)  # Get max grade from exam
@@ -278,27 +259,12 @@ async def enter_exam_feedback_and_save(update: Update, context: ContextTypes.DEF
     grade = context.user_data.get('exam_grade')
     max_grade = context.user_data.get('exam_max_grade', 100)
     
-    # Load exam grades
-    grades_path = Path('data/exam_grades.json')
-    with open(grades_path, 'r', encoding='utf-8') as f:
-        exam_grades = json.load(f)
-    
     # Load exams to get course_id
-    exams_path = Path('data/exams.json')
-    with open(exams_path, 'r', encoding='utf-8') as f:
-        exams = json.load(f)
+    exams = content_catalog.all('exams')
     
     exam = exams[exam_index]
     course_id = exam.get('course_id')
     
-    # Check if grade exists
-    existing_grade = next(
-        (g for g in exam_grades 
-         if g.get('student_id') == student_id 
-         and g.get('exam_index') == exam_index),
-        None
-    )
-    
     grade_data = {
         'student_id': student_id,
         'student_name': student_name,
@@ -311,16 +277,8 @@ async def enter_exam_feedback_and_save(update: Update, context: ContextTypes.DEF
         'graded_at': datetime.now().isoformat()
     }
     
-    if existing_grade:
-        # Update existing grade
-        exam_grades[exam_grades.index(existing_grade)] = grade_data
-    else:
-        # Add new grade
-        exam_grades.append(grade_data)
-    
-    # Save
-    with open(grades_path, 'w', encoding='utf-8') as f:
-        json.dump(exam_grades, f, ensure_ascii=False, indent=2)
+    # Save (updates the existing grade in place or adds a new one)
+    await exam_grades_store.put(grade_data)
     
     # Send notification to student
     try:
@@ -7,7 +7,7 @@ from loguru import logger
 from pathlib import Path
 import json
 
-from database.models.user import User
+from utils.user_cache import user_cache
 from config.materials_config import get_all_years, get_materials_by_year_semester, get_material, calculate_materials_price
 from bot.keyboards.main_keyboards import get_years_keyboard, get_semesters_keyboard, get_payment_methods_keyboard
 
@@ -111,7 +111,7 @@ async def show_material_details(update: Update, context: ContextTypes.DEFAULT_TY
         
         # Get user
         try:
-            user = await User.find_one(User.telegram_id == update.effective_user.id)
+            user = await user_cache.get(update.effective_user.id)
         except Exception as db_error:
             logger.error(f"Database error while fetching user {update.effective_user.id}: {repr(db_error)}")
             await query.message.reply_text("❌ خطأ في قاعدة البيانات. يرجى المحاولة لاحقاً.")
@@ -9,7 +9,8 @@ from datetime import datetime
 import random
 
 from database.models.quiz import Quiz
-from database.models.user import User
+from utils.user_cache import user_cache
+from utils.achievements import EVENT_QUIZ_COMPLETED, record_achievement_event
 
 
 async def show_quizzes(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -20,7 +21,7 @@ async def show_quizzes(update: Update, context: ContextTypes.DEFAULT_TYPE):
     course_id = query.data.replace("quizzes_", "")
     
     # Verify user has access
-    user = await User.find_one(User.telegram_id == update.effective_user.id)
+    user = await user_cache.get(update.effective_user.id)
     if not user or not user.has_approved_course(course_id):
         await query.message.reply_text("❌ ليس لديك صلاحية الوصول لهذا المحتوى")
         return
@@ -38,8 +39,8 @@ async def show_quizzes(update: Update, context: ContextTypes.DEFAULT_TYPE):
         keyboard = []
         for i, quiz in enumerate(quizzes, 1):
             # Get user's attempts
-            attempts_count = quiz.get_attempts_count(str(update.effective_user.id))
-            best_attempt = quiz.get_best_attempt(str(update.effective_user.id))
+            attempts_count = await quiz.get_attempts_count(str(update.effective_user.id))
+            best_attempt = await quiz.get_best_attempt(str(update.effective_user.id))
             
             status = ""
             if best_attempt:
@@ -101,9 +102,9 @@ async def view_quiz(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
     
     # Get user's attempts
-    attempts = quiz.get_user_attempts(user_id)
+    attempts = await quiz.get_user_attempts(user_id)
     attempts_count = len(attempts)
-    best_attempt = quiz.get_best_attempt(user_id)
+    best_attempt = await quiz.get_best_attempt(user_id)
     
     text = quiz.get_info_text()
     
@@ -121,7 +122,7 @@ async def view_quiz(update: Update, context: ContextTypes.DEFAULT_TYPE):
     keyboard = []
     
     # Check if user can attempt
-    if quiz.can_attempt(user_id):
+    if await quiz.can_attempt(user_id):
         keyboard.append([InlineKeyboardButton(
             "🚀 بدء الاختبار",
             callback_data=f"quiz_start_{quiz.id}"
@@ -303,7 +304,10 @@ async def complete_quiz(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.message.edit_text("❌ حدث خطأ في تسليم الاختبار")
         return
     
+    await record_achievement_event(user_id, EVENT_QUIZ_COMPLETED, quiz_id=quiz.id, passed=attempt.passed)
+    
     # Show results
+    attempts_count = await quiz.get_attempts_count(user_id)
     percentage = int(attempt.score / attempt.max_score * 100) if attempt.max_score > 0 else 0
     
     text = f"""
@@ -316,11 +320,11 @@ async def complete_quiz(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 {'✅ **مبروك! أنت ناجح!** 🎉' if attempt.passed else '❌ **للأسف لم تنجح. حاول مرة أخرى!**'}
 
-💪 **لديك {quiz.max_attempts - quiz.get_attempts_count(user_id)} محاولة متبقية**
+💪 **لديك {quiz.max_attempts - attempts_count} محاولة متبقية**
     """
     
     keyboard = [
-        [InlineKeyboardButton("📊 عرض الأجوبة", callback_data=f"quiz_review_{quiz.id}_{len(quiz.get_user_attempts(user_id))-1}")],
+        [InlineKeyboardButton("📊 عرض الأجوبة", callback_data=f"quiz_review_{quiz.id}_{attempts_count-1}")],
         [InlineKeyboardButton("« العودة", callback_data=f"quiz_view_{quiz.id}")]
     ]
     
@@ -352,7 +356,7 @@ async def review_quiz_answers(update: Update, context: ContextTypes.DEFAULT_TYPE
         return
     
     user_id = str(update.effective_user.id)
-    attempts = quiz.get_user_attempts(user_id)
+    attempts = await quiz.get_user_attempts(user_id)
     
     if attempt_index >= len(attempts):
         await query.message.edit_text("❌ المحاولة غير موجودة")
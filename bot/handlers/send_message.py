@@ -2,6 +2,8 @@
 Send Message to Students Handler
 نظام إرسال رسائل للطلاب
 """
+from typing import Optional
+
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from loguru import logger
@@ -12,6 +14,9 @@ from database.models.user import User
 # Conversation states
 SELECTING_STUDENT, ENTERING_MESSAGE = range(2)
 
+# Student buttons per message
+STUDENTS_PER_PAGE = 20
+
 
 async def start_send_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """بدء إرسال رسالة لطالب"""
@@ -21,40 +26,19 @@ async def start_send_message(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.message.reply_text("❌ هذه الوظيفة متاحة للأدمن فقط.")
         return ConversationHandler.END
     
-    # Get all students
     try:
-        all_users = await User.find().to_list()
-        students = [u for u in all_users if u.telegram_id != settings.TELEGRAM_ADMIN_ID]
-        
-        if not students:
+        page = await _students_page()
+        if page is None:
             await update.message.reply_text(
                 "❌ لا يوجد طلاب مسجلين بعد!\n\n"
                 "انتظر حتى يسجل الطلاب في المنصة."
             )
             return ConversationHandler.END
         
-        text = "📬 **إرسال رسالة لطالب**\n\n"
-        text += f"اختر الطالب الذي تريد إرسال رسالة له:\n"
-        text += f"(عدد الطلاب: {len(students)})\n\n"
-        
-        keyboard = []
-        
-        for student in students[:20]:  # عرض أول 20 طالب
-            student_name = student.full_name or "طالب بدون اسم"
-            button_text = f"👤 {student_name}"
-            
-            keyboard.append([
-                InlineKeyboardButton(
-                    button_text,
-                    callback_data=f"msg_student_{student.telegram_id}"
-                )
-            ])
-        
-        keyboard.append([InlineKeyboardButton("❌ إلغاء", callback_data="msg_cancel")])
-        
+        text, reply_markup = page
         await update.message.reply_text(
             text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=reply_markup,
             parse_mode="Markdown"
         )
         
@@ -66,6 +50,63 @@ async def start_send_message(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return ConversationHandler.END
 
 
+async def show_students_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """الصفحة التالية من قائمة الطلاب"""
+    query = update.callback_query
+    await query.answer()
+    
+    try:
+        page = await _students_page(after=query.data.replace("msg_page_", ""))
+        if page is None:
+            await query.edit_message_text("❌ لا يوجد طلاب آخرون.")
+            return ConversationHandler.END
+        
+        text, reply_markup = page
+        await query.edit_message_text(text, reply_markup=reply_markup, parse_mode="Markdown")
+        return SELECTING_STUDENT
+        
+    except Exception as e:
+        logger.error(f"Error loading students page: {e}")
+        await query.edit_message_text(f"❌ حدث خطأ: {str(e)}")
+        return ConversationHandler.END
+
+
+async def _students_page(after: Optional[str] = None):
+    """نص وأزرار صفحة من الطلاب (الأحدث أولاً)، أو None إذا لم يوجد طلاب"""
+    students, next_cursor = await User.find_page(
+        after=after,
+        limit=STUDENTS_PER_PAGE,
+        exclude_telegram_id=settings.TELEGRAM_ADMIN_ID
+    )
+    if not students:
+        return None
+    
+    total = await User.find(User.telegram_id != settings.TELEGRAM_ADMIN_ID).count()
+    
+    text = "📬 **إرسال رسالة لطالب**\n\n"
+    text += f"اختر الطالب الذي تريد إرسال رسالة له:\n"
+    text += f"(عدد الطلاب: {total})\n\n"
+    
+    keyboard = []
+    
+    for student in students:
+        student_name = student.full_name or "طالب بدون اسم"
+        button_text = f"👤 {student_name}"
+        
+        keyboard.append([
+            InlineKeyboardButton(
+                button_text,
+                callback_data=f"msg_student_{student.telegram_id}"
+            )
+        ])
+    
+    if next_cursor:
+        keyboard.append([InlineKeyboardButton("التالي ▶️", callback_data=f"msg_page_{next_cursor}")])
+    keyboard.append([InlineKeyboardButton("❌ إلغاء", callback_data="msg_cancel")])
+    
+    return text, InlineKeyboardMarkup(keyboard)
+
+
 async def select_student(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """اختيار الطالب"""
     query = update.callback_query
@@ -9,6 +9,7 @@ from pydantic import ValidationError
 from database.models.user import User
 from bot.keyboards.main_keyboards import get_main_menu_keyboard, get_admin_menu_keyboard, get_cancel_button
 from config.settings import settings
+from utils.achievements import EVENT_LOGIN, record_achievement_event
 
 
 # Conversation states
@@ -78,6 +79,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if user:
         # User already registered
         await user.update_last_active()
+        await record_achievement_event(telegram_id, EVENT_LOGIN)
         
         if is_admin:
             keyboard = get_admin_menu_keyboard()
@@ -271,6 +273,7 @@ async def asking_email(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await user.insert()
             logger.info(f"✅ [REGISTRATION] User inserted successfully into MongoDB")
             print(f"✅ [REGISTRATION] User inserted successfully into MongoDB", flush=True)
+            await record_achievement_event(telegram_id, EVENT_LOGIN)
         except Exception as insert_error:
             insert_error_type = type(insert_error).__name__
             insert_error_msg = f"[REGISTRATION] FAILED to insert user: {insert_error_type}: {str(insert_error)}"
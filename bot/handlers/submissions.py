@@ -8,10 +8,10 @@ from loguru import logger
 from datetime import datetime
 
 from database.models.assignment import Assignment
-from database.models.user import User
+from utils.user_cache import user_cache
 from database.models.notification import Notification
 from config.settings import settings
-import httpx
+from utils.telegram_client import telegram_client
 
 
 # Conversation states
@@ -20,7 +20,7 @@ WAITING_FOR_SUBMISSION = 1
 
 async def submit_assignment_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle file submission for assignment"""
-    user = await User.find_one(User.telegram_id == update.effective_user.id)
+    user = await user_cache.get(update.effective_user.id)
     if not user:
         await update.message.reply_text("❌ يرجى التسجيل أولاً باستخدام /start")
         return
@@ -101,15 +101,7 @@ async def submit_assignment_file(update: Update, context: ContextTypes.DEFAULT_T
 للمراجعة والتقييم، اذهب إلى لوحة التحكم.
             """
             
-            async with httpx.AsyncClient() as client:
-                await client.post(
-                    f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage",
-                    json={
-                        "chat_id": settings.TELEGRAM_ADMIN_ID,
-                        "text": admin_text,
-                        "parse_mode": "Markdown"
-                    }
-                )
+            await telegram_client.send_message(settings.TELEGRAM_ADMIN_ID, admin_text)
         except Exception as e:
             logger.error(f"Failed to notify admin: {e}")
         
@@ -171,7 +163,7 @@ async def view_submission_status(update: Update, context: ContextTypes.DEFAULT_T
         await query.message.reply_text("❌ الواجب غير موجود")
         return
     
-    submission = assignment.get_submission(user_id)
+    submission = await assignment.get_submission(user_id)
     
     if not submission:
         text = f"""
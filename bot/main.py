@@ -1,7 +1,9 @@
 """Telegram Bot Main Entry Point"""
 import asyncio
 import traceback
+from typing import Optional
 from telegram import Update
+from telegram.request import BaseRequest
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -16,6 +18,10 @@ from loguru import logger
 
 from config.settings import settings
 from database.connection import init_db, close_db
+from utils.json_store import close_stores
+from utils.telegram_client import telegram_client
+from utils.update_logging import redact, update_logger
+from bot.update_processor import ChatOrderedUpdateProcessor
 from bot.keyboards.main_keyboards import get_main_menu_keyboard, get_admin_menu_keyboard
 from bot.handlers.start import (
     start_command,
@@ -124,15 +130,7 @@ from bot.handlers.exam_grading import (
     ENTERING_EXAM_GRADE,
     ENTERING_EXAM_FEEDBACK
 )
-from bot.handlers.dashboard import (
-    show_my_statistics,
-    show_achievements,
-    show_admin_statistics,
-    show_top_students,
-    export_user_report,
-    show_admin_reports_menu,
-    export_students_excel
-)
+from bot.handler_registry import lazy_handlers
 from bot.handlers.chat import (
     start_chat_with_instructor,
     receive_chat_message,
@@ -179,6 +177,7 @@ from bot.handlers.exam_creator import (
 from bot.handlers.send_message import (
     start_send_message,
     select_student,
+    show_students_page,
     send_message_to_student,
     send_another_message,
     cancel_send_message,
@@ -186,6 +185,17 @@ from bot.handlers.send_message import (
     ENTERING_MESSAGE
 )
 
+# Dashboard handlers pull in the statistics and report modules (openpyxl and
+# reportlab on first report); load them on first use to keep cold starts short
+show_achievements = lazy_handlers.callback("bot.handlers.dashboard", "show_achievements")
+show_admin_statistics = lazy_handlers.callback("bot.handlers.dashboard", "show_admin_statistics")
+show_top_students = lazy_handlers.callback("bot.handlers.dashboard", "show_top_students")
+export_user_report = lazy_handlers.callback("bot.handlers.dashboard", "export_user_report")
+show_admin_reports_menu = lazy_handlers.callback("bot.handlers.dashboard", "show_admin_reports_menu")
+export_students_excel = lazy_handlers.callback("bot.handlers.dashboard", "export_students_excel")
+show_course_pack_menu = lazy_handlers.callback("bot.handlers.dashboard", "show_course_pack_menu")
+export_course_pack = lazy_handlers.callback("bot.handlers.dashboard", "export_course_pack")
+
 
 async def main_menu_handler(update: Update, context):
     """Handle main menu buttons"""
@@ -229,7 +239,9 @@ async def error_handler(update: Update, context):
     # Debug: log full update dict and traceback for easier debugging
     try:
         if isinstance(update, Update):
-            logger.debug(f"error_handler update dict: {update.to_dict()}")
+            logger.opt(lazy=True).debug(
+                "error_handler update dict: {}", lambda: redact(update.to_dict())
+            )
         else:
             logger.debug(f"error_handler received non-Update object: {update}")
     except Exception as serialize_error:
@@ -265,38 +277,42 @@ async def _post_init(application: Application):
 
 async def _post_shutdown(application: Application):
     """Cleanup resources before shutdown"""
+    await close_stores()
+    await telegram_client.close()
     await close_db()
 
 
-def create_application() -> Application:
+def create_application(request: Optional[BaseRequest] = None) -> Application:
+    """Build the bot application (`request` replaces the default HTTPX transport)"""
     logger.info("Initializing Educational Platform Bot application...")
     
     from telegram.request import HTTPXRequest
-    request = HTTPXRequest(
+    request = request or HTTPXRequest(
         connection_pool_size=8,
         connect_timeout=30.0,
         read_timeout=30.0,
         write_timeout=30.0,
     )
+    # Updates of different chats run concurrently, each chat's in order
+    update_processor = ChatOrderedUpdateProcessor(
+        max_concurrency=settings.BOT_MAX_CONCURRENT_UPDATES,
+        max_pending=settings.BOT_MAX_PENDING_UPDATES,
+    )
     application = (
         Application
         .builder()
         .token(settings.TELEGRAM_BOT_TOKEN)
         .request(request)
+        .concurrent_updates(update_processor)
         .post_init(_post_init)
         .post_shutdown(_post_shutdown)
         .build()
     )
 
-    # Global debug handler to log every incoming Update without changing behavior
+    # Global debug handler to log incoming Updates without changing behavior
+    # (sampled, redacted, and only serialized when settings.DEBUG is on)
     async def debug_log_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        try:
-            if isinstance(update, Update):
-                logger.debug(f"Incoming update: {update.to_dict()}")
-            else:
-                logger.debug(f"Incoming non-Update object in debug_log_update: {update}")
-        except Exception as e:
-            logger.error(f"Failed to serialize update in debug_log_update: {e}")
+        update_logger.log(update)
 
     application.add_handler(TypeHandler(Update, debug_log_update), group=-1)
     
@@ -523,6 +539,7 @@ def create_application() -> Application:
         states={
             SELECTING_STUDENT: [
                 CallbackQueryHandler(select_student, pattern="^msg_student_"),
+                CallbackQueryHandler(show_students_page, pattern="^msg_page_"),
                 CallbackQueryHandler(cancel_send_message, pattern="^msg_cancel$")
             ],
             ENTERING_MESSAGE: [
@@ -644,6 +661,8 @@ def create_application() -> Application:
     application.add_handler(CallbackQueryHandler(export_user_report, pattern="^export_pdf_"))
     application.add_handler(CallbackQueryHandler(show_admin_reports_menu, pattern="^admin_reports$"))
     application.add_handler(CallbackQueryHandler(export_students_excel, pattern="^export_students_excel$"))
+    application.add_handler(CallbackQueryHandler(show_course_pack_menu, pattern="^course_pack_menu$"))
+    application.add_handler(CallbackQueryHandler(export_course_pack, pattern="^export_course_pack_"))
     
     # Error handler
     application.add_error_handler(error_handler)
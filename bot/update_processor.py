@@ -0,0 +1,116 @@
+"""
+Chat-Ordered Update Processor - concurrent across chats, sequential within a chat
+معالج التحديثات - معالجة متزامنة بين المحادثات مع الحفاظ على الترتيب داخل كل محادثة
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Dict, Hashable
+
+from loguru import logger
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+class _ChatSlot:
+    """Lock of one chat plus the number of updates holding or waiting for it"""
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Runs updates of different chats concurrently while each chat's updates
+    run one at a time in arrival order, so ConversationHandler states and
+    user_data are never touched by two updates of the same chat at once.
+
+    - `max_pending` bounds the updates accepted by the processor (waiting
+      for their chat or for a slot, or running).
+    - `max_concurrency` bounds the handlers running at the same time. An
+      update only takes a slot once its chat is free, so a chat sending
+      many updates cannot occupy all slots while it waits on itself.
+    """
+
+    def __init__(self, max_concurrency: int, max_pending: int):
+        super().__init__(max(max_pending, max_concurrency))
+        self.max_concurrency = max_concurrency
+        self._running = asyncio.BoundedSemaphore(max_concurrency)
+        self._chats: Dict[Hashable, _ChatSlot] = {}
+
+        # Metrics
+        self.active = 0
+        self.peak_waiting = 0
+        self.peak_chat_depth = 0
+        self.processed_total = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    @staticmethod
+    def chat_key(update: object) -> Hashable:
+        """Ordering key: the chat, else the user, else the update itself"""
+        if isinstance(update, Update):
+            if update.effective_chat is not None:
+                return update.effective_chat.id
+            if update.effective_user is not None:
+                return ("user", update.effective_user.id)
+        return ("update", id(update))
+
+    @property
+    def waiting(self) -> int:
+        return self.current_concurrent_updates - self.active
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self.chat_key(update)
+        slot = self._chats.get(key)
+        if slot is None:
+            slot = self._chats[key] = _ChatSlot()
+        slot.users += 1
+        self.peak_chat_depth = max(self.peak_chat_depth, slot.users)
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+
+        queued_at = time.monotonic()
+        try:
+            async with slot.lock:
+                async with self._running:
+                    wait_ms = (time.monotonic() - queued_at) * 1000
+                    self.total_wait_ms += wait_ms
+                    self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+                    if wait_ms > 1000:
+                        logger.debug(f"Update for chat {key} waited {wait_ms:.0f} ms")
+
+                    self.active += 1
+                    try:
+                        await coroutine
+                    finally:
+                        self.active -= 1
+                        self.processed_total += 1
+        finally:
+            slot.users -= 1
+            if slot.users == 0:
+                self._chats.pop(key, None)
+
+    async def initialize(self) -> None:
+        logger.info(
+            f"ChatOrderedUpdateProcessor: max_concurrency={self.max_concurrency}, "
+            f"max_pending={self.max_concurrent_updates}"
+        )
+
+    async def shutdown(self) -> None:
+        logger.info(f"ChatOrderedUpdateProcessor: stopped ({self.stats()})")
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and wait metrics"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_pending": self.max_concurrent_updates,
+            "active": self.active,
+            "waiting": self.waiting,
+            "chats": len(self._chats),
+            "peak_waiting": self.peak_waiting,
+            "peak_chat_depth": self.peak_chat_depth,
+            "processed_total": self.processed_total,
+            "avg_wait_ms": round(self.total_wait_ms / self.processed_total, 1) if self.processed_total else None,
+            "max_wait_ms": round(self.max_wait_ms, 1),
+        }
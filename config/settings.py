@@ -2,7 +2,9 @@
 Application Settings
 """
 import os
+import tempfile
 from typing import Optional
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
@@ -29,6 +31,7 @@ class Settings(BaseSettings):
     ADMIN_USERNAME: str = "admin"
     ADMIN_PASSWORD: str
     ADMIN_EMAIL: str
+    ADMIN_PAGE_SIZE: int = 50  # rows per page in dashboard lists
     
     # Payment
     SHAP_CASH_NUMBER: str
@@ -41,11 +44,65 @@ class Settings(BaseSettings):
     
     # URLs
     BOT_WEBHOOK_URL: Optional[str] = None
+    WEBHOOK_SECRET_TOKEN: Optional[str] = None  # 1-256 chars of A-Z, a-z, 0-9, _ and -
     DASHBOARD_URL: str = "http://localhost:8080"
     
+    # Shared Telegram HTTP client (utils/telegram_client.py)
+    TELEGRAM_HTTP_MAX_CONNECTIONS: int = 20
+    TELEGRAM_HTTP_MAX_KEEPALIVE: int = 10
+    TELEGRAM_HTTP_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    TELEGRAM_HTTP_TIMEOUT: float = 10.0  # seconds
+    TELEGRAM_HTTP_POOL_TIMEOUT: float = 30.0  # seconds waiting for a free connection
+    TELEGRAM_HTTP2: bool = True  # used when the h2 package is installed
+    
+    # Broadcasts (utils/broadcast.py)
+    BROADCAST_RATE_PER_SECOND: float = 30.0  # Telegram global limit
+    BROADCAST_PER_CHAT_INTERVAL: float = 1.0  # seconds between messages to one chat
+    BROADCAST_CONCURRENCY: int = 10
+    BROADCAST_BATCH_SIZE: int = 200
+    BROADCAST_MAX_RETRIES: int = 3
+    
+    # Webhook ingestion queue (utils/update_queue.py)
+    WEBHOOK_ASYNC_INGESTION: bool = True  # False: process updates inside the request (always on Vercel)
+    WEBHOOK_QUEUE_MAXSIZE: int = 1000  # beyond this the webhook answers 503
+    WEBHOOK_QUEUE_WORKERS: int = 8
+    WEBHOOK_QUEUE_PERSIST: bool = False  # journal queued updates to data/
+    WEBHOOK_DEDUP_CACHE_SIZE: int = 10000  # update_ids remembered per process
+    WEBHOOK_DEDUP_SHARED: bool = True  # also check the processed_updates collection
+    
+    # User session cache (utils/user_cache.py)
+    USER_CACHE_TTL_SECONDS: float = 30.0
+    USER_CACHE_MAX_SIZE: int = 5000
+    
+    # Update logging (utils/update_logging.py)
+    UPDATE_LOG_SAMPLE_RATE: int = 20  # log 1 in N incoming updates (DEBUG level, only when DEBUG is on)
+    
+    # Report jobs (utils/report_jobs.py)
+    REPORT_JOB_WORKERS: int = 2  # reports generated at once
+    REPORT_CACHE_DIR: str = "data/reports"  # default on Vercel: <tmp>/reports
+    REPORT_PDF_WORKERS: int = 2  # render processes (0: render in a thread; always 0 on Vercel)
+    REPORT_PDF_FONT_PATH: Optional[str] = None  # TTF with Arabic glyphs (default: DejaVu Sans if installed)
+    
+    # Bot update processing (bot/update_processor.py)
+    BOT_MAX_CONCURRENT_UPDATES: int = 16  # handlers running at once, one per chat
+    BOT_MAX_PENDING_UPDATES: int = 512  # updates accepted before callers wait
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
+    
+    @model_validator(mode="after")
+    def _serverless_overrides(self):
+        if os.getenv("VERCEL"):
+            # Vercel may freeze the function once the response is sent, so an
+            # update acknowledged before it is processed could be lost
+            self.WEBHOOK_ASYNC_INGESTION = False
+            # No multiprocessing semaphores in the Vercel runtime
+            self.REPORT_PDF_WORKERS = 0
+            # Only the temp directory is writable there
+            if "REPORT_CACHE_DIR" not in self.model_fields_set:
+                self.REPORT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "reports")
+        return self
 
 
 settings = Settings()
@@ -13,7 +13,32 @@ from database.models.user import User
 from database.models.video import Video
 from database.models.assignment import Assignment, AssignmentSubmission
 from database.models.notification import Notification
-from database.models.quiz import Quiz
+from database.models.quiz import Quiz, QuizAttempt
+from database.models.grade_summary import StudentGradeSummary
+from database.models.broadcast import BroadcastJob
+from database.models.scheduled_job import ScheduledJob
+from database.models.processed_update import ProcessedUpdate
+from database.models.report_cache import DataVersion, ReportArtifact
+from database.models.achievement_progress import AchievementProgress
+
+
+# Every Beanie document of the platform
+DOCUMENT_MODELS = [
+    User,
+    Video,
+    Assignment,
+    AssignmentSubmission,
+    Notification,
+    Quiz,
+    QuizAttempt,
+    StudentGradeSummary,
+    BroadcastJob,
+    ScheduledJob,
+    ProcessedUpdate,
+    DataVersion,
+    ReportArtifact,
+    AchievementProgress,
+]
 
 
 class Database:
@@ -81,14 +106,7 @@ class Database:
                         logger.debug(f"Initializing Beanie with database: {db_name}")
                         await init_beanie(
                             database=cls.client[db_name],
-                            document_models=[
-                                User,
-                                Video,
-                                Assignment,
-                                AssignmentSubmission,
-                                Notification,
-                                Quiz,
-                            ]
+                            document_models=DOCUMENT_MODELS
                         )
                         cls.beanie_initialized = True
                         logger.info("✅ Beanie ODM initialized successfully")
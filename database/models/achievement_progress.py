@@ -0,0 +1,51 @@
+"""
+Achievement Progress Model - per-student counters behind the achievements
+نموذج تقدم الإنجازات - عدادات كل طالب التي تحدد الشارات
+"""
+from datetime import datetime
+from typing import List, Optional
+from beanie import Document
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+
+
+class AchievementProgress(Document):
+    """
+    Running counters of a student's activity, updated by one atomic update
+    per event (see utils/achievements.py), plus the unlocked achievements.
+    """
+    user_id: str  # telegram_id
+
+    # Activity
+    logins: int = 0
+    last_login_day: Optional[str] = None  # YYYY-MM-DD (UTC)
+    login_streak: int = 0  # consecutive days ending on last_login_day
+    best_login_streak: int = 0
+    enrollments: int = 0
+
+    # Assignments
+    submissions: int = 0  # distinct assignments submitted
+    on_time_submissions: int = 0
+    first_submissions: int = 0  # assignments this student submitted first
+    graded_count: int = 0
+    grade_percent_sum: float = 0  # sum of grade / max_grade * 100
+    perfect_scores: int = 0
+
+    # Quizzes
+    passed_quiz_ids: List[str] = Field(default_factory=list)
+
+    # Unlocked achievements
+    unlocked: List[str] = Field(default_factory=list)
+    points: int = 0
+
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "achievement_progress"
+        indexes = [
+            IndexModel([("user_id", ASCENDING)], unique=True, name="user_unique"),
+        ]
+
+    @property
+    def average_grade_percent(self) -> float:
+        return self.grade_percent_sum / self.graded_count if self.graded_count else 0
@@ -3,12 +3,21 @@ Assignment Model
 """
 from datetime import datetime
 from typing import Optional, List
-from beanie import Document
+from beanie import (
+    Delete, Document, Insert, PydanticObjectId, Replace, Save, SaveChanges, Update,
+    UpdateResponse, after_event,
+)
+from beanie.operators import Set, SetOnInsert
 from pydantic import Field
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from database.models.grade_summary import StudentGradeSummary
+from database.models.report_cache import REPORT_SCOPE_ASSIGNMENTS, REPORT_SCOPE_GRADES, DataVersion, student_scope
 
 
 class AssignmentSubmission(Document):
-    """Assignment submission sub-document"""
+    """Assignment submission - one document per (assignment, student)"""
+    assignment_id: PydanticObjectId
     user_id: str
     submitted_at: datetime = Field(default_factory=datetime.utcnow)
     file_id: Optional[str] = None  # Telegram file ID
@@ -18,6 +27,24 @@ class AssignmentSubmission(Document):
     graded_by: Optional[str] = None  # admin telegram_id
     graded_at: Optional[datetime] = None
     status: str = "submitted"  # submitted, graded, returned
+    
+    class Settings:
+        name = "assignment_submissions"
+        indexes = [
+            IndexModel(
+                [("assignment_id", ASCENDING), ("user_id", ASCENDING)],
+                unique=True,
+                name="assignment_user_unique",
+            ),
+            IndexModel([("user_id", ASCENDING), ("submitted_at", DESCENDING)]),
+            IndexModel([("assignment_id", ASCENDING), ("status", ASCENDING)]),
+            IndexModel([("submitted_at", DESCENDING)]),
+        ]
+    
+    @after_event(Insert, Save, Replace, SaveChanges, Update, Delete)
+    async def _bump_report_version(self):
+        """Reports built from submissions are stale now (utils/report_jobs.py)"""
+        await DataVersion.bump(REPORT_SCOPE_GRADES, student_scope(REPORT_SCOPE_GRADES, self.user_id))
 
 
 class Assignment(Document):
@@ -42,8 +69,8 @@ class Assignment(Document):
     max_grade: int = 100
     pass_grade: int = 60
     
-    # Submissions
-    submissions: List[AssignmentSubmission] = Field(default_factory=list)
+    # Submissions are stored in the assignment_submissions collection
+    # (see AssignmentSubmission and migrate_submissions.py)
     
     # Metadata
     created_by: str
@@ -62,35 +89,89 @@ class Assignment(Document):
             ("related_to", "related_id"),
         ]
     
-    def get_submission(self, user_id: str) -> Optional[AssignmentSubmission]:
+    @after_event(Insert, Save, Replace, SaveChanges, Update, Delete)
+    async def _bump_report_version(self):
+        """Reports built from assignments are stale now (utils/report_jobs.py)"""
+        await DataVersion.bump(REPORT_SCOPE_GRADES, REPORT_SCOPE_ASSIGNMENTS)
+    
+    def _submission_query(self, user_id: str):
+        return AssignmentSubmission.find_one(
+            AssignmentSubmission.assignment_id == self.id,
+            AssignmentSubmission.user_id == user_id
+        )
+    
+    async def get_submissions(self, status: Optional[str] = None) -> List[AssignmentSubmission]:
+        """Get all submissions for this assignment"""
+        query = AssignmentSubmission.find(AssignmentSubmission.assignment_id == self.id)
+        if status:
+            query = query.find(AssignmentSubmission.status == status)
+        return await query.sort(+AssignmentSubmission.submitted_at).to_list()
+    
+    async def count_submissions(self, status: Optional[str] = None) -> int:
+        """Count submissions for this assignment"""
+        query = AssignmentSubmission.find(AssignmentSubmission.assignment_id == self.id)
+        if status:
+            query = query.find(AssignmentSubmission.status == status)
+        return await query.count()
+    
+    async def get_submission(self, user_id: str) -> Optional[AssignmentSubmission]:
         """Get user's submission"""
-        for submission in self.submissions:
-            if submission.user_id == user_id:
-                return submission
-        return None
+        return await self._submission_query(user_id)
     
-    def has_submitted(self, user_id: str) -> bool:
+    async def has_submitted(self, user_id: str) -> bool:
         """Check if user has submitted"""
-        return self.get_submission(user_id) is not None
+        return await AssignmentSubmission.find(
+            AssignmentSubmission.assignment_id == self.id,
+            AssignmentSubmission.user_id == user_id
+        ).count() > 0
     
     async def add_submission(
         self,
         user_id: str,
         file_id: Optional[str] = None,
         text_answer: Optional[str] = None
-    ):
-        """Add new submission"""
-        # Remove old submission if exists
-        self.submissions = [s for s in self.submissions if s.user_id != user_id]
-        
-        submission = AssignmentSubmission(
-            user_id=user_id,
-            file_id=file_id,
-            text_answer=text_answer
+    ) -> Optional[AssignmentSubmission]:
+        """Add new submission (replaces the previous one atomically)"""
+        now = datetime.utcnow()
+        previous = await self._submission_query(user_id).update(
+            Set({
+                AssignmentSubmission.submitted_at: now,
+                AssignmentSubmission.file_id: file_id,
+                AssignmentSubmission.text_answer: text_answer,
+                AssignmentSubmission.grade: None,
+                AssignmentSubmission.feedback: None,
+                AssignmentSubmission.graded_by: None,
+                AssignmentSubmission.graded_at: None,
+                AssignmentSubmission.status: "submitted",
+            }),
+            SetOnInsert({
+                AssignmentSubmission.assignment_id: self.id,
+                AssignmentSubmission.user_id: user_id,
+            }),
+            upsert=True,
+            response_type=UpdateResponse.OLD_DOCUMENT  # None when inserted
         )
-        self.submissions.append(submission)
-        self.updated_at = datetime.utcnow()
-        await self.save()
+        
+        # A resubmission clears the previous grade
+        if previous and previous.grade is not None:
+            await StudentGradeSummary.apply_grade_change(user_id, previous.grade, None, self.max_grade)
+        
+        # Query-level updates do not fire the document event hooks
+        await DataVersion.bump(REPORT_SCOPE_GRADES, student_scope(REPORT_SCOPE_GRADES, user_id))
+        
+        from utils.achievements import EVENT_GRADE, EVENT_SUBMISSION, record_achievement_event
+        if previous is None:
+            await record_achievement_event(
+                user_id, EVENT_SUBMISSION,
+                on_time=self.deadline is not None and now <= self.deadline,
+                first_submitter=await self.count_submissions() == 1
+            )
+        elif previous.grade is not None:
+            await record_achievement_event(
+                user_id, EVENT_GRADE, grade=None, previous_grade=previous.grade, max_grade=self.max_grade
+            )
+        
+        return await self.get_submission(user_id)
     
     async def grade_submission(
         self,
@@ -98,17 +179,36 @@ class Assignment(Document):
         grade: int,
         feedback: str,
         graded_by: str
-    ):
+    ) -> Optional[AssignmentSubmission]:
         """Grade a submission"""
-        submission = self.get_submission(user_id)
-        if submission:
-            submission.grade = grade
-            submission.feedback = feedback
-            submission.graded_by = graded_by
-            submission.graded_at = datetime.utcnow()
-            submission.status = "graded"
-            self.updated_at = datetime.utcnow()
-            await self.save()
+        graded_at = datetime.utcnow()
+        submission = await self._submission_query(user_id).update(
+            Set({
+                AssignmentSubmission.grade: grade,
+                AssignmentSubmission.feedback: feedback,
+                AssignmentSubmission.graded_by: graded_by,
+                AssignmentSubmission.graded_at: graded_at,
+                AssignmentSubmission.status: "graded",
+            }),
+            response_type=UpdateResponse.OLD_DOCUMENT
+        )
+        if not submission:
+            return None
+        
+        await StudentGradeSummary.apply_grade_change(user_id, submission.grade, grade, self.max_grade)
+        await DataVersion.bump(REPORT_SCOPE_GRADES, student_scope(REPORT_SCOPE_GRADES, user_id))
+        
+        from utils.achievements import EVENT_GRADE, record_achievement_event
+        await record_achievement_event(
+            user_id, EVENT_GRADE, grade=grade, previous_grade=submission.grade, max_grade=self.max_grade
+        )
+        
+        submission.grade = grade
+        submission.feedback = feedback
+        submission.graded_by = graded_by
+        submission.graded_at = graded_at
+        submission.status = "graded"
+        return submission
     
     def is_past_deadline(self) -> bool:
         """Check if past deadline"""
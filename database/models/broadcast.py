@@ -0,0 +1,65 @@
+"""
+Broadcast Job Model - background announcement to all students
+نموذج مهمة البث - إرسال إعلان لجميع الطلاب في الخلفية
+"""
+from datetime import datetime
+from typing import Optional
+from beanie import Document
+from pydantic import Field
+
+
+class BroadcastJob(Document):
+    """Progress of a background broadcast (see utils/broadcast.py)"""
+    title: str
+    message: str
+    text: str  # final text sent to Telegram
+    notification_type: str = "admin"
+    created_by: str
+
+    # Status
+    status: str = "queued"  # queued, running, completed, failed
+    total: int = 0
+    sent_count: int = 0
+    failed_count: int = 0
+    last_error: Optional[str] = None
+
+    # Resume point: users are processed in telegram_id order and every
+    # finished batch advances the cursor
+    cursor: Optional[int] = None
+
+    # Lease held by the process running the job; an expired lease means the
+    # process died and another one may resume the job
+    lease_until: Optional[datetime] = None
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "broadcast_jobs"
+        indexes = [
+            "status",
+            [("created_at", -1)],
+        ]
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def to_progress(self) -> dict:
+        """Progress summary for the dashboard"""
+        processed = self.sent_count + self.failed_count
+        return {
+            "job_id": str(self.id),
+            "status": self.status,
+            "total": self.total,
+            "sent": self.sent_count,
+            "failed": self.failed_count,
+            "processed": processed,
+            "progress": round(processed / self.total * 100, 1) if self.total else 100.0,
+            "last_error": self.last_error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
@@ -0,0 +1,98 @@
+"""
+Student Grade Summary Model - per-student grade rollup
+نموذج ملخص درجات الطالب
+"""
+from datetime import datetime
+from typing import List, Optional, Union
+from beanie import Document
+from loguru import logger
+from pydantic import Field
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+
+class StudentGradeSummary(Document):
+    """
+    Running totals of a student's grades (database submissions and JSON
+    submissions), kept up to date whenever a grade is given or replaced.
+    Grades are stored as percentages of each assignment's max_grade, so
+    assignments graded on different scales average correctly.
+    """
+    user_id: str  # telegram_id
+    grade_sum: float = 0  # sum of grade / max_grade * 100
+    graded_count: int = 0
+    average_grade: float = 0  # percent
+    best_grade: Optional[float] = None  # highest grade ever given (percent)
+    last_graded_at: Optional[datetime] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "student_grade_summaries"
+        indexes = [
+            IndexModel([("user_id", ASCENDING)], unique=True, name="user_unique"),
+            # Leaderboard: walked in order and stopped after `limit`
+            IndexModel(
+                [("average_grade", DESCENDING)],
+                name="leaderboard",
+                partialFilterExpression={"graded_count": {"$gt": 0}},
+            ),
+        ]
+
+    @classmethod
+    async def apply_grade_change(
+        cls,
+        user_id: Union[str, int],
+        previous_grade: Optional[float],
+        new_grade: Optional[float],
+        max_grade: float = 100,
+        previous_max_grade: Optional[float] = None
+    ):
+        """
+        Update the rollup after a submission's grade changed from
+        previous_grade to new_grade (None = ungraded), both out of max_grade
+        unless previous_max_grade says otherwise.
+        """
+        max_grade = max_grade or 100
+        if previous_grade is not None:
+            previous_grade = previous_grade / (previous_max_grade or max_grade) * 100
+        if new_grade is not None:
+            new_grade = new_grade / max_grade * 100
+        delta_sum = (new_grade or 0) - (previous_grade or 0)
+        delta_count = (new_grade is not None) - (previous_grade is not None)
+        if delta_sum == 0 and delta_count == 0 and new_grade is None:
+            return
+
+        user_id = str(user_id)
+        now = datetime.utcnow()
+        changes = {
+            'grade_sum': {'$add': [{'$ifNull': ['$grade_sum', 0]}, delta_sum]},
+            'graded_count': {'$add': [{'$ifNull': ['$graded_count', 0]}, delta_count]},
+            'updated_at': now,
+        }
+        if new_grade is not None:
+            changes['best_grade'] = {'$max': ['$best_grade', new_grade]}
+            changes['last_graded_at'] = now
+
+        try:
+            # Single atomic pipeline update (upserted) so concurrent grades
+            # for the same student cannot lose each other's increments; the
+            # average is stored so the leaderboard can sort on an index.
+            await cls.find_one(cls.user_id == user_id).update(
+                [
+                    {'$set': changes},
+                    {'$set': {'average_grade': {'$cond': [
+                        {'$gt': ['$graded_count', 0]},
+                        {'$divide': ['$grade_sum', '$graded_count']},
+                        0,
+                    ]}}},
+                ],
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Failed to update grade summary for {user_id}: {e}")
+
+    @classmethod
+    async def get_leaderboard(cls, limit: int = 10) -> List["StudentGradeSummary"]:
+        """Top students by average grade"""
+        return await cls.find(
+            cls.graded_count > 0
+        ).sort(-cls.average_grade).limit(limit).to_list()
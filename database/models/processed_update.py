@@ -0,0 +1,30 @@
+"""
+Processed Update Model - update_ids already accepted by a webhook replica
+نموذج التحديثات المستلمة - معرفات التحديثات التي تم استلامها مسبقاً
+"""
+from datetime import datetime
+from beanie import Document
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+
+
+# Telegram keeps undelivered updates for 24 hours, so a redelivery can
+# never be older than that
+PROCESSED_UPDATE_TTL_SECONDS = 24 * 60 * 60
+
+
+class ProcessedUpdate(Document):
+    """One received update (see utils/webhook_guard.py)"""
+    update_id: int
+    received_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "processed_updates"
+        indexes = [
+            IndexModel([("update_id", ASCENDING)], unique=True, name="update_id_unique"),
+            IndexModel(
+                [("received_at", ASCENDING)],
+                expireAfterSeconds=PROCESSED_UPDATE_TTL_SECONDS,
+                name="received_at_ttl"
+            ),
+        ]
@@ -4,8 +4,10 @@ Quiz Model - Auto-graded quizzes
 """
 from datetime import datetime
 from typing import List, Optional
-from beanie import Document
+from beanie import Document, PydanticObjectId, UpdateResponse
+from beanie.operators import Set
 from pydantic import Field, BaseModel
+from pymongo import ASCENDING, IndexModel
 
 
 class QuizOption(BaseModel):
@@ -22,8 +24,9 @@ class QuizQuestion(BaseModel):
     explanation: Optional[str] = None  # Explanation shown after answering
 
 
-class QuizAttempt(BaseModel):
-    """Quiz attempt model"""
+class QuizAttempt(Document):
+    """Quiz attempt - one document per attempt"""
+    quiz_id: PydanticObjectId
     user_id: str
     started_at: datetime = Field(default_factory=datetime.utcnow)
     completed_at: Optional[datetime] = None
@@ -32,6 +35,16 @@ class QuizAttempt(BaseModel):
     max_score: Optional[int] = None
     passed: bool = False
     time_taken_seconds: Optional[int] = None
+    
+    class Settings:
+        name = "quiz_attempts"
+        indexes = [
+            IndexModel(
+                [("quiz_id", ASCENDING), ("user_id", ASCENDING), ("started_at", ASCENDING)],
+                name="quiz_user_started",
+            ),
+            IndexModel([("user_id", ASCENDING), ("passed", ASCENDING)]),
+        ]
 
 
 class Quiz(Document):
@@ -59,8 +72,8 @@ class Quiz(Document):
     available_from: Optional[datetime] = None
     available_until: Optional[datetime] = None
     
-    # Attempts
-    attempts: List[QuizAttempt] = Field(default_factory=list)
+    # Attempts are stored in the quiz_attempts collection
+    # (see QuizAttempt and migrate_quiz_attempts.py)
     
     # Metadata
     created_by: str
@@ -76,15 +89,21 @@ class Quiz(Document):
             ("related_to", "related_id"),
         ]
     
-    def get_user_attempts(self, user_id: str) -> List[QuizAttempt]:
-        """Get all attempts by a user"""
-        return [a for a in self.attempts if a.user_id == user_id]
+    def _attempts_query(self, user_id: str):
+        return QuizAttempt.find(
+            QuizAttempt.quiz_id == self.id,
+            QuizAttempt.user_id == user_id
+        )
+    
+    async def get_user_attempts(self, user_id: str) -> List[QuizAttempt]:
+        """Get all attempts by a user (oldest first)"""
+        return await self._attempts_query(user_id).sort(+QuizAttempt.started_at).to_list()
     
-    def get_attempts_count(self, user_id: str) -> int:
+    async def get_attempts_count(self, user_id: str) -> int:
         """Get number of attempts by user"""
-        return len(self.get_user_attempts(user_id))
+        return await self._attempts_query(user_id).count()
     
-    def can_attempt(self, user_id: str) -> bool:
+    async def can_attempt(self, user_id: str) -> bool:
         """Check if user can attempt quiz"""
         if not self.is_active:
             return False
@@ -97,21 +116,17 @@ class Quiz(Document):
             return False
         
         # Check max attempts
-        attempts_count = self.get_attempts_count(user_id)
+        attempts_count = await self.get_attempts_count(user_id)
         if attempts_count >= self.max_attempts:
             return False
         
         return True
     
-    def get_best_attempt(self, user_id: str) -> Optional[QuizAttempt]:
+    async def get_best_attempt(self, user_id: str) -> Optional[QuizAttempt]:
         """Get best attempt by user"""
-        attempts = self.get_user_attempts(user_id)
-        completed = [a for a in attempts if a.completed_at is not None]
-        
-        if not completed:
-            return None
-        
-        return max(completed, key=lambda a: a.score or 0)
+        return await self._attempts_query(user_id).find(
+            QuizAttempt.completed_at != None  # noqa: E711
+        ).sort(-QuizAttempt.score, +QuizAttempt.started_at).first_or_none()
     
     def calculate_score(self, answers: List[int]) -> tuple[int, int]:
         """Calculate score from answers"""
@@ -131,13 +146,11 @@ class Quiz(Document):
     
     async def start_attempt(self, user_id: str) -> Optional[QuizAttempt]:
         """Start new quiz attempt"""
-        if not self.can_attempt(user_id):
+        if not await self.can_attempt(user_id):
             return None
         
-        attempt = QuizAttempt(user_id=user_id)
-        self.attempts.append(attempt)
-        self.updated_at = datetime.utcnow()
-        await self.save()
+        attempt = QuizAttempt(quiz_id=self.id, user_id=user_id)
+        await attempt.insert()
         
         return attempt
     
@@ -148,32 +161,36 @@ class Quiz(Document):
     ) -> Optional[QuizAttempt]:
         """Submit and grade quiz attempt"""
         # Find the latest incomplete attempt
-        user_attempts = [a for a in self.attempts if a.user_id == user_id]
-        incomplete = [a for a in user_attempts if a.completed_at is None]
+        attempt = await self._attempts_query(user_id).find(
+            QuizAttempt.completed_at == None  # noqa: E711
+        ).sort(-QuizAttempt.started_at).first_or_none()
         
-        if not incomplete:
+        if not attempt:
             return None
         
-        attempt = incomplete[-1]
-        
         # Calculate score
         score, max_score = self.calculate_score(answers)
         percentage = (score / max_score * 100) if max_score > 0 else 0
-        
-        # Update attempt
-        attempt.completed_at = datetime.utcnow()
-        attempt.answers = answers
-        attempt.score = score
-        attempt.max_score = max_score
-        attempt.passed = percentage >= self.pass_percentage
-        attempt.time_taken_seconds = int(
-            (attempt.completed_at - attempt.started_at).total_seconds()
+        completed_at = datetime.utcnow()
+        
+        # Complete the attempt atomically; the completed_at guard makes a
+        # concurrent (double) submit of the same attempt a no-op
+        return await QuizAttempt.find_one(
+            QuizAttempt.id == attempt.id,
+            QuizAttempt.completed_at == None  # noqa: E711
+        ).update(
+            Set({
+                QuizAttempt.completed_at: completed_at,
+                QuizAttempt.answers: answers,
+                QuizAttempt.score: score,
+                QuizAttempt.max_score: max_score,
+                QuizAttempt.passed: percentage >= self.pass_percentage,
+                QuizAttempt.time_taken_seconds: int(
+                    (completed_at - attempt.started_at).total_seconds()
+                ),
+            }),
+            response_type=UpdateResponse.NEW_DOCUMENT
         )
-        
-        self.updated_at = datetime.utcnow()
-        await self.save()
-        
-        return attempt
     
     def get_question_result(
         self,
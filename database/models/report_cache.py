@@ -0,0 +1,80 @@
+"""
+Report Cache Models - data versions and generated report artifacts
+نماذج ذاكرة التقارير - إصدارات البيانات والتقارير المولدة
+"""
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+from beanie import Document
+from loguru import logger
+from pydantic import Field, PrivateAttr
+from pymongo import ASCENDING, IndexModel
+
+
+# Data scopes reports depend on
+REPORT_SCOPE_USERS = "users"
+REPORT_SCOPE_GRADES = "grades"  # assignments and submissions
+REPORT_SCOPE_ASSIGNMENTS = "assignments"  # assignment definitions only
+
+
+def student_scope(scope: str, telegram_id) -> str:
+    """The part of a scope that concerns one student (e.g. "users:123")"""
+    return f"{scope}:{telegram_id}"
+
+
+class DataVersion(Document):
+    """
+    Change counter of a data scope ("users", "grades"). Writes that change
+    report content bump it; a cached report is valid while the versions
+    it was built from are unchanged.
+    """
+    scope: str
+    version: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "data_versions"
+        indexes = [
+            IndexModel([("scope", ASCENDING)], unique=True, name="scope_unique"),
+        ]
+
+    @classmethod
+    async def bump(cls, *scopes: str):
+        """Increment the version of each scope (never raises)"""
+        for scope in scopes:
+            try:
+                await cls.find_one(cls.scope == scope).update(
+                    {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+                    upsert=True
+                )
+            except Exception as e:
+                logger.error(f"Failed to bump data version {scope}: {e}")
+
+    @classmethod
+    async def current(cls, scopes: Iterable[str]) -> Dict[str, int]:
+        """{scope: version} (0 for scopes never bumped)"""
+        scopes = list(scopes)
+        versions = {scope: 0 for scope in scopes}
+        async for doc in cls.find({"scope": {"$in": scopes}}):
+            versions[doc.scope] = doc.version
+        return versions
+
+
+class ReportArtifact(Document):
+    """Last generated file of one report (see utils/report_jobs.py)"""
+    report_key: str  # report type + parameters
+    etag: str  # data versions the file was built from
+    filename: str
+    path: str  # local copy of the file
+    size: int = 0
+    telegram_file_id: Optional[str] = None  # set once the file was sent
+    generation_ms: int = 0
+    generated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    # Content of an artifact that could not be written to the cache (not stored)
+    _data: Optional[bytes] = PrivateAttr(default=None)
+
+    class Settings:
+        name = "report_artifacts"
+        indexes = [
+            IndexModel([("report_key", ASCENDING)], unique=True, name="report_key_unique"),
+        ]
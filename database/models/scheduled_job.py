@@ -0,0 +1,67 @@
+"""
+Scheduled Job Model - persisted state of a recurring background job
+نموذج المهام المجدولة - حالة المهام الدورية المحفوظة
+"""
+from datetime import datetime
+from typing import Optional
+from beanie import Document
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+
+
+class ScheduledJob(Document):
+    """One recurring job (see utils/scheduler.py)"""
+    name: str
+    schedule: str  # cron expression, UTC
+    enabled: bool = True
+
+    # Next planned run; a run is due once this is in the past
+    next_run_at: datetime
+
+    # Lease: the replica running the job and until when it owns it
+    lease_owner: Optional[str] = None
+    lease_until: Optional[datetime] = None
+
+    # Timing metrics
+    last_started_at: Optional[datetime] = None
+    last_finished_at: Optional[datetime] = None
+    last_duration_ms: Optional[int] = None
+    max_duration_ms: int = 0
+    total_duration_ms: int = 0
+    last_status: Optional[str] = None  # success, failed
+    last_error: Optional[str] = None
+    last_delay_ms: Optional[int] = None  # how late the last run started
+    run_count: int = 0
+    failure_count: int = 0
+    missed_runs: int = 0  # scheduled runs coalesced into a catch-up run
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "scheduled_jobs"
+        indexes = [
+            IndexModel([("name", ASCENDING)], unique=True, name="name_unique"),
+            IndexModel([("enabled", ASCENDING), ("next_run_at", ASCENDING)]),
+        ]
+
+    def to_metrics(self) -> dict:
+        """Timing metrics for monitoring"""
+        return {
+            "name": self.name,
+            "schedule": self.schedule,
+            "enabled": self.enabled,
+            "next_run_at": self.next_run_at.isoformat(),
+            "running": bool(self.lease_until and self.lease_until > datetime.utcnow()),
+            "lease_owner": self.lease_owner,
+            "last_status": self.last_status,
+            "last_error": self.last_error,
+            "last_started_at": self.last_started_at.isoformat() if self.last_started_at else None,
+            "last_duration_ms": self.last_duration_ms,
+            "avg_duration_ms": self.total_duration_ms // self.run_count if self.run_count else None,
+            "max_duration_ms": self.max_duration_ms,
+            "last_delay_ms": self.last_delay_ms,
+            "run_count": self.run_count,
+            "failure_count": self.failure_count,
+            "missed_runs": self.missed_runs,
+        }
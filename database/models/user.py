@@ -1,10 +1,16 @@
 """
 User Model
 """
-from datetime import datetime
-from typing import List, Optional
-from beanie import Document
-from pydantic import BaseModel, Field, EmailStr
+import re
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from beanie import Delete, Document, Insert, Replace, Save, SaveChanges, Update, after_event, before_event
+from beanie.operators import Set
+from pydantic import BaseModel, Field, EmailStr, model_validator
+from beanie import PydanticObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from database.models.report_cache import REPORT_SCOPE_USERS, DataVersion, student_scope
 
 
 class CourseEnrollment(BaseModel):
@@ -59,6 +65,42 @@ class ProjectEnrollment(BaseModel):
     feedback: Optional[str] = None
 
 
+class UserSummary(BaseModel):
+    """Projection of a user for list views (no enrollment documents)"""
+    id: PydanticObjectId = Field(alias="_id")
+    telegram_id: int
+    full_name: str
+    phone: str
+    email: str
+    registered_at: datetime
+    course_count: int = 0
+    
+    class Settings:
+        projection = {
+            "_id": 1,
+            "telegram_id": 1,
+            "full_name": 1,
+            "phone": 1,
+            "email": 1,
+            "registered_at": 1,
+            "course_count": {"$size": {"$ifNull": ["$courses", []]}},
+        }
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def encode_user_cursor(user: UserSummary) -> str:
+    """Keyset cursor (registered_at ms + _id) after `user`; short enough for callback_data"""
+    ms = (user.registered_at - _EPOCH) // timedelta(milliseconds=1)
+    return f"{ms}-{user.id}"
+
+
+def decode_user_cursor(cursor: str) -> Tuple[datetime, PydanticObjectId]:
+    ms, object_id = cursor.split("-", 1)
+    return _EPOCH + timedelta(milliseconds=int(ms)), PydanticObjectId(object_id)
+
+
 class User(Document):
     """User model"""
     telegram_id: int = Field(unique=True)
@@ -74,6 +116,15 @@ class User(Document):
     materials: List[MaterialEnrollment] = Field(default_factory=list)
     projects: List[ProjectEnrollment] = Field(default_factory=list)
     
+    # Ids with approval_status == "approved", derived from the enrollments
+    # on load and before every save (multikey-indexed for audience queries)
+    approved_course_ids: List[str] = Field(default_factory=list)
+    approved_material_ids: List[str] = Field(default_factory=list)
+    
+    # enrolled_at of the oldest pending enrollment (None when nothing is
+    # pending); the partial pending_queue index only holds these users
+    pending_since: Optional[datetime] = None
+    
     # Statistics
     total_videos_watched: int = 0
     total_assignments_submitted: int = 0
@@ -85,8 +136,127 @@ class User(Document):
         indexes = [
             "telegram_id",
             "email",
+            "phone",
+            "full_name",
+            IndexModel([("registered_at", DESCENDING), ("_id", DESCENDING)], name="registration_order"),
+            IndexModel(
+                [("courses.course_id", ASCENDING), ("courses.approval_status", ASCENDING)],
+                name="course_approval",
+            ),
+            IndexModel([("approved_course_ids", ASCENDING)], name="approved_courses"),
+            IndexModel([("approved_material_ids", ASCENDING)], name="approved_materials"),
+            IndexModel(
+                [("pending_since", ASCENDING), ("_id", ASCENDING)],
+                name="pending_queue",
+                partialFilterExpression={"pending_since": {"$type": "date"}},
+            ),
         ]
     
+    @model_validator(mode="after")
+    def _derive_access_sets(self):
+        self.refresh_access_sets()
+        self.refresh_pending_since()
+        return self
+    
+    @before_event(Insert, Save, Replace, SaveChanges)
+    def refresh_access_sets(self):
+        """Recompute approved_course_ids / approved_material_ids from the enrollments"""
+        self.approved_course_ids = [
+            e.course_id for e in self.courses if e.approval_status == "approved"
+        ]
+        self.approved_material_ids = [
+            e.material_id for e in self.materials if e.approval_status == "approved"
+        ]
+    
+    @before_event(Insert, Save, Replace, SaveChanges)
+    def refresh_pending_since(self):
+        """Recompute pending_since from the enrollments"""
+        pending = [
+            e.enrolled_at for e in [*self.courses, *self.materials]
+            if e.approval_status == "pending"
+        ]
+        self.pending_since = min(pending) if pending else None
+    
+    @after_event(Insert, Save, Replace, SaveChanges, Update, Delete)
+    def _invalidate_cached_session(self):
+        """Drop this user from the session cache (utils/user_cache.py)"""
+        from utils.user_cache import user_cache
+        user_cache.invalidate(self.telegram_id)
+    
+    @after_event(Insert, Save, Replace, SaveChanges, Update, Delete)
+    async def _bump_report_version(self):
+        """
+        Reports built from users are stale now (utils/report_jobs.py).
+        Document writes are profile, enrollment and role changes; visits go
+        through update_last_active, which skips the hooks.
+        """
+        await DataVersion.bump(REPORT_SCOPE_USERS, student_scope(REPORT_SCOPE_USERS, self.telegram_id))
+    
+    @staticmethod
+    def approved_in_course_filter(course_id: str) -> dict:
+        """Query filter for users with approved access to a course"""
+        return {"approved_course_ids": course_id}
+    
+    @staticmethod
+    def approved_in_material_filter(material_id: str) -> dict:
+        """Query filter for users with approved access to a material"""
+        return {"approved_material_ids": material_id}
+    
+    @staticmethod
+    def pending_filter() -> dict:
+        """Query filter for users with a pending enrollment (uses the pending_queue index)"""
+        return {"pending_since": {"$type": "date"}}
+    
+    @classmethod
+    def find_approved_in_course(cls, course_id: str):
+        """Users with approved access to a course (uses the approved_courses index)"""
+        return cls.find(cls.approved_in_course_filter(course_id))
+    
+    @classmethod
+    def find_approved_in_material(cls, material_id: str):
+        """Users with approved access to a material (uses the approved_materials index)"""
+        return cls.find(cls.approved_in_material_filter(material_id))
+    
+    @staticmethod
+    def search_filter(query: str) -> dict:
+        """Query filter matching a name/phone/email prefix (each field is indexed)"""
+        prefix = {"$regex": f"^{re.escape(query.strip())}"}
+        return {"$or": [{"full_name": prefix}, {"phone": prefix}, {"email": prefix}]}
+    
+    @classmethod
+    async def find_page(
+        cls,
+        after: Optional[str] = None,
+        search: Optional[str] = None,
+        limit: int = 50,
+        exclude_telegram_id: Optional[int] = None,
+    ) -> Tuple[List[UserSummary], Optional[str]]:
+        """
+        One page of users, newest first, as UserSummary projections.
+        `after` is the cursor returned with the previous page; the returned
+        cursor is None on the last page. Uses the registration_order index.
+        """
+        filters = []
+        if search and search.strip():
+            filters.append(cls.search_filter(search))
+        if exclude_telegram_id is not None:
+            filters.append({"telegram_id": {"$ne": exclude_telegram_id}})
+        if after:
+            registered_at, object_id = decode_user_cursor(after)
+            filters.append({"$or": [
+                {"registered_at": {"$lt": registered_at}},
+                {"registered_at": registered_at, "_id": {"$lt": object_id}},
+            ]})
+        
+        users = await cls.find(*filters).sort(
+            [("registered_at", DESCENDING), ("_id", DESCENDING)]
+        ).limit(limit + 1).project(UserSummary).to_list()
+        
+        if len(users) > limit:
+            users = users[:limit]
+            return users, encode_user_cursor(users[-1])
+        return users, None
+    
     def get_course_enrollment(self, course_id: str) -> Optional[CourseEnrollment]:
         """Get course enrollment"""
         for enrollment in self.courses:
@@ -103,13 +273,11 @@ class User(Document):
     
     def has_approved_course(self, course_id: str) -> bool:
         """Check if user has approved access to course"""
-        enrollment = self.get_course_enrollment(course_id)
-        return enrollment and enrollment.approval_status == "approved"
+        return course_id in self.approved_course_ids
     
     def has_approved_material(self, material_id: str) -> bool:
         """Check if user has approved access to material"""
-        enrollment = self.get_material_enrollment(material_id)
-        return enrollment and enrollment.approval_status == "approved"
+        return material_id in self.approved_material_ids
     
     async def add_course_enrollment(
         self,
@@ -152,6 +320,14 @@ class User(Document):
         await self.save()
     
     async def update_last_active(self):
-        """Update last active timestamp"""
-        self.last_active = datetime.utcnow()
-        await self.save()
+        """
+        Update last active timestamp. A query-level update, so a visit does
+        not drop cached sessions or invalidate reports; reports only show
+        the day, so they are invalidated when the day changes.
+        """
+        now = datetime.utcnow()
+        new_day = self.last_active.date() != now.date()
+        self.last_active = now
+        await User.find_one(User.id == self.id).update(Set({User.last_active: now}))
+        if new_day:
+            await DataVersion.bump(REPORT_SCOPE_USERS, student_scope(REPORT_SCOPE_USERS, self.telegram_id))
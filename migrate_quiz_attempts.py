@@ -0,0 +1,94 @@
+"""
+Migrate Embedded Quiz Attempts Script
+سكريبت نقل محاولات الاختبارات إلى مجموعة مستقلة
+
+Moves attempts embedded in quizzes.attempts into the quiz_attempts
+collection (one document per attempt), then removes the embedded array.
+Safe to run more than once.
+"""
+import asyncio
+from typing import Any, Dict, List
+
+from beanie import PydanticObjectId
+from loguru import logger
+from pydantic import BaseModel, Field
+
+from database.connection import init_db, close_db
+from database.models.quiz import Quiz, QuizAttempt
+
+
+class _LegacyQuiz(BaseModel):
+    """Projection of a quiz that still embeds its attempts"""
+    id: PydanticObjectId = Field(alias="_id")
+    attempts: List[Dict[str, Any]] = Field(default_factory=list)
+
+
+async def migrate_quiz(quiz: _LegacyQuiz) -> int:
+    """Copy one quiz's embedded attempts; returns number migrated"""
+    migrated = 0
+    for data in quiz.attempts:
+        user_id = data.get("user_id")
+        started_at = data.get("started_at")
+        if not user_id or not started_at:
+            continue
+
+        # (quiz, user, started_at) identifies an attempt; skip ones already copied
+        existing = await QuizAttempt.find_one(
+            QuizAttempt.quiz_id == quiz.id,
+            QuizAttempt.user_id == str(user_id),
+            QuizAttempt.started_at == started_at
+        )
+        if existing:
+            continue
+
+        await QuizAttempt(
+            quiz_id=quiz.id,
+            user_id=str(user_id),
+            started_at=started_at,
+            completed_at=data.get("completed_at"),
+            answers=data.get("answers") or [],
+            score=data.get("score"),
+            max_score=data.get("max_score"),
+            passed=data.get("passed", False),
+            time_taken_seconds=data.get("time_taken_seconds"),
+        ).insert()
+        migrated += 1
+
+    # Drop the embedded array only after every attempt was copied
+    await Quiz.find_one(Quiz.id == quiz.id).update(
+        {"$unset": {"attempts": ""}}
+    )
+    return migrated
+
+
+async def migrate_quiz_attempts():
+    """Migrate all embedded quiz attempts"""
+    print("\n" + "="*60)
+    print("📦 نقل محاولات الاختبارات إلى مجموعة quiz_attempts")
+    print("="*60)
+
+    await init_db()
+
+    try:
+        legacy = await Quiz.find(
+            {"attempts": {"$exists": True}}
+        ).project(_LegacyQuiz).to_list()
+
+        total = 0
+        for quiz in legacy:
+            count = await migrate_quiz(quiz)
+            total += count
+            logger.info(f"Migrated {count} attempts for quiz {quiz.id}")
+
+        print(f"✅ تم نقل {total} محاولة من {len(legacy)} اختبار")
+
+    except Exception as e:
+        logger.error(f"Error migrating quiz attempts: {e}")
+        print(f"❌ خطأ: {e}")
+
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate_quiz_attempts())
@@ -0,0 +1,94 @@
+"""
+Migrate Embedded Submissions Script
+سكريبت نقل التسليمات إلى مجموعة مستقلة
+
+Moves submissions embedded in assignments.submissions into the
+assignment_submissions collection (one document per assignment and student),
+then removes the embedded array. Safe to run more than once.
+"""
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List
+
+from beanie import PydanticObjectId
+from loguru import logger
+from pydantic import BaseModel, Field
+
+from database.connection import init_db, close_db
+from database.models.assignment import Assignment, AssignmentSubmission
+
+
+class _LegacyAssignment(BaseModel):
+    """Projection of an assignment that still embeds its submissions"""
+    id: PydanticObjectId = Field(alias="_id")
+    submissions: List[Dict[str, Any]] = Field(default_factory=list)
+
+
+async def migrate_assignment(assignment: _LegacyAssignment) -> int:
+    """Copy one assignment's embedded submissions; returns number migrated"""
+    migrated = 0
+    for data in assignment.submissions:
+        user_id = data.get("user_id")
+        if not user_id:
+            continue
+
+        # Submissions made after the new collection went live win
+        existing = await AssignmentSubmission.find_one(
+            AssignmentSubmission.assignment_id == assignment.id,
+            AssignmentSubmission.user_id == str(user_id)
+        )
+        if existing:
+            continue
+
+        await AssignmentSubmission(
+            assignment_id=assignment.id,
+            user_id=str(user_id),
+            submitted_at=data.get("submitted_at") or datetime.utcnow(),
+            file_id=data.get("file_id"),
+            text_answer=data.get("text_answer"),
+            grade=data.get("grade"),
+            feedback=data.get("feedback"),
+            graded_by=data.get("graded_by"),
+            graded_at=data.get("graded_at"),
+            status=data.get("status", "submitted"),
+        ).insert()
+        migrated += 1
+
+    # Drop the embedded array only after every submission was copied
+    await Assignment.find_one(Assignment.id == assignment.id).update(
+        {"$unset": {"submissions": ""}}
+    )
+    return migrated
+
+
+async def migrate_submissions():
+    """Migrate all embedded submissions"""
+    print("\n" + "="*60)
+    print("📦 نقل التسليمات إلى مجموعة assignment_submissions")
+    print("="*60)
+
+    await init_db()
+
+    try:
+        legacy = await Assignment.find(
+            {"submissions": {"$exists": True}}
+        ).project(_LegacyAssignment).to_list()
+
+        total = 0
+        for assignment in legacy:
+            count = await migrate_assignment(assignment)
+            total += count
+            logger.info(f"Migrated {count} submissions for assignment {assignment.id}")
+
+        print(f"✅ تم نقل {total} تسليم من {len(legacy)} واجب")
+
+    except Exception as e:
+        logger.error(f"Error migrating submissions: {e}")
+        print(f"❌ خطأ: {e}")
+
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate_submissions())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Startup Profile
+تحليل زمن بدء التشغيل
+
+Imports a module (server by default) in a fresh interpreter with
+`python -X importtime` and reports the total import time and the slowest
+modules, to find what makes cold starts slow.
+
+    python profile_startup.py              # import server
+    python profile_startup.py api.index --top 30
+"""
+import argparse
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+
+def profile_imports(target: str) -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) for every module imported by `target`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        raise SystemExit(f"❌ import {target} failed")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def package_times(rows: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    """Import time (us) spent in each top-level package's own modules"""
+    totals: Dict[str, int] = {}
+    for name, self_us, _ in rows:
+        root = name.split(".")[0]
+        totals[root] = totals.get(root, 0) + self_us
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import time per module")
+    parser.add_argument("target", nargs="?", default="server")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = profile_imports(args.target)
+    total_us = next((cum for name, _, cum in rows if name == args.target), 0)
+
+    print("\n" + "="*60)
+    print(f"⏱️  زمن استيراد {args.target}: {total_us / 1000:.1f} ms")
+    print("="*60)
+
+    print(f"\n📦 حسب الحزمة (أعلى {args.top}):")
+    packages = sorted(package_times(rows).items(), key=lambda item: -item[1])
+    for name, package_us in packages[:args.top]:
+        print(f"  {package_us / 1000:9.1f} ms  {name}")
+
+    print(f"\n🐢 أبطأ الوحدات من حيث الزمن الذاتي (أعلى {args.top}):")
+    for name, self_us, _ in sorted(rows, key=lambda row: -row[1])[:args.top]:
+        print(f"  {self_us / 1000:9.1f} ms  {name}")
+
+    project = [row for row in rows if row[0].split(".")[0] in ("bot", "utils", "database", "config", "admin_dashboard")]
+    print(f"\n🧩 وحدات المشروع (التراكمي، أعلى {args.top}):")
+    for name, _, cumulative_us in sorted(project, key=lambda row: -row[2])[:args.top]:
+        print(f"  {cumulative_us / 1000:9.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Rebuild Achievement Progress Script
+سكريبت إعادة بناء عدادات الإنجازات
+
+Recomputes the achievement_progress counters from users, submissions
+(database and data/submissions.json) and quiz attempts, keeping the
+achievements already unlocked, then awards (silently) the ones the rebuilt
+counters satisfy. Run once after deploying the event-driven achievements,
+or whenever the counters need to be repaired. Login streaks cannot be
+recovered and start from the next login.
+"""
+import asyncio
+from datetime import datetime
+from typing import Dict, Optional
+
+from loguru import logger
+
+from database.connection import init_db, close_db
+from database.models.achievement_progress import AchievementProgress
+from database.models.assignment import Assignment, AssignmentSubmission
+from database.models.quiz import QuizAttempt
+from database.models.user import User
+from utils.achievements import AchievementManager
+from utils.content_catalog import content_catalog
+from utils.json_store import submissions_store
+
+
+def _parse(value: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def _add_submission(
+    progress: Dict[str, AchievementProgress],
+    user_id: str,
+    on_time: bool,
+    first: bool,
+    grade: Optional[float],
+    max_grade: float
+):
+    counters = progress.setdefault(user_id, AchievementProgress(user_id=user_id))
+    counters.submissions += 1
+    counters.on_time_submissions += on_time
+    counters.first_submissions += first
+    if grade is not None:
+        counters.graded_count += 1
+        counters.grade_percent_sum += grade / max_grade * 100
+        counters.perfect_scores += grade >= max_grade
+
+
+async def rebuild_achievement_progress():
+    """Rebuild all achievement counters from scratch"""
+    print("\n" + "="*60)
+    print("🔄 إعادة بناء عدادات الإنجازات")
+    print("="*60)
+
+    await init_db()
+
+    try:
+        progress: Dict[str, AchievementProgress] = {}
+
+        async for user in User.find_all():
+            counters = progress.setdefault(str(user.telegram_id), AchievementProgress(user_id=str(user.telegram_id)))
+            counters.logins = 1
+            counters.enrollments = len(user.courses)
+
+        # Database submissions
+        assignments = {a.id: a for a in await Assignment.find_all().to_list()}
+        first_by_assignment: Dict = {}
+        submissions = await AssignmentSubmission.find_all().sort(+AssignmentSubmission.submitted_at).to_list()
+        for submission in submissions:
+            assignment = assignments.get(submission.assignment_id)
+            if not assignment:
+                continue
+            first = first_by_assignment.setdefault(submission.assignment_id, submission.user_id) == submission.user_id
+            _add_submission(
+                progress, submission.user_id,
+                on_time=assignment.deadline is not None and submission.submitted_at <= assignment.deadline,
+                first=first,
+                grade=submission.grade,
+                max_grade=assignment.max_grade or 100
+            )
+
+        # JSON submissions
+        records = await submissions_store.all()
+        records.sort(key=lambda r: r.get('submitted_at') or '')
+        first_by_assignment = {}
+        for record in records:
+            course_id, index = record.get('course_id'), record.get('assignment_index')
+            student_id = str(record['student_id'])
+            assignments_json = content_catalog.assignments(course_id)
+            assignment = assignments_json[index] if isinstance(index, int) and index < len(assignments_json) else {}
+            deadline, submitted_at = _parse(assignment.get('deadline')), _parse(record.get('submitted_at'))
+            first = first_by_assignment.setdefault((course_id, index), student_id) == student_id
+            _add_submission(
+                progress, student_id,
+                on_time=bool(deadline and submitted_at) and submitted_at <= deadline,
+                first=first,
+                grade=record.get('grade'),
+                max_grade=record.get('max_grade') or assignment.get('max_grade', 100)
+            )
+
+        # Quizzes
+        async for attempt in QuizAttempt.find(QuizAttempt.passed == True):  # noqa: E712
+            counters = progress.setdefault(attempt.user_id, AchievementProgress(user_id=attempt.user_id))
+            if str(attempt.quiz_id) not in counters.passed_quiz_ids:
+                counters.passed_quiz_ids.append(str(attempt.quiz_id))
+
+        # Keep what was already unlocked
+        async for existing in AchievementProgress.find_all():
+            counters = progress.setdefault(existing.user_id, AchievementProgress(user_id=existing.user_id))
+            counters.unlocked = existing.unlocked
+            counters.points = existing.points
+            counters.last_login_day = existing.last_login_day
+            counters.login_streak = existing.login_streak
+            counters.best_login_streak = existing.best_login_streak
+            counters.logins = max(counters.logins, existing.logins)
+
+        await AchievementProgress.find_all().delete()
+        if progress:
+            await AchievementProgress.insert_many(list(progress.values()))
+
+        awarded = 0
+        for user_id in progress:
+            awarded += len(await AchievementManager.check_and_award_achievements(user_id, notify=False))
+
+        logger.info(f"Rebuilt achievement progress of {len(progress)} users ({awarded} achievements awarded)")
+        print(f"✅ تم بناء عدادات {len(progress)} طالب ومنح {awarded} إنجاز")
+
+    except Exception as e:
+        logger.error(f"Error rebuilding achievement progress: {e}")
+        print(f"❌ خطأ: {e}")
+
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_achievement_progress())
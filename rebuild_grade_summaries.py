@@ -0,0 +1,90 @@
+"""
+Rebuild Grade Summaries Script
+سكريبت إعادة بناء ملخصات درجات الطلاب
+
+Recomputes student_grade_summaries from every graded submission (database
+submissions and data/submissions.json), as percentages of each
+assignment's max_grade. Run once after deploying the rollups (and again
+after the switch to percentages), or whenever the summaries need to be
+repaired.
+"""
+import asyncio
+from datetime import datetime
+from typing import Dict
+
+from loguru import logger
+
+from database.connection import init_db, close_db
+from database.models.assignment import Assignment, AssignmentSubmission
+from database.models.grade_summary import StudentGradeSummary
+from utils.content_catalog import content_catalog
+from utils.json_store import submissions_store
+
+
+def _add_grade(summaries: Dict[str, StudentGradeSummary], user_id: str, grade: float, max_grade: float, graded_at):
+    summary = summaries.setdefault(user_id, StudentGradeSummary(user_id=user_id))
+    grade = grade / (max_grade or 100) * 100
+    summary.grade_sum += grade
+    summary.graded_count += 1
+    summary.best_grade = grade if summary.best_grade is None else max(summary.best_grade, grade)
+    if graded_at and (summary.last_graded_at is None or graded_at > summary.last_graded_at):
+        summary.last_graded_at = graded_at
+
+
+async def rebuild_grade_summaries():
+    """Rebuild all grade summaries from scratch"""
+    print("\n" + "="*60)
+    print("🔄 إعادة بناء ملخصات درجات الطلاب")
+    print("="*60)
+
+    await init_db()
+
+    try:
+        summaries: Dict[str, StudentGradeSummary] = {}
+
+        graded = await AssignmentSubmission.find(
+            AssignmentSubmission.grade != None  # noqa: E711
+        ).to_list()
+        max_grades = {a.id: a.max_grade async for a in Assignment.find_all()}
+        for submission in graded:
+            _add_grade(
+                summaries, submission.user_id, submission.grade,
+                max_grades.get(submission.assignment_id, 100), submission.graded_at
+            )
+
+        for record in await submissions_store.all():
+            if record.get('grade') is None:
+                continue
+            graded_at = None
+            if record.get('graded_at'):
+                try:
+                    graded_at = datetime.fromisoformat(record['graded_at'])
+                except ValueError:
+                    pass
+            max_grade = record.get('max_grade')
+            if not max_grade:
+                assignments = content_catalog.assignments(record.get('course_id'))
+                index = record.get('assignment_index')
+                max_grade = assignments[index].get('max_grade', 100) if isinstance(index, int) and index < len(assignments) else 100
+            _add_grade(summaries, str(record['student_id']), record['grade'], max_grade, graded_at)
+
+        for summary in summaries.values():
+            summary.average_grade = summary.grade_sum / summary.graded_count
+
+        await StudentGradeSummary.find_all().delete()
+        if summaries:
+            await StudentGradeSummary.insert_many(list(summaries.values()))
+
+        logger.info(f"Rebuilt {len(summaries)} grade summaries")
+        print(f"✅ تم بناء {len(summaries)} ملخص من {len(graded)} تسليم مصحح")
+
+    except Exception as e:
+        logger.error(f"Error rebuilding grade summaries: {e}")
+        print(f"❌ خطأ: {e}")
+
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_grade_summaries())
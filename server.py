@@ -12,6 +12,7 @@ import os
 import asyncio
 
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from loguru import logger
 from telegram import Update
 
@@ -19,6 +20,15 @@ from config.settings import settings
 from bot.main import create_application
 from admin_dashboard.app import app as dashboard_app
 from utils.notifications import NotificationScheduler
+from utils.telegram_client import telegram_client
+from utils.broadcast import BroadcastManager
+from utils.update_queue import update_queue
+from utils.json_store import close_stores
+from utils.update_logging import update_logger
+from utils.pdf_renderer import pdf_renderer
+from utils.report_jobs import report_jobs
+from utils.user_cache import user_cache
+from utils.webhook_guard import SECRET_TOKEN_HEADER, update_deduplicator, verify_secret_token
 
 TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN") or settings.TELEGRAM_BOT_TOKEN
 MONGODB_URL = os.environ.get("MONGODB_URL") or settings.MONGODB_URL
@@ -36,6 +46,16 @@ app = FastAPI(title="Educational Platform - Unified Server")
 app.mount("/admin", dashboard_app)
 
 
+async def process_update_data(data: dict) -> None:
+    """Deserialize a raw webhook update and run it through the bot."""
+    update = Update.de_json(data, telegram_app.bot)
+    # Go through the update processor so per-chat ordering and the
+    # concurrency limit apply to webhook updates too
+    await telegram_app.update_processor.process_update(
+        update, telegram_app.process_update(update)
+    )
+
+
 @app.on_event("startup")
 async def on_startup() -> None:
     """Startup logic for unified server."""
@@ -66,9 +86,14 @@ async def on_startup() -> None:
 
         webhook_url = BOT_WEBHOOK_URL
         if webhook_url:
-            await telegram_app.bot.set_webhook(url=webhook_url)
+            await telegram_app.bot.set_webhook(
+                url=webhook_url,
+                secret_token=settings.WEBHOOK_SECRET_TOKEN,
+            )
             logger.info(f"✅ Webhook set to {webhook_url}")
             print(f"✅ Webhook set to {webhook_url}", flush=True)
+            if not settings.WEBHOOK_SECRET_TOKEN:
+                logger.warning("⚠️ WEBHOOK_SECRET_TOKEN is not set; webhook requests are not verified")
         else:
             logger.warning("⚠️ BOT_WEBHOOK_URL is not set; skipping set_webhook")
             print("⚠️ BOT_WEBHOOK_URL is not set; skipping set_webhook", flush=True)
@@ -77,6 +102,26 @@ async def on_startup() -> None:
         print(f"❌ Failed to initialize Telegram bot: {repr(e)}", flush=True)
         raise
 
+    # Open the shared Telegram HTTP client (notifications, dashboard)
+    await telegram_client.start()
+
+    # Webhook updates are acknowledged immediately and processed by workers
+    if settings.WEBHOOK_ASYNC_INGESTION:
+        await update_queue.start(process_update_data)
+        logger.info("✅ Webhook ingestion queue started")
+        print("✅ Webhook ingestion queue started", flush=True)
+
+    # Start the PDF render processes in the background
+    app.state.pdf_warm_task = asyncio.create_task(pdf_renderer.warm())
+
+    # Resume broadcasts interrupted by a restart
+    try:
+        resumed = await BroadcastManager.resume_pending_jobs()
+        if resumed:
+            logger.info(f"📣 Resumed {resumed} broadcast job(s)")
+    except Exception as e:
+        logger.error(f"❌ Failed to resume broadcasts: {repr(e)}", exc_info=True)
+
     # Start background notification scheduler
     try:
         logger.info("📬 Starting notification scheduler...")
@@ -106,10 +151,22 @@ async def on_shutdown() -> None:
         except asyncio.CancelledError:
             pass
 
+    # Finish queued webhook updates before the bot goes away
+    await update_queue.stop()
+    
+    # Flush the JSON stores' journals (bot/main.py's post_shutdown only
+    # runs in polling mode)
+    await close_stores()
+
     # Stop Telegram bot
     await telegram_app.stop()
     await telegram_app.shutdown()
 
+    # Stop broadcasts (they resume on next startup) and close the HTTP client
+    await BroadcastManager.shutdown()
+    await telegram_client.close()
+    pdf_renderer.shutdown()
+
 
 @app.get("/")
 async def health_check() -> dict:
@@ -154,13 +211,73 @@ async def db_health_check() -> dict:
         }
 
 
+@app.get("/health/telegram-client")
+async def telegram_client_health_check() -> dict:
+    """Shared Telegram HTTP client pool metrics."""
+    return telegram_client.stats()
+
+
+@app.get("/health/scheduler")
+async def scheduler_health_check() -> dict:
+    """Scheduled job timing metrics."""
+    scheduler = NotificationScheduler.scheduler
+    return {
+        "owner": scheduler.owner,
+        "jobs": await scheduler.get_metrics(),
+    }
+
+
+@app.get("/health/webhook-queue")
+async def webhook_queue_health_check() -> dict:
+    """Webhook ingestion queue depth and latency metrics."""
+    return {**update_queue.stats(), "dedup": update_deduplicator.stats()}
+
+
+@app.get("/health/update-processor")
+async def update_processor_health_check() -> dict:
+    """Bot update concurrency and queue-depth metrics."""
+    return {
+        **telegram_app.update_processor.stats(),
+        "logging": update_logger.stats(),
+        "user_cache": user_cache.stats(),
+    }
+
+
+@app.get("/health/report-jobs")
+async def report_jobs_health_check() -> dict:
+    """Report generation, artifact cache and PDF render pool metrics."""
+    return {**report_jobs.stats(), "pdf_renderer": pdf_renderer.stats()}
+
+
 @app.post("/webhook")
-async def telegram_webhook(request: Request) -> dict:
+async def telegram_webhook(request: Request):
     """Telegram webhook endpoint."""
+    if not verify_secret_token(request.headers.get(SECRET_TOKEN_HEADER)):
+        logger.warning("Webhook request rejected: bad secret token")
+        return JSONResponse({"ok": False, "error": "forbidden"}, status_code=403)
+
     try:
         data = await request.json()
-        update = Update.de_json(data, telegram_app.bot)
-        await telegram_app.process_update(update)
+        if not isinstance(data, dict) or not isinstance(data.get("update_id"), int):
+            return JSONResponse({"ok": False, "error": "invalid update"}, status_code=400)
+
+        # Telegram redelivers on timeouts; drop updates already received
+        update_id = data["update_id"]
+        if not await update_deduplicator.claim(update_id):
+            logger.debug(f"Duplicate update {update_id} ignored")
+            return {"ok": True}
+
+        # The queue runs when WEBHOOK_ASYNC_INGESTION is on (never on Vercel,
+        # see config/settings.py) and the startup hook started it
+        if update_queue.running:
+            # Acknowledge now; a worker processes the update in chat order
+            if not await update_queue.enqueue(data):
+                # Queue full: let Telegram redeliver later
+                await update_deduplicator.release(update_id)
+                return JSONResponse({"ok": False, "error": "busy"}, status_code=503)
+            return {"ok": True}
+
+        await process_update_data(data)
         return {"ok": True}
     except Exception as e:
         # Log to both logger and stdout for Vercel visibility
@@ -0,0 +1,83 @@
+"""
+Test Achievement Events
+اختبار أحداث الإنجازات
+
+Submits a throwaway assignment as a throwaway student against the
+configured MongoDB and checks the achievement counters it produces.
+Everything created is deleted at the end.
+"""
+import asyncio
+import sys
+import io
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Set UTF-8 encoding
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# Add project to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+TEST_USER_ID = "999999000001"  # no such Telegram chat
+
+
+async def test_achievements():
+    """A first submission is counted once; a resubmission is not"""
+    print("\n" + "="*60)
+    print("🧪 اختبار أحداث الإنجازات")
+    print("="*60)
+
+    from database.connection import init_db, close_db
+    from database.models.achievement_progress import AchievementProgress
+    from database.models.assignment import Assignment, AssignmentSubmission
+    from database.models.notification import Notification
+
+    await init_db()
+
+    assignment = Assignment(
+        title="Achievement events test",
+        description="-",
+        related_to="course",
+        related_id="test_achievements",
+        deadline=datetime.utcnow() + timedelta(days=1),
+        created_by="test"
+    )
+    try:
+        await assignment.insert()
+        await AchievementProgress.find(AchievementProgress.user_id == TEST_USER_ID).delete()
+
+        print("\n1️⃣ أول تسليم...")
+        await assignment.add_submission(TEST_USER_ID, text_answer="first")
+        progress = await AchievementProgress.find_one(AchievementProgress.user_id == TEST_USER_ID)
+        assert progress is not None, "no achievement_progress document"
+        assert progress.submissions == 1, f"submissions = {progress.submissions}"
+        assert progress.on_time_submissions == 1, f"on_time_submissions = {progress.on_time_submissions}"
+        assert progress.first_submissions == 1, f"first_submissions = {progress.first_submissions}"
+        assert "first_submission" in progress.unlocked, f"unlocked = {progress.unlocked}"
+        print("✅ تم احتساب التسليم وفتح شارة أول تسليم")
+
+        print("\n2️⃣ إعادة التسليم...")
+        await assignment.add_submission(TEST_USER_ID, text_answer="second")
+        progress = await AchievementProgress.find_one(AchievementProgress.user_id == TEST_USER_ID)
+        assert progress.submissions == 1, f"submissions = {progress.submissions}"
+        print("✅ إعادة التسليم لم تُحتسب مرة أخرى")
+
+        return True
+
+    except AssertionError as e:
+        print(f"❌ فشل: {e}")
+        return False
+
+    finally:
+        await AssignmentSubmission.find(AssignmentSubmission.assignment_id == assignment.id).delete()
+        await AchievementProgress.find(AchievementProgress.user_id == TEST_USER_ID).delete()
+        await Notification.find(Notification.user_id == int(TEST_USER_ID)).delete()
+        if assignment.id:
+            await assignment.delete()
+        await close_db()
+        print("\n" + "="*60)
+
+
+if __name__ == "__main__":
+    result = asyncio.run(test_achievements())
+    sys.exit(0 if result else 1)
@@ -1,15 +1,27 @@
 """
 Achievements and Badges System
 نظام الشارات والمكافآت
+
+Event driven: each domain event (login, enrollment, submission, grade,
+quiz completion) applies one atomic update to the student's
+AchievementProgress counters, then re-evaluates only the achievements that
+event can unlock, from the updated counters. No assignments, submissions or
+quiz attempts are read to evaluate an achievement.
 """
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from loguru import logger
+from beanie import UpdateResponse
+
+from database.models.achievement_progress import AchievementProgress
 
-from database.models.user import User
-from database.models.assignment import Assignment
-from database.models.quiz import Quiz
-from utils.notifications import SmartNotificationManager
+
+# Domain events
+EVENT_LOGIN = "login"
+EVENT_ENROLLMENT = "enrollment"
+EVENT_SUBMISSION = "submission"  # data: new, on_time, first_submitter
+EVENT_GRADE = "grade"  # data: grade, previous_grade, max_grade, previous_max_grade (grade None: cleared)
+EVENT_QUIZ_COMPLETED = "quiz_completed"  # data: quiz_id, passed
 
 
 class Achievement:
@@ -21,7 +33,8 @@ class Achievement:
         description: str,
         emoji: str,
         points: int,
-        check_function
+        check_function: Callable[[AchievementProgress], bool],
+        events: Tuple[str, ...] = ()
     ):
         self.id = id
         self.name = name
@@ -29,13 +42,15 @@ class Achievement:
         self.emoji = emoji
         self.points = points
         self.check_function = check_function
+        self.events = events  # events that can unlock it
 
 
 class AchievementManager:
     """Manage user achievements"""
-    
+
     ACHIEVEMENTS = []
-    
+    BY_EVENT: Dict[str, List[Achievement]] = {}
+
     @classmethod
     def initialize(cls):
         """Initialize all achievements"""
@@ -47,7 +62,8 @@ class AchievementManager:
                 "قمت بتسجيل الدخول لأول مرة!",
                 "👋",
                 10,
-                cls.check_first_login
+                cls.check_first_login,
+                (EVENT_LOGIN,)
             ),
             Achievement(
                 "first_enrollment",
@@ -55,7 +71,8 @@ class AchievementManager:
                 "سجلت في أول دورة لك!",
                 "📚",
                 20,
-                cls.check_first_enrollment
+                cls.check_first_enrollment,
+                (EVENT_ENROLLMENT,)
             ),
             Achievement(
                 "first_submission",
@@ -63,9 +80,10 @@ class AchievementManager:
                 "سلمت أول واجب لك!",
                 "📝",
                 30,
-                cls.check_first_submission
+                cls.check_first_submission,
+                (EVENT_SUBMISSION,)
             ),
-            
+
             # Academic achievements
             Achievement(
                 "perfect_score",
@@ -73,7 +91,8 @@ class AchievementManager:
                 "حصلت على 100/100 في واجب!",
                 "💯",
                 50,
-                cls.check_perfect_score
+                cls.check_perfect_score,
+                (EVENT_GRADE,)
             ),
             Achievement(
                 "high_achiever",
@@ -81,7 +100,8 @@ class AchievementManager:
                 "معدلك أعلى من 90%",
                 "⭐",
                 100,
-                cls.check_high_achiever
+                cls.check_high_achiever,
+                (EVENT_GRADE,)
             ),
             Achievement(
                 "dedicated_student",
@@ -89,9 +109,10 @@ class AchievementManager:
                 "سلمت 5 واجبات متتالية في الوقت المحدد",
                 "🎯",
                 80,
-                cls.check_dedicated_student
+                cls.check_dedicated_student,
+                (EVENT_SUBMISSION,)
             ),
-            
+
             # Streaks
             Achievement(
                 "weekly_active",
@@ -99,7 +120,8 @@ class AchievementManager:
                 "دخلت كل يوم لمدة أسبوع",
                 "🔥",
                 40,
-                cls.check_weekly_active
+                cls.check_weekly_active,
+                (EVENT_LOGIN,)
             ),
             Achievement(
                 "quiz_master",
@@ -107,9 +129,10 @@ class AchievementManager:
                 "نجحت في 5 اختبارات",
                 "🎓",
                 70,
-                cls.check_quiz_master
+                cls.check_quiz_master,
+                (EVENT_QUIZ_COMPLETED,)
             ),
-            
+
             # Special achievements
             Achievement(
                 "early_bird",
@@ -117,7 +140,8 @@ class AchievementManager:
                 "أول من يسلم الواجب",
                 "🌅",
                 60,
-                cls.check_early_bird
+                cls.check_early_bird,
+                (EVENT_SUBMISSION,)
             ),
             Achievement(
                 "course_completer",
@@ -136,192 +160,242 @@ class AchievementManager:
                 cls.check_helping_hand
             )
         ]
-    
+
+        cls.BY_EVENT = {}
+        for achievement in cls.ACHIEVEMENTS:
+            for event in achievement.events:
+                cls.BY_EVENT.setdefault(event, []).append(achievement)
+
+    # ------------------------------------------------------------------
+    # Checks (on the student's counters only)
+    # ------------------------------------------------------------------
+
     @staticmethod
-    async def check_first_login(user: User) -> bool:
-        """Check if this is user's first login"""
-        return user.registered_at is not None
-    
+    def check_first_login(progress: AchievementProgress) -> bool:
+        return progress.logins >= 1
+
     @staticmethod
-    async def check_first_enrollment(user: User) -> bool:
-        """Check if user has enrolled in a course"""
-        return len(user.courses) > 0
-    
+    def check_first_enrollment(progress: AchievementProgress) -> bool:
+        return progress.enrollments >= 1
+
     @staticmethod
-    async def check_first_submission(user: User) -> bool:
-        """Check if user has submitted an assignment"""
-        assignments = await Assignment.find().to_list()
-        for assignment in assignments:
-            if assignment.has_submitted(str(user.telegram_id)):
-                return True
-        return False
-    
+    def check_first_submission(progress: AchievementProgress) -> bool:
+        return progress.submissions >= 1
+
     @staticmethod
-    async def check_perfect_score(user: User) -> bool:
-        """Check if user got 100/100"""
-        assignments = await Assignment.find().to_list()
-        for assignment in assignments:
-            submission = assignment.get_submission(str(user.telegram_id))
-            if submission and submission.grade == assignment.max_grade:
-                return True
-        return False
-    
+    def check_perfect_score(progress: AchievementProgress) -> bool:
+        return progress.perfect_scores >= 1
+
     @staticmethod
-    async def check_high_achiever(user: User) -> bool:
-        """Check if average grade is above 90%"""
-        assignments = await Assignment.find().to_list()
-        grades = []
-        
-        for assignment in assignments:
-            submission = assignment.get_submission(str(user.telegram_id))
-            if submission and submission.grade is not None:
-                percentage = (submission.grade / assignment.max_grade) * 100
-                grades.append(percentage)
-        
-        if grades:
-            avg = sum(grades) / len(grades)
-            return avg >= 90
-        return False
-    
+    def check_high_achiever(progress: AchievementProgress) -> bool:
+        """Average grade of 90% or more"""
+        return progress.graded_count > 0 and progress.average_grade_percent >= 90
+
     @staticmethod
-    async def check_dedicated_student(user: User) -> bool:
-        """Check if submitted 5 assignments on time"""
-        assignments = await Assignment.find().to_list()
-        on_time_count = 0
-        
-        for assignment in assignments:
-            submission = assignment.get_submission(str(user.telegram_id))
-            if submission and assignment.deadline:
-                if submission.submitted_at <= assignment.deadline:
-                    on_time_count += 1
-        
-        return on_time_count >= 5
-    
+    def check_dedicated_student(progress: AchievementProgress) -> bool:
+        return progress.on_time_submissions >= 5
+
     @staticmethod
-    async def check_weekly_active(user: User) -> bool:
-        """Check if active every day for a week"""
-        # This would require tracking daily activity
-        # For now, simplified check
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        return user.last_active > week_ago
-    
+    def check_weekly_active(progress: AchievementProgress) -> bool:
+        """Logged in on 7 consecutive days"""
+        return progress.best_login_streak >= 7
+
     @staticmethod
-    async def check_quiz_master(user: User) -> bool:
-        """Check if passed 5 quizzes"""
-        quizzes = await Quiz.find().to_list()
-        passed_count = 0
-        
-        for quiz in quizzes:
-            best = quiz.get_best_attempt(str(user.telegram_id))
-            if best and best.passed:
-                passed_count += 1
-        
-        return passed_count >= 5
-    
+    def check_quiz_master(progress: AchievementProgress) -> bool:
+        return len(progress.passed_quiz_ids) >= 5
+
     @staticmethod
-    async def check_early_bird(user: User) -> bool:
-        """Check if first to submit"""
-        assignments = await Assignment.find().to_list()
-        for assignment in assignments:
-            if len(assignment.submissions) > 0:
-                first_submission = min(assignment.submissions, key=lambda s: s.submitted_at)
-                if first_submission.user_id == str(user.telegram_id):
-                    return True
-        return False
-    
+    def check_early_bird(progress: AchievementProgress) -> bool:
+        return progress.first_submissions >= 1
+
     @staticmethod
-    async def check_course_completer(user: User) -> bool:
-        """Check if completed a course"""
+    def check_course_completer(progress: AchievementProgress) -> bool:
         # This would require course completion tracking
-        # Simplified: check if passed all assignments in a course
         return False  # Implement based on course structure
-    
+
     @staticmethod
-    async def check_helping_hand(user: User) -> bool:
-        """Check if helped others via chat"""
+    def check_helping_hand(progress: AchievementProgress) -> bool:
         # This would require chat message tracking
         return False  # Implement based on chat system
-    
+
+    # ------------------------------------------------------------------
+    # Events
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _event_update(event: str, data: Dict[str, Any]) -> Optional[Union[dict, list]]:
+        """The counter update an event applies (None: nothing to record)"""
+        now = datetime.utcnow()
+
+        if event == EVENT_LOGIN:
+            today = now.strftime('%Y-%m-%d')
+            yesterday = (now - timedelta(days=1)).strftime('%Y-%m-%d')
+            return [
+                {"$set": {
+                    "logins": {"$add": [{"$ifNull": ["$logins", 0]}, 1]},
+                    "login_streak": {"$switch": {
+                        "branches": [
+                            {"case": {"$eq": ["$last_login_day", today]},
+                             "then": {"$max": [{"$ifNull": ["$login_streak", 0]}, 1]}},
+                            {"case": {"$eq": ["$last_login_day", yesterday]},
+                             "then": {"$add": [{"$ifNull": ["$login_streak", 0]}, 1]}},
+                        ],
+                        "default": 1,
+                    }},
+                    "last_login_day": today,
+                    "updated_at": now,
+                }},
+                {"$set": {"best_login_streak": {"$max": [{"$ifNull": ["$best_login_streak", 0]}, "$login_streak"]}}},
+            ]
+
+        if event == EVENT_ENROLLMENT:
+            return {"$inc": {"enrollments": 1}, "$set": {"updated_at": now}}
+
+        if event == EVENT_SUBMISSION:
+            if not data.get("new", True):
+                return None
+            return {
+                "$inc": {
+                    "submissions": 1,
+                    "on_time_submissions": int(bool(data.get("on_time"))),
+                    "first_submissions": int(bool(data.get("first_submitter"))),
+                },
+                "$set": {"updated_at": now},
+            }
+
+        if event == EVENT_GRADE:
+            # As percentages (the previous grade may be on another scale)
+            max_grade = data.get("max_grade") or 100
+            previous_max_grade = data.get("previous_max_grade") or max_grade
+            grade = data["grade"] / max_grade * 100 if data.get("grade") is not None else None
+            previous = data["previous_grade"] / previous_max_grade * 100 if data.get("previous_grade") is not None else None
+            if grade == previous:
+                return None
+            percent = lambda value: value if value is not None else 0
+            perfect = lambda value: value is not None and value >= 100
+            return {
+                "$inc": {
+                    "graded_count": (grade is not None) - (previous is not None),
+                    "grade_percent_sum": percent(grade) - percent(previous),
+                    "perfect_scores": int(perfect(grade) and not perfect(previous)),
+                },
+                "$set": {"updated_at": now},
+            }
+
+        if event == EVENT_QUIZ_COMPLETED:
+            if not data.get("passed"):
+                return None
+            return {"$addToSet": {"passed_quiz_ids": str(data["quiz_id"])}, "$set": {"updated_at": now}}
+
+        raise ValueError(f"Unknown achievement event {event}")
+
+    @classmethod
+    async def record_event(cls, telegram_id: Union[int, str], event: str, **data) -> List[Achievement]:
+        """
+        Apply an event to the student's counters and award the achievements
+        it unlocked (never raises; returns the awarded achievements)
+        """
+        if not cls.ACHIEVEMENTS:
+            cls.initialize()
+
+        try:
+            update = cls._event_update(event, data)
+            if update is None:
+                return []
+
+            progress = await AchievementProgress.find_one(
+                AchievementProgress.user_id == str(telegram_id)
+            ).update(update, upsert=True, response_type=UpdateResponse.NEW_DOCUMENT)
+            if progress is None:
+                return []
+
+            awarded = []
+            for achievement in cls.BY_EVENT.get(event, []):
+                if achievement.id not in progress.unlocked and achievement.check_function(progress):
+                    if await cls.award_achievement(telegram_id, achievement):
+                        awarded.append(achievement)
+            return awarded
+
+        except Exception as e:
+            logger.error(f"Error recording achievement event {event} for {telegram_id}: {e}")
+            return []
+
     @classmethod
-    async def check_all_achievements(cls, user: User) -> List[Achievement]:
-        """Check all achievements for a user"""
+    async def check_all_achievements(cls, progress: AchievementProgress) -> List[Achievement]:
+        """Every achievement the counters satisfy that is not unlocked yet"""
         if not cls.ACHIEVEMENTS:
             cls.initialize()
-        
+
         unlocked = []
-        
+
         for achievement in cls.ACHIEVEMENTS:
             try:
-                if await achievement.check_function(user):
-                    # Check if user already has this achievement
-                    if not hasattr(user, 'achievements'):
-                        user.achievements = []
-                    
-                    if achievement.id not in user.achievements:
-                        unlocked.append(achievement)
+                if achievement.id not in progress.unlocked and achievement.check_function(progress):
+                    unlocked.append(achievement)
             except Exception as e:
                 logger.error(f"Error checking achievement {achievement.id}: {e}")
-        
+
         return unlocked
-    
+
     @classmethod
-    async def award_achievement(cls, user: User, achievement: Achievement):
-        """Award achievement to user"""
+    async def award_achievement(cls, telegram_id: Union[int, str], achievement: Achievement, notify: bool = True) -> bool:
+        """Award achievement to user (once, even under concurrent events)"""
         try:
-            # Add to user's achievements
-            if not hasattr(user, 'achievements'):
-                user.achievements = []
-            
-            if achievement.id not in user.achievements:
-                user.achievements.append(achievement.id)
-                
-                # Add points
-                if not hasattr(user, 'achievement_points'):
-                    user.achievement_points = 0
-                user.achievement_points += achievement.points
-                
-                await user.save()
-                
-                # Send notification
+            # The unlocked guard makes the award and its points atomic and unique
+            result = await AchievementProgress.find_one(
+                AchievementProgress.user_id == str(telegram_id),
+                {"unlocked": {"$ne": achievement.id}}
+            ).update({
+                "$addToSet": {"unlocked": achievement.id},
+                "$inc": {"points": achievement.points},
+                "$set": {"updated_at": datetime.utcnow()},
+            })
+            if not result or not result.modified_count:
+                return False
+
+            if notify:
+                from utils.notifications import SmartNotificationManager
                 await SmartNotificationManager.send_achievement_notification(
-                    user.telegram_id,
+                    int(telegram_id),
                     f"{achievement.emoji} {achievement.name}",
                     f"{achievement.description}\n\n🏆 +{achievement.points} نقطة!"
                 )
-                
-                logger.info(f"Achievement {achievement.id} awarded to user {user.telegram_id}")
-                return True
+
+            logger.info(f"Achievement {achievement.id} awarded to user {telegram_id}")
+            return True
         except Exception as e:
             logger.error(f"Error awarding achievement: {e}")
-        
+
         return False
-    
+
     @classmethod
-    async def check_and_award_achievements(cls, user: User):
-        """Check and award new achievements"""
-        unlocked = await cls.check_all_achievements(user)
-        
-        for achievement in unlocked:
-            await cls.award_achievement(user, achievement)
-    
+    async def check_and_award_achievements(cls, telegram_id: Union[int, str], notify: bool = True) -> List[Achievement]:
+        """Re-evaluate every achievement from the stored counters (e.g. after a rebuild)"""
+        progress = await AchievementProgress.find_one(AchievementProgress.user_id == str(telegram_id))
+        if not progress:
+            return []
+
+        awarded = []
+        for achievement in await cls.check_all_achievements(progress):
+            if await cls.award_achievement(telegram_id, achievement, notify=notify):
+                awarded.append(achievement)
+        return awarded
+
     @classmethod
     async def get_user_achievements(cls, telegram_id: int) -> Dict:
         """Get user's achievement statistics"""
         if not cls.ACHIEVEMENTS:
             cls.initialize()
-        
-        user = await User.find_one(User.telegram_id == telegram_id)
-        if not user:
-            return {}
-        
-        if not hasattr(user, 'achievements'):
-            user.achievements = []
-        
+
+        progress = await AchievementProgress.find_one(AchievementProgress.user_id == str(telegram_id))
+        if not progress:
+            progress = AchievementProgress(user_id=str(telegram_id))
+
         unlocked_achievements = []
         locked_achievements = []
-        
+
         for achievement in cls.ACHIEVEMENTS:
-            if achievement.id in user.achievements:
+            if achievement.id in progress.unlocked:
                 unlocked_achievements.append({
                     'id': achievement.id,
                     'name': achievement.name,
@@ -337,11 +411,9 @@ class AchievementManager:
                     'emoji': '🔒',
                     'points': achievement.points
                 })
-        
-        total_points = getattr(user, 'achievement_points', 0)
-        
+
         return {
-            'total_points': total_points,
+            'total_points': progress.points,
             'unlocked_count': len(unlocked_achievements),
             'total_count': len(cls.ACHIEVEMENTS),
             'unlocked': unlocked_achievements,
@@ -349,5 +421,10 @@ class AchievementManager:
         }
 
 
+async def record_achievement_event(telegram_id: Union[int, str], event: str, **data) -> List[Achievement]:
+    """Shortcut for AchievementManager.record_event"""
+    return await AchievementManager.record_event(telegram_id, event, **data)
+
+
 # Initialize on import
 AchievementManager.initialize()
@@ -0,0 +1,358 @@
+"""
+Broadcast Engine - rate-limited background announcements
+محرك البث - إرسال الإعلانات في الخلفية مع احترام حدود Telegram
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import httpx
+from beanie import PydanticObjectId, UpdateResponse
+from beanie.operators import In, Inc, Set
+from loguru import logger
+from pydantic import BaseModel
+
+from config.settings import settings
+from database.models.broadcast import BroadcastJob
+from database.models.notification import Notification
+from database.models.user import User
+from utils.telegram_client import telegram_client
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def acquire(self):
+        """Wait for one token (waiters are served in arrival order)"""
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for `seconds` (Telegram retry_after)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+
+class ChatRateLimiter:
+    """Minimum interval between two messages to the same chat"""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next_allowed: Dict[int, float] = {}
+
+    async def acquire(self, chat_id: int):
+        now = time.monotonic()
+        allowed = self._next_allowed.get(chat_id, now)
+        self._next_allowed[chat_id] = max(now, allowed) + self.min_interval
+        if allowed > now:
+            await asyncio.sleep(allowed - now)
+
+        if len(self._next_allowed) > 10000:
+            # Forget chats whose interval has passed
+            self._next_allowed = {
+                chat: t for chat, t in self._next_allowed.items() if t > now
+            }
+
+
+class _Recipient(BaseModel):
+    telegram_id: int
+
+
+class BroadcastManager:
+    """
+    Runs BroadcastJob documents in the background.
+
+    - Messages go through a global token bucket (BROADCAST_RATE_PER_SECOND)
+      and a per-chat interval, with at most BROADCAST_CONCURRENCY in flight.
+    - A 429 response pauses the whole bucket for Telegram's retry_after.
+    - Users are processed in telegram_id batches; each batch writes its
+      Notification records with one insert_many and advances the job cursor,
+      so a job interrupted by a restart resumes from its last batch (a few
+      users of the interrupted batch may receive the message twice).
+    - While a job runs its lease is renewed every LEASE_SECONDS / 3, so a
+      batch held up by rate-limit pauses does not let another process take
+      the job over.
+    """
+
+    global_bucket = TokenBucket(settings.BROADCAST_RATE_PER_SECOND)
+    chat_limiter = ChatRateLimiter(settings.BROADCAST_PER_CHAT_INTERVAL)
+    LEASE_SECONDS = 60
+
+    _tasks: Dict[str, asyncio.Task] = {}
+
+    @classmethod
+    async def create_job(
+        cls,
+        title: str,
+        message: str,
+        text: str,
+        created_by: str,
+        notification_type: str = "admin"
+    ) -> BroadcastJob:
+        """Create a broadcast to every registered user and start it"""
+        job = BroadcastJob(
+            title=title,
+            message=message,
+            text=text,
+            notification_type=notification_type,
+            created_by=created_by,
+            total=await User.find().count(),
+        )
+        await job.insert()
+        cls.start_job(job.id)
+        logger.info(f"Broadcast {job.id} queued for {job.total} users")
+        return job
+
+    @classmethod
+    def start_job(cls, job_id: PydanticObjectId):
+        """Run a job in a background task (no-op if already running here)"""
+        key = str(job_id)
+        task = cls._tasks.get(key)
+        if task is not None and not task.done():
+            return
+        task = asyncio.create_task(cls._run_job(job_id))
+        cls._tasks[key] = task
+        task.add_done_callback(lambda _: cls._tasks.pop(key, None))
+
+    @classmethod
+    async def resume_pending_jobs(cls) -> int:
+        """Restart jobs left unfinished by a previous process"""
+        jobs = await BroadcastJob.find(
+            In(BroadcastJob.status, ["queued", "running"])
+        ).to_list()
+        for job in jobs:
+            logger.info(f"Resuming broadcast {job.id} ({job.sent_count + job.failed_count}/{job.total})")
+            cls.start_job(job.id)
+        return len(jobs)
+
+    @classmethod
+    async def get_progress(cls, job_id: str) -> Optional[dict]:
+        job = await BroadcastJob.get(job_id)
+        return job.to_progress() if job else None
+
+    @classmethod
+    async def shutdown(cls):
+        """Stop running jobs; their leases expire and they resume on restart"""
+        tasks = list(cls._tasks.values())
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    # ------------------------------------------------------------------
+    # Job execution
+    # ------------------------------------------------------------------
+
+    @classmethod
+    async def _claim(cls, job_id: PydanticObjectId) -> Optional[BroadcastJob]:
+        """Take (or renew) the job's lease; None if another process holds it"""
+        now = datetime.utcnow()
+        job = await BroadcastJob.find_one(
+            BroadcastJob.id == job_id,
+            In(BroadcastJob.status, ["queued", "running"]),
+            {"$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]},
+        ).update(
+            Set({
+                BroadcastJob.status: "running",
+                BroadcastJob.lease_until: now + timedelta(seconds=cls.LEASE_SECONDS),
+                BroadcastJob.updated_at: now,
+            }),
+            response_type=UpdateResponse.NEW_DOCUMENT
+        )
+        if job and job.started_at is None:
+            job.started_at = now
+            await BroadcastJob.find_one(BroadcastJob.id == job_id).update(
+                Set({BroadcastJob.started_at: now})
+            )
+        return job
+
+    @classmethod
+    async def _run_job(cls, job_id: PydanticObjectId):
+        # Wait for the lease of a crashed process to expire before resuming
+        while True:
+            job = await cls._claim(job_id)
+            if job:
+                break
+            job = await BroadcastJob.get(job_id)
+            if not job or job.is_finished:
+                return
+            wait = (job.lease_until - datetime.utcnow()).total_seconds() if job.lease_until else 1
+            await asyncio.sleep(max(wait, 1))
+
+        try:
+            cursor = job.cursor
+
+            heartbeat = asyncio.create_task(cls._keep_lease(job_id))
+            try:
+                while True:
+                    query = User.find(User.telegram_id > cursor) if cursor is not None else User.find()
+                    recipients = await query.sort(+User.telegram_id).limit(
+                        settings.BROADCAST_BATCH_SIZE
+                    ).project(_Recipient).to_list()
+                    if not recipients:
+                        break
+
+                    chat_ids = [r.telegram_id for r in recipients]
+                    results = await cls.send_many(chat_ids, job.text)
+                    sent_ids = [chat_id for chat_id, ok in zip(chat_ids, results) if ok]
+                    await cls._record_batch(job, sent_ids, len(chat_ids) - len(sent_ids), chat_ids[-1])
+                    cursor = chat_ids[-1]
+            finally:
+                # Stop renewing before the final status clears the lease
+                heartbeat.cancel()
+                try:
+                    await heartbeat
+                except asyncio.CancelledError:
+                    pass
+
+            await BroadcastJob.find_one(BroadcastJob.id == job_id).update(
+                Set({
+                    BroadcastJob.status: "completed",
+                    BroadcastJob.finished_at: datetime.utcnow(),
+                    BroadcastJob.updated_at: datetime.utcnow(),
+                    BroadcastJob.lease_until: None,
+                })
+            )
+            logger.info(f"Broadcast {job_id} completed")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Broadcast {job_id} failed: {repr(e)}")
+            await BroadcastJob.find_one(BroadcastJob.id == job_id).update(
+                Set({
+                    BroadcastJob.status: "failed",
+                    BroadcastJob.last_error: str(e),
+                    BroadcastJob.finished_at: datetime.utcnow(),
+                    BroadcastJob.updated_at: datetime.utcnow(),
+                    BroadcastJob.lease_until: None,
+                })
+            )
+
+    @classmethod
+    async def _keep_lease(cls, job_id: PydanticObjectId):
+        """Renew the lease of a running job until cancelled"""
+        while True:
+            await asyncio.sleep(cls.LEASE_SECONDS / 3)
+            now = datetime.utcnow()
+            try:
+                await BroadcastJob.find_one(
+                    BroadcastJob.id == job_id,
+                    BroadcastJob.status == "running",
+                ).update(
+                    Set({
+                        BroadcastJob.lease_until: now + timedelta(seconds=cls.LEASE_SECONDS),
+                        BroadcastJob.updated_at: now,
+                    })
+                )
+            except Exception as e:
+                logger.warning(f"Broadcast {job_id}: lease renewal failed: {repr(e)}")
+
+    @classmethod
+    async def _record_batch(cls, job: BroadcastJob, sent_ids: List[int], failed: int, cursor: int):
+        """Save the batch's notifications and advance the job"""
+        now = datetime.utcnow()
+        if sent_ids:
+            await Notification.insert_many([
+                Notification(
+                    user_id=chat_id,
+                    title=job.title,
+                    message=job.message,
+                    notification_type=job.notification_type,
+                    sent=True,
+                    sent_at=now,
+                )
+                for chat_id in sent_ids
+            ])
+        await BroadcastJob.find_one(BroadcastJob.id == job.id).update(
+            Inc({BroadcastJob.sent_count: len(sent_ids), BroadcastJob.failed_count: failed}),
+            Set({
+                BroadcastJob.cursor: cursor,
+                BroadcastJob.lease_until: now + timedelta(seconds=cls.LEASE_SECONDS),
+                BroadcastJob.updated_at: now,
+            })
+        )
+
+    @classmethod
+    async def send_many(
+        cls,
+        chat_ids: List[int],
+        text: str,
+        parse_mode: Optional[str] = None
+    ) -> List[bool]:
+        """Send one text to many chats concurrently, within the rate limits"""
+        semaphore = asyncio.Semaphore(settings.BROADCAST_CONCURRENCY)
+        return await asyncio.gather(*[
+            cls._send_limited(semaphore, chat_id, text, parse_mode) for chat_id in chat_ids
+        ])
+
+    @classmethod
+    async def _send_limited(
+        cls,
+        semaphore: asyncio.Semaphore,
+        chat_id: int,
+        text: str,
+        parse_mode: Optional[str] = None
+    ) -> bool:
+        async with semaphore:
+            return await cls.send_with_retry(chat_id, text, parse_mode)
+
+    @classmethod
+    async def send_with_retry(cls, chat_id: int, text: str, parse_mode: Optional[str] = None) -> bool:
+        """Send one message within the rate limits, honouring retry_after"""
+        for attempt in range(settings.BROADCAST_MAX_RETRIES + 1):
+            await cls.chat_limiter.acquire(chat_id)
+            await cls.global_bucket.acquire()
+            try:
+                response = await telegram_client.send_message(chat_id, text, parse_mode=parse_mode)
+            except httpx.HTTPError as e:
+                logger.warning(f"Broadcast send to {chat_id} failed: {repr(e)}")
+                await asyncio.sleep(2 ** attempt)
+                continue
+
+            if response.status_code == 200:
+                return True
+            if response.status_code == 429:
+                try:
+                    retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+                except ValueError:
+                    retry_after = 1
+                logger.warning(f"Telegram rate limit hit, pausing broadcasts for {retry_after}s")
+                cls.global_bucket.pause(retry_after)
+                continue
+            if response.status_code >= 500:
+                await asyncio.sleep(2 ** attempt)
+                continue
+
+            # 400/403: blocked the bot, deactivated, chat not found...
+            logger.debug(f"Broadcast to {chat_id} rejected: {response.status_code} {response.text}")
+            return False
+        return False
@@ -0,0 +1,164 @@
+"""
+Content Catalog - cached and indexed access to the JSON content files
+كتالوج المحتوى - وصول سريع ومفهرس لملفات المحتوى
+"""
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+
+
+DATA_DIR = Path('data')
+
+# name -> (file name, default value when missing or unreadable)
+CATALOG_FILES = {
+    'videos': ('videos.json', list),
+    'assignments': ('assignments.json', list),
+    'exams': ('exams.json', list),
+    'courses': ('courses.json', list),
+    'group_links': ('group_links.json', dict),
+    'links': ('links.json', dict),
+}
+
+
+class _CatalogEntry:
+    """A single JSON file loaded in memory together with its indexes"""
+
+    def __init__(self, data: Any, signature: Optional[Tuple[int, int]]):
+        self.data = data
+        self.signature = signature
+        # (type, item_id) -> items, e.g. ('courses', 'nlp_beginner')
+        self.by_key: Dict[Tuple[str, str], List[dict]] = {}
+        # course_id / item_id -> items (whatever the item type)
+        self.by_course: Dict[str, List[dict]] = {}
+        # id -> item (courses.json)
+        self.by_id: Dict[str, dict] = {}
+
+        if isinstance(data, list):
+            for item in data:
+                if not isinstance(item, dict):
+                    continue
+                item_id = item.get('item_id')
+                if item_id is not None:
+                    self.by_key.setdefault((item.get('type'), item_id), []).append(item)
+                course_id = item.get('course_id', item_id)
+                if course_id is not None:
+                    self.by_course.setdefault(course_id, []).append(item)
+                if item.get('id') is not None:
+                    self.by_id[item['id']] = item
+
+
+class ContentCatalog:
+    """
+    Process-wide cache of the content JSON files (videos, assignments, exams,
+    courses and group links).
+
+    Each file is parsed once and kept indexed by (type, item_id) and by course.
+    Every access only stats the file; it is re-read when its mtime or size
+    changes, so edits from the dashboard or admin handlers are picked up
+    without a restart.
+    """
+
+    def __init__(self, data_dir: Path = DATA_DIR):
+        self.data_dir = Path(data_dir)
+        self._entries: Dict[str, _CatalogEntry] = {}
+
+    def _load(self, name: str) -> _CatalogEntry:
+        """Return the cached entry for a file, reloading it if it changed on disk"""
+        file_name, default = CATALOG_FILES[name]
+        path = self.data_dir / file_name
+
+        try:
+            stat = os.stat(path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            signature = None
+
+        entry = self._entries.get(name)
+        if entry is not None and entry.signature == signature:
+            return entry
+
+        data = default()
+        if signature is not None:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                logger.debug(f"ContentCatalog: loaded {path}")
+            except Exception as e:
+                logger.error(f"ContentCatalog: error loading {path}: {repr(e)}")
+                # Keep serving the last good copy rather than an empty catalog
+                if entry is not None:
+                    return entry
+
+        entry = _CatalogEntry(data, signature)
+        self._entries[name] = entry
+        return entry
+
+    def invalidate(self, name: Optional[str] = None):
+        """Drop cached data so the next access re-reads the file(s)"""
+        if name is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(name, None)
+
+    # ------------------------------------------------------------------
+    # Raw lists
+    # ------------------------------------------------------------------
+
+    def all(self, name: str) -> Any:
+        """Return the whole content of a catalog file"""
+        data = self._load(name).data
+        return list(data) if isinstance(data, list) else data
+
+    # ------------------------------------------------------------------
+    # Indexed lookups
+    # ------------------------------------------------------------------
+
+    def videos(self, item_id: str, item_type: str = 'courses') -> List[dict]:
+        """Videos of a course/material, in upload order"""
+        return list(self._load('videos').by_key.get((item_type, item_id), []))
+
+    def assignments(self, item_id: str, item_type: str = 'courses') -> List[dict]:
+        """Assignments of a course/material, in creation order"""
+        return list(self._load('assignments').by_key.get((item_type, item_id), []))
+
+    def exams(self, course_id: str) -> List[dict]:
+        """Exams of a course, in creation order"""
+        return list(self._load('exams').by_course.get(course_id, []))
+
+    def for_course(self, name: str, course_id: str) -> List[dict]:
+        """Items of any list file that belong to a course, whatever their type"""
+        return list(self._load(name).by_course.get(course_id, []))
+
+    def get_course(self, course_id: str) -> Optional[dict]:
+        """Course entry from data/courses.json"""
+        return self._load('courses').by_id.get(course_id)
+
+    def courses_by_id(self) -> Dict[str, dict]:
+        """All courses from data/courses.json keyed by id"""
+        return dict(self._load('courses').by_id)
+
+    def group_link(self, item_id: str, item_type: str = 'courses') -> Optional[str]:
+        """Group link of a course/material from data/group_links.json"""
+        links = self._load('group_links').data
+        if not isinstance(links, dict):
+            return None
+        return links.get(item_type, {}).get(item_id) or links.get(item_id)
+
+    def course_links(self, course_id: str) -> List[dict]:
+        """Useful links of a course from data/links.json (nested or flat layout)"""
+        all_links = self._load('links').data
+        if not isinstance(all_links, dict):
+            return []
+
+        raw = all_links.get('courses', {}).get(course_id)
+        if not (raw and isinstance(raw, list)):
+            raw = all_links.get(course_id)
+        if not isinstance(raw, list):
+            return []
+        return [l for l in raw if isinstance(l, dict) and l.get('url')]
+
+
+# Shared instance used by the handlers
+content_catalog = ContentCatalog()
@@ -0,0 +1,339 @@
+"""
+JSON Document Store - atomic, lock-protected storage for JSON record files
+مخزن مستندات JSON - تخزين آمن ومتزامن لملفات السجلات
+"""
+import asyncio
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from loguru import logger
+
+
+DATA_DIR = Path('data')
+
+
+class JsonDocumentStore:
+    """
+    Keyed list-of-records JSON file (e.g. data/submissions.json).
+
+    - Records are kept in memory, keyed by `key_fields`.
+    - Every write takes the store's asyncio lock and appends one line to an
+      append-only journal (`<file>.journal`) from a worker thread, instead of
+      rewriting the whole file.
+    - The journal is compacted in the background: the full snapshot is written
+      to a temp file, fsync'ed and renamed over the JSON file, so the file on
+      disk is always a complete, valid document.
+    - Writes from other processes (the polling bot next to the web server,
+      maintenance scripts) are picked up: the file and journals are stat'ed
+      on every access and re-read when their mtime or size changed, and
+      again under the lock before every write. Writes made by two processes
+      at the same instant are not serialized.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        key_fields: Tuple[str, ...],
+        compact_threshold: int = 200,
+        compact_delay: float = 5.0,
+    ):
+        self.path = Path(path)
+        self.key_fields = tuple(key_fields)
+        self.compact_threshold = compact_threshold
+        self.compact_delay = compact_delay
+
+        self.journal_path = self.path.with_name(self.path.name + '.journal')
+        self.rotated_journal_path = self.path.with_name(self.path.name + '.journal.compacting')
+
+        self._records: Optional[Dict[tuple, dict]] = None
+        self._signature: Optional[tuple] = None  # files as of the last load or own write
+        self._journal_entries = 0
+        self._lock: Optional[asyncio.Lock] = None
+        self._compaction_task: Optional[asyncio.Task] = None
+        self._compacting = False
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def make_key(self, record: dict) -> tuple:
+        """Key of a record built from `key_fields`"""
+        return tuple(record.get(field) for field in self.key_fields)
+
+    @staticmethod
+    async def _run(func, *args):
+        """Run blocking file I/O in the default thread executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    def _file_signature(self) -> tuple:
+        """(mtime, size) of the JSON file and both journals (None when missing)"""
+        signature = []
+        for path in (self.path, self.rotated_journal_path, self.journal_path):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _load(self) -> Tuple[Dict[tuple, dict], tuple]:
+        """Records and the signature they were read at (runs in a worker thread)"""
+        signature = self._file_signature()
+        return self._read_snapshot(), signature
+
+    def _read_snapshot(self) -> Dict[tuple, dict]:
+        """Read the JSON file and replay any journals (runs in a worker thread)"""
+        records: Dict[tuple, dict] = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for record in json.load(f) or []:
+                    records[self.make_key(record)] = record
+
+        replayed = 0
+        for journal in (self.rotated_journal_path, self.journal_path):
+            if not journal.exists():
+                continue
+            with open(journal, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-append; skip it
+                        logger.warning(f"JsonDocumentStore: skipping corrupt journal line in {journal}")
+                        continue
+                    self._apply(records, entry)
+                    replayed += 1
+
+        self._journal_entries = replayed
+        return records
+
+    def _apply(self, records: Dict[tuple, dict], entry: dict):
+        """Apply one journal entry to a records dict"""
+        op = entry.get('op')
+        if op == 'put':
+            record = entry['record']
+            key = self.make_key(record)
+            if entry.get('move_to_end'):
+                records.pop(key, None)
+            records[key] = record
+        elif op == 'delete':
+            records.pop(tuple(entry['key']), None)
+
+    def _append_journal(self, line: str):
+        """Append one entry to the journal and flush it to disk"""
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rotate_journal(self):
+        """Move the live journal aside (appending if a previous compaction left one)"""
+        if not self.journal_path.exists():
+            return
+        if self.rotated_journal_path.exists():
+            with open(self.journal_path, 'r', encoding='utf-8') as src, \
+                    open(self.rotated_journal_path, 'a', encoding='utf-8') as dst:
+                dst.write(src.read())
+            self.journal_path.unlink()
+        else:
+            os.replace(self.journal_path, self.rotated_journal_path)
+
+    def _write_snapshot(self, records: List[dict]):
+        """Write the full document atomically (temp file + rename)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        if self.rotated_journal_path.exists():
+            self.rotated_journal_path.unlink()
+
+    def _is_stale(self) -> bool:
+        """Not loaded yet, or changed on disk by another process"""
+        if self._records is None:
+            return True
+        # Our own snapshot being written changes the files too
+        return not self._compacting and self._file_signature() != self._signature
+
+    async def _refresh(self):
+        """Reload if stale (lock held)"""
+        if self._is_stale():
+            self._records, self._signature = await self._run(self._load)
+
+    async def _ensure_loaded(self) -> Dict[tuple, dict]:
+        if self._is_stale():
+            async with self.lock:
+                await self._refresh()
+        return self._records
+
+    async def _write_entry(self, entry: dict):
+        """Apply an entry in memory and persist it to the journal (lock held, refreshed)"""
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        await self._run(self._append_journal, line)
+        self._signature = self._file_signature()
+        self._apply(self._records, entry)
+        self._journal_entries += 1
+        self._schedule_compaction()
+
+    # ------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------
+
+    def _schedule_compaction(self):
+        if self._compaction_task is not None and not self._compaction_task.done():
+            return
+        delay = 0 if self._journal_entries >= self.compact_threshold else self.compact_delay
+        self._compaction_task = asyncio.create_task(self._compact_later(delay))
+
+    async def _compact_later(self, delay: float):
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            await self.compact()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"JsonDocumentStore: compaction of {self.path} failed: {repr(e)}")
+
+    async def compact(self):
+        """Fold the journal into the JSON file"""
+        await self._ensure_loaded()
+
+        async with self.lock:
+            await self._refresh()
+            if self._journal_entries == 0:
+                return
+            # Rotate the journal so new writes go to a fresh file while the
+            # snapshot is written; the rotated journal is replayed on load
+            # until the snapshot has replaced the JSON file.
+            await self._run(self._rotate_journal)
+            snapshot = list(self._records.values())
+            self._journal_entries = 0
+            self._compacting = True
+
+        try:
+            await self._run(self._write_snapshot, snapshot)
+        finally:
+            async with self.lock:
+                self._compacting = False
+                self._signature = self._file_signature()
+        logger.debug(f"JsonDocumentStore: compacted {self.path} ({len(snapshot)} records)")
+
+    async def close(self):
+        """Wait for a pending compaction and fold the remaining journal"""
+        task = self._compaction_task
+        if task is not None and not task.done():
+            # Only interrupt the delay; a snapshot already being written must finish
+            if not self._compacting:
+                task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if self._records is not None:
+            await self.compact()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    async def all(self) -> List[dict]:
+        """All records (copies), in file order"""
+        records = await self._ensure_loaded()
+        return [dict(r) for r in records.values()]
+
+    async def find(self, **criteria: Any) -> List[dict]:
+        """Records whose fields equal all given criteria"""
+        records = await self._ensure_loaded()
+        return [
+            dict(r) for r in records.values()
+            if all(r.get(field) == value for field, value in criteria.items())
+        ]
+
+    async def get(self, *key: Any) -> Optional[dict]:
+        """Record by key (values in `key_fields` order)"""
+        records = await self._ensure_loaded()
+        record = records.get(tuple(key))
+        return dict(record) if record is not None else None
+
+    async def put(
+        self, record: dict, move_to_end: bool = False, return_previous: bool = False
+    ) -> Union[dict, Tuple[Optional[dict], dict]]:
+        """
+        Insert or replace a record. With return_previous, returns
+        (replaced record or None, record), read under the same lock.
+        """
+        await self._ensure_loaded()
+        record = dict(record)
+        async with self.lock:
+            await self._refresh()
+            previous = self._records.get(self.make_key(record))
+            await self._write_entry({'op': 'put', 'record': record, 'move_to_end': move_to_end})
+        if return_previous:
+            return (dict(previous) if previous is not None else None), dict(record)
+        return dict(record)
+
+    async def update(
+        self, key: Iterable[Any], changes: Dict[str, Any], return_previous: bool = False
+    ) -> Union[Optional[dict], Tuple[Optional[dict], Optional[dict]]]:
+        """
+        Update fields of an existing record; returns None if it does not
+        exist. With return_previous, returns (record before, record after),
+        read under the same lock ((None, None) if it does not exist).
+        """
+        await self._ensure_loaded()
+        key = tuple(key)
+        async with self.lock:
+            await self._refresh()
+            current = self._records.get(key)
+            if current is None:
+                return (None, None) if return_previous else None
+            record = {**current, **changes}
+            await self._write_entry({'op': 'put', 'record': record})
+        if return_previous:
+            return dict(current), dict(record)
+        return dict(record)
+
+    async def delete(self, *key: Any) -> bool:
+        """Delete a record by key"""
+        await self._ensure_loaded()
+        key = tuple(key)
+        async with self.lock:
+            await self._refresh()
+            if key not in self._records:
+                return False
+            await self._write_entry({'op': 'delete', 'key': list(key)})
+        return True
+
+
+# Shared stores (one per file so they share a lock)
+submissions_store = JsonDocumentStore(
+    DATA_DIR / 'submissions.json',
+    key_fields=('student_id', 'course_id', 'assignment_index'),
+)
+exam_grades_store = JsonDocumentStore(
+    DATA_DIR / 'exam_grades.json',
+    key_fields=('student_id', 'exam_index'),
+)
+
+
+async def close_stores():
+    """Flush all shared stores (call on shutdown)"""
+    for store in (submissions_store, exam_grades_store):
+        try:
+            await store.close()
+        except Exception as e:
+            logger.error(f"Failed to flush {store.path}: {repr(e)}")
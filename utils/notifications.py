@@ -5,33 +5,37 @@ Smart Notification System
 from datetime import datetime, timedelta
 from typing import List, Optional
 import asyncio
-import httpx
 from loguru import logger
 
 from database.models.user import User
-from database.models.assignment import Assignment
+from database.models.assignment import Assignment, AssignmentSubmission
 from database.models.notification import Notification
 from config.settings import settings
+from utils.telegram_client import telegram_client
+from utils.broadcast import BroadcastManager
+from utils.scheduler import JobScheduler
 
 
 class SmartNotificationManager:
     """Smart notification manager with scheduling"""
     
+    EMOJI_MAP = {
+        'info': 'ℹ️',
+        'success': '✅',
+        'warning': '⚠️',
+        'error': '❌',
+        'assignment': '📝',
+        'grade': '🎓',
+        'approval': '✅',
+        'deadline': '⏰'
+    }
+    
     @staticmethod
     async def send_telegram_message(telegram_id: int, message: str, parse_mode: str = "Markdown"):
         """Send Telegram message"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage",
-                    json={
-                        "chat_id": telegram_id,
-                        "text": message,
-                        "parse_mode": parse_mode
-                    },
-                    timeout=10.0
-                )
-                return response.status_code == 200
+            response = await telegram_client.send_message(telegram_id, message, parse_mode)
+            return response.status_code == 200
         except Exception as e:
             logger.error(f"Failed to send Telegram message to {telegram_id}: {e}")
             return False
@@ -57,18 +61,7 @@ class SmartNotificationManager:
             await notification.insert()
             
             # Format message
-            emoji_map = {
-                'info': 'ℹ️',
-                'success': '✅',
-                'warning': '⚠️',
-                'error': '❌',
-                'assignment': '📝',
-                'grade': '🎓',
-                'approval': '✅',
-                'deadline': '⏰'
-            }
-            
-            emoji = emoji_map.get(notification_type, 'ℹ️')
+            emoji = SmartNotificationManager.EMOJI_MAP.get(notification_type, 'ℹ️')
             formatted_message = f"{emoji} **{title}**\n\n{message}"
             
             # Send via Telegram
@@ -83,6 +76,69 @@ class SmartNotificationManager:
             logger.error(f"Failed to create and send notification: {e}")
             return False
     
+    @staticmethod
+    async def send_bulk_notifications(
+        user_ids: List[int],
+        title: str,
+        message: str,
+        notification_type: str = "info",
+        related_id: Optional[str] = None
+    ) -> int:
+        """Send the same notification to many users concurrently; returns sent count"""
+        if not user_ids:
+            return 0
+        
+        emoji = SmartNotificationManager.EMOJI_MAP.get(notification_type, 'ℹ️')
+        formatted_message = f"{emoji} **{title}**\n\n{message}"
+        
+        results = await BroadcastManager.send_many(user_ids, formatted_message, parse_mode="Markdown")
+        
+        now = datetime.utcnow()
+        await Notification.insert_many([
+            Notification(
+                user_id=user_id,
+                title=title,
+                message=message,
+                notification_type=notification_type,
+                related_id=related_id,
+                sent=sent,
+                sent_at=now if sent else None
+            )
+            for user_id, sent in zip(user_ids, results)
+        ])
+        
+        sent_count = sum(1 for sent in results if sent)
+        logger.info(f"Notification '{title}' sent to {sent_count}/{len(user_ids)} users")
+        return sent_count
+    
+    @staticmethod
+    async def get_reminder_audience(assignment: Assignment) -> List[int]:
+        """
+        telegram_ids approved in the assignment's course that have not
+        submitted it, resolved in one aggregation (approved_courses index +
+        lookup on the unique assignment/user submission index).
+        """
+        rows = await User.find(
+            User.approved_in_course_filter(assignment.related_id)
+        ).aggregate([
+            {'$project': {'telegram_id': 1}},
+            {'$lookup': {
+                'from': AssignmentSubmission.get_collection_name(),
+                'let': {'uid': {'$toString': '$telegram_id'}},
+                'pipeline': [
+                    {'$match': {
+                        'assignment_id': assignment.id,
+                        '$expr': {'$eq': ['$user_id', '$$uid']},
+                    }},
+                    {'$limit': 1},
+                    {'$project': {'_id': 1}},
+                ],
+                'as': 'submitted',
+            }},
+            {'$match': {'submitted': {'$size': 0}}},
+        ]).to_list()
+        return [row['telegram_id'] for row in rows]
+    
     @staticmethod
     async def send_deadline_reminders():
         """Send reminders for assignments due soon"""
@@ -97,19 +153,14 @@ class SmartNotificationManager:
             ).to_list()
             
             for assignment in assignments:
-                # Get all students who haven't submitted
-                users = await User.find().to_list()
+                # Students approved in the course who haven't submitted
+                audience = await SmartNotificationManager.get_reminder_audience(assignment)
+                if not audience:
+                    continue
+                
+                hours_left = int((assignment.deadline - datetime.utcnow()).total_seconds() / 3600)
                 
-                for user in users:
-                    # Check if user has access and hasn't submitted
-                    if user.has_approved_course(assignment.related_id):
-                        submission = assignment.get_submission(str(user.telegram_id))
-                        
-                        if not submission:
-                            # Send reminder
-                            hours_left = int((assignment.deadline - datetime.utcnow()).total_seconds() / 3600)
-                            
-                            message = f"""
+                message = f"""
 ⏰ **تذكير بموعد نهائي قريب!**
 
 📝 **الواجب:** {assignment.title}
@@ -119,15 +170,15 @@ class SmartNotificationManager:
 يرجى التسليم قبل انتهاء الموعد.
 
 🔔 لن نرسل المزيد من التذكيرات.
-                            """
-                            
-                            await SmartNotificationManager.create_and_send_notification(
-                                user.telegram_id,
-                                "تذكير بموعد نهائي",
-                                message.strip(),
-                                "deadline",
-                                str(assignment.id)
-                            )
+                """
+                
+                await SmartNotificationManager.send_bulk_notifications(
+                    audience,
+                    "تذكير بموعد نهائي",
+                    message.strip(),
+                    "deadline",
+                    str(assignment.id)
+                )
             
             logger.info(f"Deadline reminders sent for {len(assignments)} assignments")
         except Exception as e:
@@ -138,8 +189,7 @@ class SmartNotificationManager:
         """Notify students about new content"""
         try:
             # Get all enrolled students
-            users = await User.find().to_list()
-            enrolled_users = [u for u in users if u.has_approved_course(course_id)]
+            enrolled_users = await User.find_approved_in_course(course_id).to_list()
             
             emoji_map = {
                 'video': '🎥',
@@ -159,14 +209,13 @@ class SmartNotificationManager:
 افتح البوت الآن للوصول إلى المحتوى الجديد! 🚀
             """
             
-            for user in enrolled_users:
-                await SmartNotificationManager.create_and_send_notification(
-                    user.telegram_id,
-                    "محتوى جديد",
-                    message.strip(),
-                    "info",
-                    course_id
-                )
+            await SmartNotificationManager.send_bulk_notifications(
+                [user.telegram_id for user in enrolled_users],
+                "محتوى جديد",
+                message.strip(),
+                "info",
+                course_id
+            )
             
             logger.info(f"New content notification sent to {len(enrolled_users)} users")
         except Exception as e:
@@ -183,24 +232,17 @@ class SmartNotificationManager:
             new_users = await User.find(User.registered_at > today).count()
             
             # New submissions
-            all_assignments = await Assignment.find().to_list()
-            new_submissions = 0
-            for assignment in all_assignments:
-                for submission in assignment.submissions:
-                    if submission.submitted_at > today:
-                        new_submissions += 1
+            new_submissions = await AssignmentSubmission.find(
+                AssignmentSubmission.submitted_at > today
+            ).count()
             
             # Pending grading
-            pending_grading = 0
-            for assignment in all_assignments:
-                for submission in assignment.submissions:
-                    if submission.status == "submitted":
-                        pending_grading += 1
+            pending_grading = await AssignmentSubmission.find(
+                AssignmentSubmission.status == "submitted"
+            ).count()
             
             # Pending approvals
-            pending_approvals = await User.find(
-                User.courses.approval_status == "pending"
-            ).count()
+            pending_approvals = await User.find(User.pending_filter()).count()
             
             message = f"""
 📊 **ملخص يومي - {datetime.utcnow().strftime('%Y-%m-%d')}**
@@ -308,31 +350,35 @@ class SmartNotificationManager:
 class NotificationScheduler:
     """Background task scheduler for notifications"""
     
+    # Durable, replica-safe scheduler (schedules are UTC cron expressions)
+    scheduler = JobScheduler()
+    
+    @staticmethod
+    def register_jobs():
+        """Register the recurring notification jobs"""
+        scheduler = NotificationScheduler.scheduler
+        # Deadline reminders every 6 hours
+        scheduler.register(
+            "deadline_reminders", "0 */6 * * *",
+            SmartNotificationManager.send_deadline_reminders
+        )
+        # Inactivity reminders daily at 10 AM
+        scheduler.register(
+            "inactivity_reminders", "0 10 * * *",
+            NotificationScheduler.send_inactivity_reminders
+        )
+        # Daily admin summary at 8 PM
+        scheduler.register(
+            "daily_admin_summary", "0 20 * * *",
+            SmartNotificationManager.send_daily_admin_summary
+        )
+    
     @staticmethod
     async def start_notification_scheduler():
-        """Start background notification tasks"""
+        """Start background notification tasks (runs until cancelled)"""
         logger.info("Starting notification scheduler...")
-        
-        while True:
-            try:
-                # Run deadline reminders every 6 hours
-                await SmartNotificationManager.send_deadline_reminders()
-                
-                # Check for inactive users (daily at 10 AM)
-                now = datetime.utcnow()
-                if now.hour == 10:
-                    await NotificationScheduler.send_inactivity_reminders()
-                
-                # Send daily admin summary (daily at 8 PM)
-                if now.hour == 20:
-                    await SmartNotificationManager.send_daily_admin_summary()
-                
-                # Wait 6 hours
-                await asyncio.sleep(6 * 60 * 60)
-                
-            except Exception as e:
-                logger.error(f"Error in notification scheduler: {e}")
-                await asyncio.sleep(60)
+        NotificationScheduler.register_jobs()
+        await NotificationScheduler.scheduler.run_forever()
     
     @staticmethod
     async def send_inactivity_reminders():
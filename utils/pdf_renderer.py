@@ -0,0 +1,285 @@
+"""
+PDF Renderer - reportlab rendering in a warm process pool
+محرك PDF - إنشاء ملفات PDF في مجموعة عمليات جاهزة
+
+Rendering functions take a plain payload (dicts, lists and strings) and
+return the PDF bytes, so they can run in worker processes. reportlab is
+only imported inside the workers (or by the thread fallback).
+"""
+import asyncio
+import io
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+from xml.sax.saxutils import escape
+
+from loguru import logger
+
+from config.settings import settings
+
+
+# Fonts with Latin and Arabic glyphs, tried in order when REPORT_PDF_FONT_PATH is unset
+FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+]
+
+_ARABIC = re.compile(r"[\u0600-\u06FF\u0750-\u077F\uFB50-\uFDFF\uFE70-\uFEFF]")
+
+
+# ----------------------------------------------------------------------
+# Worker side (state is per process, set up once by init_worker)
+# ----------------------------------------------------------------------
+
+_worker = None
+
+
+class _WorkerState:
+    """Fonts, paragraph styles and table styles shared by every render of a worker"""
+
+    def __init__(self, font_path: Optional[str]):
+        from reportlab.lib import colors
+        from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        from reportlab.platypus import TableStyle
+
+        self.font, self.bold_font = "Helvetica", "Helvetica-Bold"
+        if font_path:
+            try:
+                pdfmetrics.registerFont(TTFont("ReportFont", font_path))
+                bold_path = font_path.replace(".ttf", "-Bold.ttf")
+                if os.path.exists(bold_path):
+                    pdfmetrics.registerFont(TTFont("ReportFont-Bold", bold_path))
+                    self.bold_font = "ReportFont-Bold"
+                else:
+                    self.bold_font = "ReportFont"
+                self.font = "ReportFont"
+                pdfmetrics.registerFontFamily(
+                    "ReportFont", normal=self.font, bold=self.bold_font,
+                    italic=self.font, boldItalic=self.bold_font
+                )
+            except Exception as e:
+                logger.warning(f"Could not load PDF font {font_path}: {e}")
+
+        try:
+            import arabic_reshaper
+            from bidi.algorithm import get_display
+            self._shape = lambda text: get_display(arabic_reshaper.reshape(text))
+        except ImportError:
+            self._shape = None
+
+        sample = getSampleStyleSheet()
+        self.styles = {
+            name: ParagraphStyle(f"Report{name}", parent=sample[name], fontName=self.bold_font if name != "Normal" else self.font)
+            for name in ("Title", "Heading2", "Normal")
+        }
+        self.info_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, -1), self.font),
+            ('FONTNAME', (0, 0), (0, -1), self.bold_font),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ])
+        self.grades_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, -1), self.font),
+            ('FONTNAME', (0, 0), (-1, 0), self.bold_font),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ])
+
+    def text(self, value: Any) -> str:
+        """Arabic text reshaped and reordered for display (reportlab does no shaping)"""
+        value = "" if value is None else str(value)
+        if self._shape and _ARABIC.search(value):
+            return self._shape(value)
+        return value
+
+
+def init_worker(font_path: Optional[str]):
+    """Process initializer: load fonts and build styles once"""
+    global _worker
+    _worker = _WorkerState(font_path)
+
+
+def _ping() -> int:
+    # Held briefly so concurrent pings land on different workers
+    time.sleep(0.2)
+    return os.getpid()
+
+
+def render_student_report(payload: Dict[str, Any]) -> bytes:
+    """
+    Student report PDF from a payload:
+    {full_name, email, phone, registered_at, last_active,
+     grades: [[assignment title, score, percentage, status], ...]}
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table
+
+    state = _worker
+    if state is None:
+        init_worker(resolve_font_path())
+        state = _worker
+    styles = state.styles
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    elements = []
+
+    elements.append(Paragraph(f"<b>Student Report: {escape(state.text(payload['full_name']))}</b>", styles['Title']))
+    elements.append(Spacer(1, 20))
+
+    info_table = Table([
+        ['Email:', state.text(payload['email'])],
+        ['Phone:', state.text(payload['phone'])],
+        ['Registered:', payload['registered_at']],
+        ['Last Active:', payload['last_active']]
+    ], colWidths=[150, 350])
+    info_table.setStyle(state.info_table_style)
+    elements.append(info_table)
+    elements.append(Spacer(1, 20))
+
+    elements.append(Paragraph("<b>Grades Summary</b>", styles['Heading2']))
+    elements.append(Spacer(1, 10))
+
+    if payload['grades']:
+        grades_table = Table(
+            [['Assignment', 'Score', 'Percentage', 'Status']]
+            + [[state.text(row[0]), *row[1:]] for row in payload['grades']],
+            colWidths=[200, 80, 100, 80]
+        )
+        grades_table.setStyle(state.grades_table_style)
+        elements.append(grades_table)
+    else:
+        elements.append(Paragraph("No graded assignments yet.", styles['Normal']))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def resolve_font_path() -> Optional[str]:
+    """Configured font, else the first installed candidate (None: built-in Helvetica, Latin only)"""
+    if settings.REPORT_PDF_FONT_PATH:
+        return settings.REPORT_PDF_FONT_PATH
+    return next((path for path in FONT_CANDIDATES if os.path.exists(path)), None)
+
+
+# ----------------------------------------------------------------------
+# Event-loop side
+# ----------------------------------------------------------------------
+
+class PdfRenderPool:
+    """
+    Runs render functions in a pool of `workers` processes (spawned on first
+    use or by warm()), each initialized once with the fonts and styles.
+    With workers=0 renders run in a thread of this process instead (for
+    platforms that cannot start processes).
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._font_path: Optional[str] = None
+
+        # Metrics
+        self.rendered = 0
+        self.failures = 0
+        self.restarts = 0
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None
+        if self._executor is None:
+            self._font_path = resolve_font_path()
+            if self._font_path is None:
+                logger.warning("No TTF font found for PDF reports - Arabic text will not render")
+            try:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=init_worker,
+                    initargs=(self._font_path,),
+                )
+            except (OSError, NotImplementedError) as e:
+                # e.g. no sem_open on serverless runtimes: render in a thread from now on
+                logger.warning(f"Cannot start PDF render processes, rendering in a thread: {e}")
+                self.workers = 0
+                return None
+        return self._executor
+
+    async def _run(self, func, *args):
+        executor = self._get_executor()
+        if executor is None:
+            return await asyncio.to_thread(func, *args)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); start a fresh pool for the next call
+            # (unless a concurrent failure already replaced it)
+            if self._executor is executor:
+                self.restarts += 1
+                self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    async def warm(self):
+        """Start the worker processes now instead of on the first report"""
+        if self.workers <= 0:
+            return
+        try:
+            pids = await asyncio.gather(*(self._run(_ping) for _ in range(self.workers)))
+            logger.info(f"PDF render pool ready ({len(set(pids))} workers)")
+        except Exception as e:
+            logger.error(f"Failed to start PDF render pool: {e}")
+
+    async def render_student_report(self, payload: Dict[str, Any]) -> bytes:
+        try:
+            pdf = await self._run(render_student_report, payload)
+        except Exception:
+            self.failures += 1
+            raise
+        self.rendered += 1
+        return pdf
+
+    async def render_student_reports(self, payloads: List[Dict[str, Any]]) -> List[Optional[bytes]]:
+        """Render several reports in parallel (None for the ones that failed)"""
+        results = await asyncio.gather(
+            *(self.render_student_report(payload) for payload in payloads),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.error(f"PDF render failed: {result}")
+        return [None if isinstance(result, BaseException) else result for result in results]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "started": self._executor is not None,
+            "font": self._font_path,
+            "rendered": self.rendered,
+            "failures": self.failures,
+            "restarts": self.restarts,
+        }
+
+
+# Shared instance
+pdf_renderer = PdfRenderPool(workers=settings.REPORT_PDF_WORKERS)
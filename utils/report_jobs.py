@@ -0,0 +1,289 @@
+"""
+Report Jobs - background report generation with cached artifacts
+مهام التقارير - توليد التقارير في الخلفية مع تخزين الملفات المولدة
+"""
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from beanie.operators import Set
+from loguru import logger
+from telegram.error import TelegramError
+
+from config.settings import settings
+from database.models.report_cache import (
+    REPORT_SCOPE_ASSIGNMENTS, REPORT_SCOPE_GRADES, REPORT_SCOPE_USERS, DataVersion, ReportArtifact, student_scope,
+)
+
+
+# Largest document a bot can upload
+TELEGRAM_UPLOAD_LIMIT = 50 * 1024 * 1024
+
+
+class ReportType:
+    """A report: the data scopes it reads (for given parameters), how to build it and its file name"""
+
+    def __init__(
+        self,
+        scopes: Callable[[Dict[str, Any]], Tuple[str, ...]],
+        build: Callable[[Dict[str, Any]], Awaitable[Any]],
+        filename: Callable[[Dict[str, Any]], str],
+    ):
+        self.scopes = scopes
+        self.build = build
+        self.filename = filename
+
+
+# utils.reports (openpyxl, reportlab) is only imported when a report is built
+
+async def _build_students_excel(params: Dict[str, Any]):
+    from utils.reports import ReportGenerator
+    return await ReportGenerator.generate_students_excel(params.get("course_id"))
+
+
+async def _build_student_pdf(params: Dict[str, Any]):
+    from utils.reports import ReportGenerator
+    return await ReportGenerator.generate_student_report_pdf(params["telegram_id"])
+
+
+async def _build_course_pack(params: Dict[str, Any]):
+    from utils.reports import ReportGenerator
+    return await ReportGenerator.generate_course_report_pack(params["course_id"])
+
+
+REPORT_TYPES: Dict[str, ReportType] = {
+    "students_excel": ReportType(
+        scopes=lambda params: (REPORT_SCOPE_USERS, REPORT_SCOPE_GRADES),
+        build=_build_students_excel,
+        filename=lambda params: f"students_report_{datetime.now().strftime('%Y%m%d')}.xlsx",
+    ),
+    "student_pdf": ReportType(
+        # Only this student's data, so other students' activity keeps it cached
+        scopes=lambda params: (
+            student_scope(REPORT_SCOPE_USERS, params["telegram_id"]),
+            student_scope(REPORT_SCOPE_GRADES, params["telegram_id"]),
+            REPORT_SCOPE_ASSIGNMENTS,
+        ),
+        build=_build_student_pdf,
+        filename=lambda params: f"report_{params['telegram_id']}.pdf",
+    ),
+    "course_pack": ReportType(
+        scopes=lambda params: (REPORT_SCOPE_USERS, REPORT_SCOPE_GRADES),
+        build=_build_course_pack,
+        filename=lambda params: f"reports_{params['course_id']}_{datetime.now().strftime('%Y%m%d')}.zip",
+    ),
+}
+
+
+def _write_file(path: Path, data: bytes):
+    """Write atomically (temp file + rename) so readers never see a partial file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _move_file(source: Path, path: Path) -> int:
+    """Move a built file into the cache (atomically when on the same filesystem); returns its size"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    shutil.move(str(source), tmp_path)
+    os.replace(tmp_path, path)
+    return path.stat().st_size
+
+
+class ReportJobQueue:
+    """
+    Generates reports in the background and caches the result.
+
+    - A report is identified by its type and parameters. Its ETag is the
+      versions of the data scopes it reads (see DataVersion), so the file is
+      reused until one of them changes.
+    - The file is kept under `cache_dir` (metadata in report_artifacts) and
+      the Telegram file_id of its first upload is remembered, so repeated
+      requests re-send the document without uploading it again.
+    - At most `workers` reports are generated at once; identical requests
+      made while a report is being generated wait for that job.
+    """
+
+    def __init__(self, workers: int, cache_dir: Path):
+        self.workers = workers
+        self.cache_dir = Path(cache_dir)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._jobs: Dict[Tuple[str, str], asyncio.Future] = {}
+
+        # Metrics
+        self.cache_hits = 0
+        self.file_id_sends = 0
+        self.uploads = 0
+        self.generated = 0
+        self.failures = 0
+        self.uncached = 0  # generated but not written to the cache
+        self.joined = 0
+        self.generation_ms = 0
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        return self._semaphore
+
+    @staticmethod
+    def report_key(report_type: str, params: Dict[str, Any]) -> str:
+        return f"{report_type}:{json.dumps(params, sort_keys=True, default=str)}"
+
+    async def get(self, report_type: str, params: Dict[str, Any], force: bool = False) -> Optional[ReportArtifact]:
+        """Up-to-date artifact of a report, generating it if needed (None if generation failed)"""
+        spec = REPORT_TYPES[report_type]
+        key = self.report_key(report_type, params)
+        scopes = spec.scopes(params)
+        versions = await DataVersion.current(scopes)
+        etag = ",".join(f"{scope}={versions[scope]}" for scope in scopes)
+
+        if not force:
+            artifact = await ReportArtifact.find_one(ReportArtifact.report_key == key)
+            if artifact and artifact.etag == etag and (artifact.telegram_file_id or Path(artifact.path).exists()):
+                self.cache_hits += 1
+                return artifact
+
+        job = self._jobs.get((key, etag))
+        if job is not None:
+            self.joined += 1
+            return await asyncio.shield(job)
+
+        job = asyncio.get_running_loop().create_future()
+        self._jobs[(key, etag)] = job
+        try:
+            artifact = await self._generate(spec, key, etag, params)
+            job.set_result(artifact)
+            return artifact
+        finally:
+            if not job.done():
+                job.set_result(None)
+            self._jobs.pop((key, etag), None)
+
+    async def _generate(self, spec: ReportType, key: str, etag: str, params: Dict[str, Any]) -> Optional[ReportArtifact]:
+        async with self.semaphore:
+            start = time.perf_counter()
+            try:
+                output = await spec.build(params)
+            except Exception as e:
+                logger.error(f"Report {key} failed: {e}")
+                output = None
+            if output is None:
+                self.failures += 1
+                return None
+
+            path = self.cache_dir / f"{hashlib.sha1(key.encode()).hexdigest()}{Path(spec.filename(params)).suffix}"
+            data = None if isinstance(output, Path) else output.getvalue()
+            try:
+                if data is None:
+                    # Large reports are written to a file by the builder
+                    size = await asyncio.to_thread(_move_file, output, path)
+                else:
+                    size = len(data)
+                    await asyncio.to_thread(_write_file, path, data)
+                cached = True
+            except OSError as e:
+                # e.g. a read-only filesystem: serve this copy without caching it
+                logger.warning(f"Report {key} could not be cached, sending it uncached: {e}")
+                self.uncached += 1
+                cached = False
+                if data is None:
+                    path, size = output, output.stat().st_size
+                else:
+                    path, size = "", len(data)
+            elapsed_ms = int((time.perf_counter() - start) * 1000)
+
+        self.generated += 1
+        self.generation_ms += elapsed_ms
+        logger.info(f"Report {key} generated in {elapsed_ms} ms ({size} bytes)")
+
+        values = {
+            "etag": etag,
+            "filename": spec.filename(params),
+            "path": str(path),
+            "size": size,
+            "telegram_file_id": None,
+            "generation_ms": elapsed_ms,
+            "generated_at": datetime.utcnow(),
+        }
+        if not cached:
+            artifact = ReportArtifact(report_key=key, **values)
+            artifact._data = data
+            return artifact
+
+        await ReportArtifact.find_one(ReportArtifact.report_key == key).upsert(
+            Set(values),
+            on_insert=ReportArtifact(report_key=key, **values)
+        )
+        return await ReportArtifact.find_one(ReportArtifact.report_key == key)
+
+    async def send(self, bot, chat_id: int, report_type: str, params: Dict[str, Any], caption: Optional[str] = None) -> bool:
+        """
+        Send a report as a document: by remembered file_id when the cached
+        artifact is current, otherwise uploaded (and its file_id remembered).
+        False if the report could not be generated.
+        """
+        artifact = await self.get(report_type, params)
+        if artifact is None:
+            return False
+
+        if artifact.telegram_file_id:
+            try:
+                await bot.send_document(chat_id=chat_id, document=artifact.telegram_file_id, caption=caption)
+                self.file_id_sends += 1
+                return True
+            except TelegramError as e:
+                logger.warning(f"Cached file_id of {artifact.report_key} rejected, uploading again: {e}")
+
+        if artifact.size > TELEGRAM_UPLOAD_LIMIT:
+            logger.warning(f"Report {artifact.report_key} is {artifact.size} bytes, over the Bot API upload limit")
+            return False
+
+        try:
+            data = artifact._data
+            if data is None:
+                data = await asyncio.to_thread(Path(artifact.path).read_bytes)
+        except FileNotFoundError:
+            # Generated by another replica or the cache dir was cleared
+            artifact = await self.get(report_type, params, force=True)
+            if artifact is None:
+                return False
+            data = await asyncio.to_thread(Path(artifact.path).read_bytes)
+
+        message = await bot.send_document(chat_id=chat_id, document=data, filename=artifact.filename, caption=caption)
+        self.uploads += 1
+
+        if message.document:
+            # Only remembered if the artifact was not regenerated meanwhile
+            await ReportArtifact.find_one(
+                ReportArtifact.report_key == artifact.report_key,
+                ReportArtifact.etag == artifact.etag,
+            ).update(Set({ReportArtifact.telegram_file_id: message.document.file_id}))
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": len(self._jobs),
+            "cache_hits": self.cache_hits,
+            "file_id_sends": self.file_id_sends,
+            "uploads": self.uploads,
+            "generated": self.generated,
+            "joined": self.joined,
+            "failures": self.failures,
+            "uncached": self.uncached,
+            "avg_generation_ms": round(self.generation_ms / self.generated) if self.generated else None,
+        }
+
+
+# Shared instance
+report_jobs = ReportJobQueue(workers=settings.REPORT_JOB_WORKERS, cache_dir=Path(settings.REPORT_CACHE_DIR))
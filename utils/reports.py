@@ -2,36 +2,292 @@
 Reports Export System - Excel and PDF
 نظام تصدير التقارير
 """
+import asyncio
 import io
+import os
+import queue
+import re
+import tempfile
+import zipfile
 from datetime import datetime
-from typing import List, Optional
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+from beanie.operators import In
 from loguru import logger
+from pydantic import BaseModel
 
 # Excel export
 try:
     import openpyxl
-    from openpyxl.styles import Font, Alignment, PatternFill
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, Alignment, NamedStyle, PatternFill
     from openpyxl.utils import get_column_letter
     EXCEL_AVAILABLE = True
 except ImportError:
     EXCEL_AVAILABLE = False
     logger.warning("openpyxl not installed - Excel export unavailable")
 
-# PDF export
+# PDF export (rendered by utils/pdf_renderer.py)
 try:
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.lib import colors
-    from reportlab.lib.styles import getSampleStyleSheet
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.pdfbase import pdfmetrics
-    from reportlab.pdfbase.ttfonts import TTFont
+    import reportlab  # noqa: F401
     PDF_AVAILABLE = True
 except ImportError:
     PDF_AVAILABLE = False
     logger.warning("reportlab not installed - PDF export unavailable")
 
 from database.models.user import User
-from database.models.assignment import Assignment
+from database.models.assignment import Assignment, AssignmentSubmission
+from utils.pdf_renderer import pdf_renderer
+
+
+# Streaming students export
+STUDENTS_HEADERS = ['#', 'الاسم', 'البريد الإلكتروني', 'الهاتف', 'تاريخ التسجيل',
+                    'آخر نشاط', 'الدورات المسجلة', 'الواجبات المسلمة', 'المعدل']
+EXPORT_CHUNK_SIZE = 500  # rows handed to the writer thread at a time
+EXPORT_MAX_CHUNKS = 4    # chunks buffered between the cursor and the writer
+PACK_RENDER_WINDOW = 8   # student PDFs rendered (and held in memory) at once
+
+
+class StudentExportRow(BaseModel):
+    """Projection of the user fields written to the students report"""
+    telegram_id: int
+    full_name: str
+    email: str
+    phone: str
+    registered_at: datetime
+    last_active: datetime
+    approved_courses: int = 0
+    
+    class Settings:
+        projection = {
+            "telegram_id": 1,
+            "full_name": 1,
+            "email": 1,
+            "phone": 1,
+            "registered_at": 1,
+            "last_active": 1,
+            "approved_courses": {"$size": {"$ifNull": ["$approved_course_ids", []]}},
+        }
+
+
+async def grade_stats_by_user(user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    {user_id: {"submitted": n, "average": pct or None}} of `user_ids` in one
+    aggregation over their submissions (grades as % of each assignment's
+    max_grade)
+    """
+    if not user_ids:
+        return {}
+    pipeline = [
+        {"$match": {"user_id": {"$in": user_ids}}},
+        {"$lookup": {
+            "from": Assignment.Settings.name,
+            "let": {"assignment_id": "$assignment_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$_id", "$$assignment_id"]}}},
+                {"$project": {"max_grade": 1}},
+            ],
+            "as": "assignment",
+        }},
+        {"$unwind": "$assignment"},  # skip submissions of deleted assignments
+        {"$group": {
+            "_id": "$user_id",
+            "submitted": {"$sum": 1},
+            "average": {"$avg": {"$cond": [
+                {"$isNumber": "$grade"},
+                {"$multiply": [{"$divide": ["$grade", "$assignment.max_grade"]}, 100]},
+                None,
+            ]}},
+        }},
+    ]
+    stats = {}
+    async for row in AssignmentSubmission.aggregate(pipeline):
+        stats[row["_id"]] = row
+    return stats
+
+
+async def student_export_rows(course_id: Optional[str] = None) -> AsyncIterator[list]:
+    """
+    Report rows streamed from a users cursor (only approved students of
+    course_id if given), with the grade stats fetched per chunk of
+    EXPORT_CHUNK_SIZE students
+    """
+    query = User.find(User.approved_in_course_filter(course_id)) if course_id else User.find()
+    
+    index = 0
+    students: List[StudentExportRow] = []
+    
+    async def flush():
+        nonlocal index
+        grades = await grade_stats_by_user([str(s.telegram_id) for s in students])
+        rows = []
+        for student in students:
+            index += 1
+            stats = grades.get(str(student.telegram_id), {})
+            rows.append([
+                index,
+                student.full_name,
+                student.email,
+                student.phone,
+                student.registered_at.strftime('%Y-%m-%d'),
+                student.last_active.strftime('%Y-%m-%d'),
+                student.approved_courses,
+                stats.get("submitted", 0),
+                f"{stats.get('average') or 0:.1f}%"
+            ])
+        students.clear()
+        return rows
+    
+    async for student in query.project(StudentExportRow):
+        students.append(student)
+        if len(students) >= EXPORT_CHUNK_SIZE:
+            for row in await flush():
+                yield row
+    for row in await flush():
+        yield row
+
+
+def _add_report_styles(wb, header_color: str):
+    """Register the shared header/cell named styles on a workbook"""
+    header = NamedStyle(name="report_header")
+    header.fill = PatternFill(start_color=header_color, end_color=header_color, fill_type="solid")
+    header.font = Font(bold=True, color="FFFFFF", size=12)
+    header.alignment = Alignment(horizontal='center', vertical='center')
+    wb.add_named_style(header)
+    
+    cell = NamedStyle(name="report_cell")
+    cell.alignment = Alignment(horizontal='center', vertical='center')
+    wb.add_named_style(cell)
+
+
+def _styled_row(ws, values: list, style: str) -> list:
+    cells = []
+    for value in values:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = style
+        cells.append(cell)
+    return cells
+
+
+def _write_streamed_workbook(title: str, headers: List[str], header_color: str, chunks: "queue.Queue") -> io.BytesIO:
+    """
+    Build a write-only workbook from row chunks put on `chunks` (None ends
+    the stream). Runs in a worker thread. On error the remaining chunks are
+    still consumed so the producer never blocks, then the error is raised.
+    """
+    error = None
+    try:
+        wb = openpyxl.Workbook(write_only=True)
+        _add_report_styles(wb, header_color)
+        ws = wb.create_sheet(title)
+        for col in range(1, len(headers) + 1):
+            ws.column_dimensions[get_column_letter(col)].width = 15
+        ws.append(_styled_row(ws, headers, "report_header"))
+    except Exception as e:
+        error = e
+    
+    while (chunk := chunks.get()) is not None:
+        if error is not None:
+            continue
+        try:
+            for row in chunk:
+                ws.append(_styled_row(ws, row, "report_cell"))
+        except Exception as e:
+            error = e
+    
+    if error is not None:
+        raise error
+    
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+async def stream_to_excel(rows: AsyncIterator[list], title: str, headers: List[str], header_color: str):
+    """Write async-generated rows to a workbook built in a worker thread; returns (buffer, row count)"""
+    chunks: "queue.Queue" = queue.Queue(maxsize=EXPORT_MAX_CHUNKS)
+    writer = asyncio.create_task(asyncio.to_thread(
+        _write_streamed_workbook, title, headers, header_color, chunks
+    ))
+    
+    count = 0
+    chunk = []
+    try:
+        async for row in rows:
+            chunk.append(row)
+            count += 1
+            if len(chunk) >= EXPORT_CHUNK_SIZE:
+                await asyncio.to_thread(chunks.put, chunk)
+                chunk = []
+        if chunk:
+            await asyncio.to_thread(chunks.put, chunk)
+    finally:
+        await asyncio.to_thread(chunks.put, None)
+        buffer = await writer
+    return buffer, count
+
+
+async def student_report_payloads(users: List[User]) -> List[Dict[str, Any]]:
+    """
+    Plain data of the PDF reports of `users` (see
+    pdf_renderer.render_student_report), with one submissions query and one
+    assignments query for all of them
+    """
+    submissions = await AssignmentSubmission.find(
+        In(AssignmentSubmission.user_id, [str(user.telegram_id) for user in users]),
+        AssignmentSubmission.grade != None
+    ).to_list() if users else []
+    assignments = {
+        a.id: a for a in await Assignment.find(
+            In(Assignment.id, list({s.assignment_id for s in submissions}))
+        ).to_list()
+    } if submissions else {}
+    
+    grades_by_user: Dict[str, list] = {}
+    for submission in submissions:
+        assignment = assignments.get(submission.assignment_id)
+        if assignment:
+            grades_by_user.setdefault(submission.user_id, []).append([
+                assignment.title,
+                f"{submission.grade}/{assignment.max_grade}",
+                f"{submission.grade / assignment.max_grade * 100:.1f}%",
+                "Passed" if submission.grade >= assignment.pass_grade else "Failed"
+            ])
+    
+    return [
+        {
+            "full_name": user.full_name,
+            "email": user.email,
+            "phone": user.phone,
+            "registered_at": user.registered_at.strftime('%Y-%m-%d'),
+            "last_active": user.last_active.strftime('%Y-%m-%d'),
+            "grades": grades_by_user.get(str(user.telegram_id), []),
+        }
+        for user in users
+    ]
+
+
+async def student_report_payload(telegram_id: int) -> Optional[Dict[str, Any]]:
+    """Plain data of one student's PDF report (None if not registered)"""
+    user = await User.find_one(User.telegram_id == telegram_id)
+    if not user:
+        return None
+    return (await student_report_payloads([user]))[0]
+
+
+def _pack_entry_name(index: int, payload: Dict[str, Any]) -> str:
+    """File name of a report inside the course pack"""
+    name = re.sub(r'[\\/:*?"<>|\s]+', '_', payload["full_name"]).strip('_') or "student"
+    return f"{index:03d}_{name}.pdf"
+
+
+def _write_pack_entries(path: Path, entries: List[tuple]):
+    """Append (name, pdf bytes) entries to the ZIP at `path` (runs in a worker thread)"""
+    # PDF page streams are already compressed
+    with zipfile.ZipFile(path, "a", compression=zipfile.ZIP_STORED) as pack:
+        for name, pdf in entries:
+            pack.writestr(name, pdf)
 
 
 class ReportGenerator:
@@ -39,85 +295,24 @@ class ReportGenerator:
     
     @staticmethod
     async def generate_students_excel(course_id: Optional[str] = None) -> Optional[io.BytesIO]:
-        """Generate Excel report of students"""
+        """
+        Generate Excel report of students. Rows are streamed from a users
+        cursor into a write-only workbook built in a worker thread, so memory
+        is bounded by a few row chunks and the event loop stays free.
+        """
         if not EXCEL_AVAILABLE:
             logger.error("Excel export not available")
             return None
         
         try:
-            # Create workbook
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.title = "Students Report"
-            
-            # Headers
-            headers = ['#', 'الاسم', 'البريد الإلكتروني', 'الهاتف', 'تاريخ التسجيل', 
-                      'آخر نشاط', 'الدورات المسجلة', 'الواجبات المسلمة', 'المعدل']
-            
-            # Style headers
-            header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-            header_font = Font(bold=True, color="FFFFFF", size=12)
-            
-            for col, header in enumerate(headers, 1):
-                cell = ws.cell(row=1, column=col, value=header)
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-            
-            # Get students
-            if course_id:
-                users = await User.find().to_list()
-                students = [u for u in users if u.has_approved_course(course_id)]
-            else:
-                students = await User.find().to_list()
-            
-            # Get all assignments
-            assignments = await Assignment.find().to_list()
-            
-            # Fill data
-            for idx, student in enumerate(students, 2):
-                # Calculate stats
-                enrolled_count = len([c for c in student.courses if c.approval_status == 'approved'])
-                
-                submitted_count = 0
-                grades = []
-                
-                for assignment in assignments:
-                    submission = assignment.get_submission(str(student.telegram_id))
-                    if submission:
-                        submitted_count += 1
-                        if submission.grade is not None:
-                            grades.append(submission.grade / assignment.max_grade * 100)
-                
-                avg_grade = sum(grades) / len(grades) if grades else 0
-                
-                # Write row
-                row_data = [
-                    idx - 1,
-                    student.full_name,
-                    student.email,
-                    student.phone,
-                    student.registered_at.strftime('%Y-%m-%d'),
-                    student.last_active.strftime('%Y-%m-%d'),
-                    enrolled_count,
-                    submitted_count,
-                    f"{avg_grade:.1f}%"
-                ]
-                
-                for col, value in enumerate(row_data, 1):
-                    cell = ws.cell(row=idx, column=col, value=value)
-                    cell.alignment = Alignment(horizontal='center', vertical='center')
+            buffer, count = await stream_to_excel(
+                student_export_rows(course_id),
+                title="Students Report",
+                headers=STUDENTS_HEADERS,
+                header_color="4472C4"
+            )
             
-            # Auto-adjust column widths
-            for col in range(1, len(headers) + 1):
-                ws.column_dimensions[get_column_letter(col)].width = 15
-            
-            # Save to BytesIO
-            buffer = io.BytesIO()
-            wb.save(buffer)
-            buffer.seek(0)
-            
-            logger.info(f"Excel report generated for {len(students)} students")
+            logger.info(f"Excel report generated for {count} students")
             return buffer
             
         except Exception as e:
@@ -162,7 +357,7 @@ class ReportGenerator:
                 if not assignment:
                     continue
                 
-                for submission in assignment.submissions:
+                for submission in await assignment.get_submissions():
                     user = await User.find_one(User.telegram_id == int(submission.user_id))
                     if not user:
                         continue
@@ -203,91 +398,68 @@ class ReportGenerator:
     
     @staticmethod
     async def generate_student_report_pdf(telegram_id: int) -> Optional[io.BytesIO]:
-        """Generate PDF report for individual student"""
+        """Generate PDF report for individual student (rendered in the PDF process pool)"""
         if not PDF_AVAILABLE:
             logger.error("PDF export not available")
             return None
         
         try:
-            buffer = io.BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=A4)
-            elements = []
-            styles = getSampleStyleSheet()
-            
-            # Get student data
-            user = await User.find_one(User.telegram_id == telegram_id)
-            if not user:
+            payload = await student_report_payload(telegram_id)
+            if not payload:
                 return None
             
-            # Title
-            title = Paragraph(f"<b>Student Report: {user.full_name}</b>", styles['Title'])
-            elements.append(title)
-            elements.append(Spacer(1, 20))
-            
-            # Student info table
-            info_data = [
-                ['Email:', user.email],
-                ['Phone:', user.phone],
-                ['Registered:', user.registered_at.strftime('%Y-%m-%d')],
-                ['Last Active:', user.last_active.strftime('%Y-%m-%d')]
-            ]
-            
-            info_table = Table(info_data, colWidths=[150, 350])
-            info_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            
-            elements.append(info_table)
-            elements.append(Spacer(1, 20))
+            buffer = io.BytesIO(await pdf_renderer.render_student_report(payload))
             
-            # Grades section
-            elements.append(Paragraph("<b>Grades Summary</b>", styles['Heading2']))
-            elements.append(Spacer(1, 10))
-            
-            # Get grades
-            assignments = await Assignment.find().to_list()
-            grades_data = [['Assignment', 'Score', 'Percentage', 'Status']]
+            logger.info(f"PDF report generated for user {telegram_id}")
+            return buffer
             
-            for assignment in assignments:
-                submission = assignment.get_submission(str(telegram_id))
-                if submission and submission.grade is not None:
-                    percentage = f"{submission.grade / assignment.max_grade * 100:.1f}%"
-                    status = "Passed" if submission.grade >= assignment.pass_grade else "Failed"
-                    grades_data.append([
-                        assignment.title,
-                        f"{submission.grade}/{assignment.max_grade}",
-                        percentage,
-                        status
-                    ])
+        except Exception as e:
+            logger.error(f"Error generating PDF report: {e}")
+            return None
+    
+    @staticmethod
+    async def generate_course_report_pack(course_id: str) -> Optional[Path]:
+        """
+        ZIP of the PDF reports of every approved student of a course, written
+        to a temporary file (the caller owns it; None if nothing to export).
+        Students are loaded with one query; their PDFs are rendered in
+        parallel by the PDF process pool, a window at a time, and appended to
+        the ZIP as each window finishes, so only one window of PDFs is ever
+        held in memory.
+        """
+        if not PDF_AVAILABLE:
+            logger.error("PDF export not available")
+            return None
+        
+        path = None
+        try:
+            students = await User.find_approved_in_course(course_id).sort(+User.full_name).to_list()
+            if not students:
+                return None
             
-            if len(grades_data) > 1:
-                grades_table = Table(grades_data, colWidths=[200, 80, 100, 80])
-                grades_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, -1), 10),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                ]))
-                elements.append(grades_table)
-            else:
-                elements.append(Paragraph("No graded assignments yet.", styles['Normal']))
+            fd, name = tempfile.mkstemp(prefix=f"pack_{course_id}_", suffix=".zip")
+            os.close(fd)
+            path = Path(name)
+            path.unlink()  # ZipFile creates it on the first append
             
-            # Build PDF
-            doc.build(elements)
-            buffer.seek(0)
+            window = max(pdf_renderer.workers * 2, PACK_RENDER_WINDOW)
+            rendered = 0
+            for start in range(0, len(students), window):
+                payloads = await student_report_payloads(students[start:start + window])
+                pdfs = await pdf_renderer.render_student_reports(payloads)
+                entries = [
+                    (_pack_entry_name(start + offset + 1, payload), pdf)
+                    for offset, (payload, pdf) in enumerate(zip(payloads, pdfs))
+                    if pdf is not None
+                ]
+                await asyncio.to_thread(_write_pack_entries, path, entries)
+                rendered += len(entries)
             
-            logger.info(f"PDF report generated for user {telegram_id}")
-            return buffer
+            logger.info(f"Course report pack for {course_id}: {rendered}/{len(students)} reports")
+            return path
             
         except Exception as e:
-            logger.error(f"Error generating PDF report: {e}")
+            logger.error(f"Error generating course report pack: {e}")
+            if path is not None:
+                path.unlink(missing_ok=True)
             return None
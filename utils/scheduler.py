@@ -0,0 +1,307 @@
+"""
+Durable Job Scheduler - cron schedules with a lease per job
+مجدول المهام الدائم - جداول cron مع حجز لكل مهمة
+"""
+import asyncio
+import os
+import socket
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set as SetType
+
+from beanie import UpdateResponse
+from beanie.operators import Inc, Max, Set
+from loguru import logger
+
+from database.models.scheduled_job import ScheduledJob
+
+
+class CronSchedule:
+    """
+    Minimal 5-field cron expression: minute hour day-of-month month day-of-week.
+    Fields accept *, numbers, ranges (a-b), steps (*/n, a-b/n) and lists.
+    Day-of-week is 0-6 with 0 = Sunday (7 is also Sunday). Times are UTC.
+    """
+
+    _RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Invalid cron expression: {expression!r}")
+
+        parsed = []
+        for field, (low, high) in zip(fields, self._RANGES):
+            parsed.append(self._parse_field(field, low, high))
+        self.minutes, self.hours, self.days, self.months, self.weekdays = parsed
+        if 7 in self.weekdays:
+            self.weekdays = (self.weekdays - {7}) | {0}
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int) -> SetType[int]:
+        values: SetType[int] = set()
+        for part in field.split(','):
+            step = 1
+            if '/' in part:
+                part, step_text = part.split('/', 1)
+                step = int(step_text)
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = (int(v) for v in part.split('-', 1))
+            else:
+                start = end = int(part)
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"Invalid cron field: {field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, day: datetime) -> bool:
+        if day.month not in self.months:
+            return False
+        day_ok = day.day in self.days
+        weekday_ok = (day.weekday() + 1) % 7 in self.weekdays
+        # Standard cron: if both fields are restricted, either may match
+        if not self._any_day and not self._any_weekday:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        """First matching time strictly after `after`"""
+        start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        for _ in range(366 * 5):
+            if self._day_matches(day):
+                for hour in sorted(self.hours):
+                    for minute in sorted(self.minutes):
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+    def runs_between(self, start: datetime, end: datetime, limit: int = 1000) -> int:
+        """Number of scheduled times in (start, end] (capped at `limit`)"""
+        count = 0
+        current = start
+        while count < limit:
+            current = self.next_after(current)
+            if current > end:
+                break
+            count += 1
+        return count
+
+
+@dataclass
+class _JobDefinition:
+    name: str
+    schedule: CronSchedule
+    func: Callable[[], Awaitable]
+
+
+class JobScheduler:
+    """
+    Runs registered jobs on cron schedules, persisted in scheduled_jobs.
+
+    - next_run_at survives restarts: a run missed while every replica was
+      down is executed once on startup (catch-up); the skipped schedule
+      slots are counted in missed_runs.
+    - Before running, a replica takes the job's lease with an atomic
+      update; other replicas skip it until the lease expires, so each run
+      happens once even with several server.py replicas.
+    - The lease is renewed while the job runs; a crashed replica's lease
+      expires and another replica picks the job up.
+    """
+
+    def __init__(self, lease_seconds: int = 300, poll_seconds: int = 60):
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._jobs: Dict[str, _JobDefinition] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, schedule: str, func: Callable[[], Awaitable]):
+        """Register a job to run on a cron schedule (UTC)"""
+        self._jobs[name] = _JobDefinition(name, CronSchedule(schedule), func)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        """Sync job definitions to the database and start the run loop"""
+        if self._task is not None and not self._task.done():
+            return
+        await self._sync_jobs()
+        self._task = asyncio.create_task(self._run_loop())
+        logger.info(f"Job scheduler started as {self.owner} ({len(self._jobs)} jobs)")
+
+    async def stop(self):
+        """Stop the run loop (a job in progress is cancelled; its lease expires)"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def run_forever(self):
+        """Start and block until cancelled"""
+        await self.start()
+        try:
+            await self._task
+        finally:
+            await self.stop()
+
+    async def _sync_jobs(self):
+        now = datetime.utcnow()
+        for job in self._jobs.values():
+            existing = await ScheduledJob.find_one(ScheduledJob.name == job.name)
+            if existing is None:
+                try:
+                    await ScheduledJob(
+                        name=job.name,
+                        schedule=job.schedule.expression,
+                        next_run_at=job.schedule.next_after(now),
+                    ).insert()
+                except Exception:
+                    # Another replica inserted it first (unique name)
+                    pass
+            elif existing.schedule != job.schedule.expression:
+                await ScheduledJob.find_one(ScheduledJob.name == job.name).update(
+                    Set({
+                        ScheduledJob.schedule: job.schedule.expression,
+                        ScheduledJob.next_run_at: job.schedule.next_after(now),
+                        ScheduledJob.updated_at: now,
+                    })
+                )
+
+    # ------------------------------------------------------------------
+    # Run loop
+    # ------------------------------------------------------------------
+
+    async def _run_loop(self):
+        while True:
+            try:
+                await self._run_due_jobs()
+                delay = await self._seconds_until_next_run()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job scheduler loop error: {repr(e)}")
+                delay = self.poll_seconds
+            await asyncio.sleep(delay)
+
+    async def _seconds_until_next_run(self) -> float:
+        upcoming = await ScheduledJob.find(
+            ScheduledJob.enabled == True,
+            {"name": {"$in": list(self._jobs)}}
+        ).sort(+ScheduledJob.next_run_at).first_or_none()
+        if upcoming is None:
+            return self.poll_seconds
+        seconds = (upcoming.next_run_at - datetime.utcnow()).total_seconds()
+        # Poll at least every poll_seconds to notice leases freed by other replicas
+        return min(max(seconds, 1), self.poll_seconds)
+
+    async def _run_due_jobs(self):
+        now = datetime.utcnow()
+        due = await ScheduledJob.find(
+            ScheduledJob.enabled == True,
+            ScheduledJob.next_run_at <= now,
+            {"name": {"$in": list(self._jobs)}}
+        ).to_list()
+        for state in due:
+            claimed = await self._claim(state.name, now)
+            if claimed is not None:
+                await self._execute(self._jobs[state.name], claimed)
+
+    async def _claim(self, name: str, now: datetime) -> Optional[ScheduledJob]:
+        """Atomically take the job's lease if it is due and not leased"""
+        return await ScheduledJob.find_one(
+            ScheduledJob.name == name,
+            ScheduledJob.enabled == True,
+            ScheduledJob.next_run_at <= now,
+            {"$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]},
+        ).update(
+            Set({
+                ScheduledJob.lease_owner: self.owner,
+                ScheduledJob.lease_until: now + timedelta(seconds=self.lease_seconds),
+            }),
+            response_type=UpdateResponse.NEW_DOCUMENT
+        )
+
+    async def _renew_lease(self, name: str):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await ScheduledJob.find_one(
+                ScheduledJob.name == name,
+                ScheduledJob.lease_owner == self.owner,
+            ).update(Set({
+                ScheduledJob.lease_until: datetime.utcnow() + timedelta(seconds=self.lease_seconds),
+            }))
+
+    async def _execute(self, job: _JobDefinition, state: ScheduledJob):
+        started_at = datetime.utcnow()
+        missed = job.schedule.runs_between(state.next_run_at, started_at)
+        delay_ms = int((started_at - state.next_run_at).total_seconds() * 1000)
+
+        if missed:
+            logger.info(f"Job {job.name}: catching up ({missed} missed runs coalesced)")
+
+        status, error = "success", None
+        renewer = asyncio.create_task(self._renew_lease(job.name))
+        start = time.perf_counter()
+        try:
+            await job.func()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            status, error = "failed", repr(e)
+            logger.error(f"Job {job.name} failed: {error}")
+        finally:
+            renewer.cancel()
+        duration_ms = int((time.perf_counter() - start) * 1000)
+        finished_at = datetime.utcnow()
+
+        await ScheduledJob.find_one(
+            ScheduledJob.name == job.name,
+            ScheduledJob.lease_owner == self.owner,
+        ).update(
+            Set({
+                ScheduledJob.next_run_at: job.schedule.next_after(finished_at),
+                ScheduledJob.lease_owner: None,
+                ScheduledJob.lease_until: None,
+                ScheduledJob.last_status: status,
+                ScheduledJob.last_error: error,
+                ScheduledJob.last_started_at: started_at,
+                ScheduledJob.last_finished_at: finished_at,
+                ScheduledJob.last_duration_ms: duration_ms,
+                ScheduledJob.last_delay_ms: delay_ms,
+                ScheduledJob.updated_at: finished_at,
+            }),
+            Inc({
+                ScheduledJob.run_count: 1,
+                ScheduledJob.failure_count: 1 if status == "failed" else 0,
+                ScheduledJob.total_duration_ms: duration_ms,
+                ScheduledJob.missed_runs: missed,
+            }),
+            Max({ScheduledJob.max_duration_ms: duration_ms})
+        )
+        logger.info(f"Job {job.name} {status} in {duration_ms} ms (started {delay_ms} ms late)")
+
+    # ------------------------------------------------------------------
+    # Monitoring
+    # ------------------------------------------------------------------
+
+    async def get_metrics(self) -> List[dict]:
+        """Per-job timing metrics"""
+        jobs = await ScheduledJob.find(
+            {"name": {"$in": list(self._jobs)}}
+        ).sort(+ScheduledJob.name).to_list()
+        return [job.to_metrics() for job in jobs]
@@ -4,9 +4,11 @@ Advanced Statistics System
 """
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
+from beanie.operators import In
 from database.models.user import User
-from database.models.assignment import Assignment
+from database.models.assignment import Assignment, AssignmentSubmission
 from database.models.notification import Notification
+from database.models.grade_summary import StudentGradeSummary
 from loguru import logger
 
 
@@ -17,80 +19,172 @@ class StatisticsManager:
     async def get_dashboard_stats() -> Dict:
         """Get comprehensive dashboard statistics"""
         try:
-            # User statistics
-            logger.debug("get_dashboard_stats: counting total users")
-            total_users = await User.find().count()
-            logger.debug(f"get_dashboard_stats: total_users={total_users}")
-            active_users = await User.find(
-                User.last_active > datetime.utcnow() - timedelta(days=7)
-            ).count()
-            logger.debug(f"get_dashboard_stats: active_users_last_7_days={active_users}")
-            new_users_this_week = await User.find(
-                User.registered_at > datetime.utcnow() - timedelta(days=7)
-            ).count()
-            logger.debug(f"get_dashboard_stats: new_users_this_week={new_users_this_week}")
-            
-            # Course enrollment stats
-            logger.debug("get_dashboard_stats: loading all users for enrollment stats")
-            users = await User.find().to_list()
-            logger.debug(f"get_dashboard_stats: loaded {len(users)} users for enrollment stats")
-            total_enrollments = sum(len(user.courses) for user in users)
-            approved_enrollments = sum(
-                len([c for c in user.courses if c.approval_status == "approved"])
-                for user in users
-            )
-            pending_enrollments = sum(
-                len([c for c in user.courses if c.approval_status == "pending"])
-                for user in users
-            )
-            
-            # Assignment stats
-            logger.debug("get_dashboard_stats: loading all assignments")
-            all_assignments = await Assignment.find().to_list()
-            logger.debug(f"get_dashboard_stats: loaded {len(all_assignments)} assignments")
-            total_assignments = len(all_assignments)
-            total_submissions = sum(len(a.submissions) for a in all_assignments)
-            graded_submissions = sum(
-                len([s for s in a.submissions if s.status == "graded"])
-                for a in all_assignments
-            )
-            
-            # Calculate average grade
-            all_grades = []
-            for assignment in all_assignments:
-                for submission in assignment.submissions:
-                    if submission.grade is not None:
-                        all_grades.append(submission.grade)
-            
-            average_grade = sum(all_grades) / len(all_grades) if all_grades else 0
-            
-            # Engagement rate
-            engagement_rate = (active_users / total_users * 100) if total_users > 0 else 0
-            
-            # Completion rate
-            completion_rate = (
-                graded_submissions / total_submissions * 100
-            ) if total_submissions > 0 else 0
-            
-            return {
-                'total_users': total_users,
-                'active_users': active_users,
-                'new_users_this_week': new_users_this_week,
-                'total_enrollments': total_enrollments,
-                'approved_enrollments': approved_enrollments,
-                'pending_enrollments': pending_enrollments,
-                'total_assignments': total_assignments,
-                'total_submissions': total_submissions,
-                'graded_submissions': graded_submissions,
-                'pending_grading': total_submissions - graded_submissions,
-                'average_grade': round(average_grade, 2),
-                'engagement_rate': round(engagement_rate, 2),
-                'completion_rate': round(completion_rate, 2)
-            }
+            return await StatisticsManager._dashboard_stats_aggregate()
+        except Exception as e:
+            logger.warning(f"Dashboard stats aggregation failed, using Python fallback: {e}")
+        
+        try:
+            return await StatisticsManager._dashboard_stats_python()
         except Exception as e:
             logger.error(f"Error getting dashboard stats: {e}")
             return {}
     
+    @staticmethod
+    def _build_dashboard_stats(
+        total_users: int,
+        active_users: int,
+        new_users_this_week: int,
+        enrollments_by_status: Dict[str, int],
+        total_assignments: int,
+        total_submissions: int,
+        graded_submissions: int,
+        average_grade: Optional[float]
+    ) -> Dict:
+        """Derive the dashboard stats dict from the raw counts"""
+        average_grade = average_grade or 0
+        
+        # Engagement rate
+        engagement_rate = (active_users / total_users * 100) if total_users > 0 else 0
+        
+        # Completion rate
+        completion_rate = (
+            graded_submissions / total_submissions * 100
+        ) if total_submissions > 0 else 0
+        
+        return {
+            'total_users': total_users,
+            'active_users': active_users,
+            'new_users_this_week': new_users_this_week,
+            'total_enrollments': sum(enrollments_by_status.values()),
+            'approved_enrollments': enrollments_by_status.get("approved", 0),
+            'pending_enrollments': enrollments_by_status.get("pending", 0),
+            'total_assignments': total_assignments,
+            'total_submissions': total_submissions,
+            'graded_submissions': graded_submissions,
+            'pending_grading': total_submissions - graded_submissions,
+            'average_grade': round(average_grade, 2),
+            'engagement_rate': round(engagement_rate, 2),
+            'completion_rate': round(completion_rate, 2)
+        }
+    
+    @staticmethod
+    async def _dashboard_stats_aggregate() -> Dict:
+        """Dashboard statistics computed by MongoDB aggregation pipelines"""
+        week_ago = datetime.utcnow() - timedelta(days=7)
+        
+        def _count(facet: List[Dict]) -> int:
+            return facet[0]['n'] if facet else 0
+        
+        # User and enrollment stats in one round trip
+        logger.debug("get_dashboard_stats: aggregating user stats")
+        users_result = await User.find().aggregate([
+            {'$facet': {
+                'total': [{'$count': 'n'}],
+                'active': [
+                    {'$match': {'last_active': {'$gt': week_ago}}},
+                    {'$count': 'n'},
+                ],
+                'new': [
+                    {'$match': {'registered_at': {'$gt': week_ago}}},
+                    {'$count': 'n'},
+                ],
+                'enrollments': [
+                    {'$unwind': '$courses'},
+                    {'$group': {'_id': '$courses.approval_status', 'n': {'$sum': 1}}},
+                ],
+            }}
+        ]).to_list()
+        users = users_result[0] if users_result else {}
+        
+        # Submission and grade stats in one round trip
+        logger.debug("get_dashboard_stats: aggregating submission stats")
+        submissions_result = await AssignmentSubmission.find().aggregate([
+            {'$facet': {
+                'total': [{'$count': 'n'}],
+                'graded': [
+                    {'$match': {'status': 'graded'}},
+                    {'$count': 'n'},
+                ],
+                'grades': [
+                    {'$match': {'grade': {'$ne': None}}},
+                    {'$group': {'_id': None, 'avg': {'$avg': '$grade'}}},
+                ],
+            }}
+        ]).to_list()
+        submissions = submissions_result[0] if submissions_result else {}
+        
+        total_assignments = await Assignment.find().count()
+        
+        grades = submissions.get('grades') or []
+        stats = StatisticsManager._build_dashboard_stats(
+            total_users=_count(users.get('total')),
+            active_users=_count(users.get('active')),
+            new_users_this_week=_count(users.get('new')),
+            enrollments_by_status={
+                row['_id']: row['n'] for row in users.get('enrollments') or []
+            },
+            total_assignments=total_assignments,
+            total_submissions=_count(submissions.get('total')),
+            graded_submissions=_count(submissions.get('graded')),
+            average_grade=grades[0]['avg'] if grades else None
+        )
+        logger.debug(f"get_dashboard_stats: {stats}")
+        return stats
+    
+    @staticmethod
+    async def _dashboard_stats_python() -> Dict:
+        """Dashboard statistics computed in Python (fallback)"""
+        # User statistics
+        logger.debug("get_dashboard_stats: counting total users")
+        total_users = await User.find().count()
+        logger.debug(f"get_dashboard_stats: total_users={total_users}")
+        active_users = await User.find(
+            User.last_active > datetime.utcnow() - timedelta(days=7)
+        ).count()
+        logger.debug(f"get_dashboard_stats: active_users_last_7_days={active_users}")
+        new_users_this_week = await User.find(
+            User.registered_at > datetime.utcnow() - timedelta(days=7)
+        ).count()
+        logger.debug(f"get_dashboard_stats: new_users_this_week={new_users_this_week}")
+        
+        # Course enrollment stats
+        logger.debug("get_dashboard_stats: loading all users for enrollment stats")
+        users = await User.find().to_list()
+        logger.debug(f"get_dashboard_stats: loaded {len(users)} users for enrollment stats")
+        enrollments_by_status: Dict[str, int] = {}
+        for user in users:
+            for course in user.courses:
+                status = course.approval_status
+                enrollments_by_status[status] = enrollments_by_status.get(status, 0) + 1
+        
+        # Assignment stats
+        logger.debug("get_dashboard_stats: counting assignments and submissions")
+        total_assignments = await Assignment.find().count()
+        total_submissions = await AssignmentSubmission.find().count()
+        graded_submissions = await AssignmentSubmission.find(
+            AssignmentSubmission.status == "graded"
+        ).count()
+        logger.debug(
+            f"get_dashboard_stats: assignments={total_assignments}, "
+            f"submissions={total_submissions}, graded={graded_submissions}"
+        )
+        
+        # Calculate average grade
+        average_grade = await AssignmentSubmission.find(
+            AssignmentSubmission.grade != None  # noqa: E711
+        ).avg(AssignmentSubmission.grade)
+        
+        return StatisticsManager._build_dashboard_stats(
+            total_users=total_users,
+            active_users=active_users,
+            new_users_this_week=new_users_this_week,
+            enrollments_by_status=enrollments_by_status,
+            total_assignments=total_assignments,
+            total_submissions=total_submissions,
+            graded_submissions=graded_submissions,
+            average_grade=average_grade
+        )
+    
     @staticmethod
     async def get_student_stats(telegram_id: int) -> Dict:
         """Get individual student statistics"""
@@ -101,18 +195,23 @@ class StatisticsManager:
                 return {}
             
             # Get all assignments with this student's submissions
-            logger.debug("get_student_stats: loading all assignments")
-            all_assignments = await Assignment.find().to_list()
-            logger.debug(f"get_student_stats: loaded {len(all_assignments)} assignments")
-            student_assignments = []
-            
-            for assignment in all_assignments:
-                submission = assignment.get_submission(str(telegram_id))
-                if submission:
-                    student_assignments.append({
-                        'assignment': assignment,
-                        'submission': submission
-                    })
+            logger.debug("get_student_stats: loading student's submissions")
+            submissions = await AssignmentSubmission.find(
+                AssignmentSubmission.user_id == str(telegram_id)
+            ).to_list()
+            logger.debug(f"get_student_stats: loaded {len(submissions)} submissions")
+            assignments = await Assignment.find(
+                In(Assignment.id, list({s.assignment_id for s in submissions}))
+            ).to_list() if submissions else []
+            assignments_by_id = {a.id: a for a in assignments}
+            student_assignments = [
+                {
+                    'assignment': assignments_by_id[submission.assignment_id],
+                    'submission': submission
+                }
+                for submission in submissions
+                if submission.assignment_id in assignments_by_id
+            ]
             
             # Calculate stats
             total_assignments = len(student_assignments)
@@ -170,11 +269,12 @@ class StatisticsManager:
             if not assignment:
                 return {}
             
-            total_submissions = len(assignment.submissions)
-            graded = len([s for s in assignment.submissions if s.status == 'graded'])
+            submissions = await assignment.get_submissions()
+            total_submissions = len(submissions)
+            graded = len([s for s in submissions if s.status == 'graded'])
             pending = total_submissions - graded
             
-            grades = [s.grade for s in assignment.submissions if s.grade is not None]
+            grades = [s.grade for s in submissions if s.grade is not None]
             
             if grades:
                 average_grade = sum(grades) / len(grades)
@@ -193,7 +293,7 @@ class StatisticsManager:
             on_time = 0
             late = 0
             
-            for submission in assignment.submissions:
+            for submission in submissions:
                 if assignment.deadline:
                     if submission.submitted_at <= assignment.deadline:
                         on_time += 1
@@ -222,36 +322,29 @@ class StatisticsManager:
     async def get_top_students(limit: int = 10) -> List[Dict]:
         """Get top performing students"""
         try:
-            logger.debug("get_top_students: loading all users")
-            users = await User.find().to_list()
-            logger.debug(f"get_top_students: loaded {len(users)} users")
-            logger.debug("get_top_students: loading all assignments")
-            all_assignments = await Assignment.find().to_list()
-            logger.debug(f"get_top_students: loaded {len(all_assignments)} assignments")
+            logger.debug(f"get_top_students: loading top {limit} grade summaries")
+            summaries = await StudentGradeSummary.get_leaderboard(limit)
+            telegram_ids = [int(s.user_id) for s in summaries if s.user_id.isdigit()]
+            users = await User.find(In(User.telegram_id, telegram_ids)).to_list() if telegram_ids else []
+            users_by_id = {str(u.telegram_id): u for u in users}
+            logger.debug(f"get_top_students: loaded {len(summaries)} summaries, {len(users)} users")
             
             student_performances = []
             
-            for user in users:
-                grades = []
-                for assignment in all_assignments:
-                    submission = assignment.get_submission(str(user.telegram_id))
-                    if submission and submission.grade is not None:
-                        grades.append(submission.grade)
+            for summary in summaries:
+                user = users_by_id.get(summary.user_id)
+                if not user:
+                    continue
                 
-                if grades:
-                    avg_grade = sum(grades) / len(grades)
-                    student_performances.append({
-                        'telegram_id': user.telegram_id,
-                        'full_name': user.full_name,
-                        'email': user.email,
-                        'average_grade': round(avg_grade, 2),
-                        'total_assignments': len(grades)
-                    })
-            
-            # Sort by average grade
-            student_performances.sort(key=lambda x: x['average_grade'], reverse=True)
-            
-            return student_performances[:limit]
+                student_performances.append({
+                    'telegram_id': user.telegram_id,
+                    'full_name': user.full_name,
+                    'email': user.email,
+                    'average_grade': round(summary.average_grade, 2),
+                    'total_assignments': summary.graded_count
+                })
+            
+            return student_performances
         except Exception as e:
             logger.error(f"Error getting top students: {e}")
             return []
@@ -279,9 +372,11 @@ class StatisticsManager:
                     daily_registrations[date_key] += 1
             
             # Get daily submissions
-            logger.debug("get_activity_chart_data: loading all assignments for submissions chart")
-            all_assignments = await Assignment.find().to_list()
-            logger.debug(f"get_activity_chart_data: loaded {len(all_assignments)} assignments for submissions chart")
+            logger.debug(f"get_activity_chart_data: loading submissions after {start_date}")
+            submissions = await AssignmentSubmission.find(
+                AssignmentSubmission.submitted_at > start_date
+            ).to_list()
+            logger.debug(f"get_activity_chart_data: loaded {len(submissions)} submissions for submissions chart")
             daily_submissions = {}
             
             for i in range(days):
@@ -289,11 +384,10 @@ class StatisticsManager:
                 date_key = date.strftime('%Y-%m-%d')
                 daily_submissions[date_key] = 0
             
-            for assignment in all_assignments:
-                for submission in assignment.submissions:
-                    date_key = submission.submitted_at.strftime('%Y-%m-%d')
-                    if date_key in daily_submissions:
-                        daily_submissions[date_key] += 1
+            for submission in submissions:
+                date_key = submission.submitted_at.strftime('%Y-%m-%d')
+                if date_key in daily_submissions:
+                    daily_submissions[date_key] += 1
             
             return {
                 'labels': list(daily_registrations.keys()),
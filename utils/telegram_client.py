@@ -0,0 +1,151 @@
+"""
+Shared Telegram HTTP Client - one pooled keep-alive client per process
+عميل HTTP مشترك لـ Telegram - اتصالات دائمة ومجمعة لكل العملية
+"""
+import asyncio
+from typing import Any, Dict, Optional
+
+import httpx
+from loguru import logger
+
+from config.settings import settings
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+    logger.debug("h2 not installed - Telegram client will use HTTP/1.1")
+
+
+TELEGRAM_API_URL = "https://api.telegram.org"
+
+
+class TelegramClient:
+    """
+    Process-wide httpx.AsyncClient for Bot API calls made outside the bot
+    application (notifications, dashboard approvals, grading).
+
+    Connections are kept alive and reused across requests. The client is
+    created lazily on first use, so scripts and serverless handlers work
+    without calling start(); long-running servers call start()/close()
+    from their startup/shutdown hooks.
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+        # Pool metrics
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests_total = 0
+        self.errors_total = 0
+        self.saturated_total = 0  # requests that had to wait for a free connection
+        self.pool_timeouts = 0
+
+    @property
+    def max_connections(self) -> int:
+        return settings.TELEGRAM_HTTP_MAX_CONNECTIONS
+
+    def _create_client(self) -> httpx.AsyncClient:
+        http2 = settings.TELEGRAM_HTTP2 and HTTP2_AVAILABLE
+        limits = httpx.Limits(
+            max_connections=settings.TELEGRAM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.TELEGRAM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.TELEGRAM_HTTP_KEEPALIVE_EXPIRY,
+        )
+        timeout = httpx.Timeout(
+            settings.TELEGRAM_HTTP_TIMEOUT,
+            pool=settings.TELEGRAM_HTTP_POOL_TIMEOUT,
+        )
+        logger.info(
+            f"TelegramClient: creating pooled client "
+            f"(max_connections={limits.max_connections}, http2={http2})"
+        )
+        return httpx.AsyncClient(
+            base_url=f"{TELEGRAM_API_URL}/bot{settings.TELEGRAM_BOT_TOKEN}",
+            limits=limits,
+            timeout=timeout,
+            http2=http2,
+        )
+
+    async def start(self) -> httpx.AsyncClient:
+        """Create the shared client (idempotent)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Connections cannot be shared across event loops (e.g. separate
+            # asyncio.run() calls in scripts); start a fresh pool
+            self._client = None
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        if self._client is not None and not self._client.is_closed:
+            return self._client
+        async with self._lock:
+            if self._client is None or self._client.is_closed:
+                self._client = self._create_client()
+        return self._client
+
+    async def close(self):
+        """Close the shared client and its connections"""
+        client, self._client = self._client, None
+        if client is not None and not client.is_closed:
+            await client.aclose()
+            logger.info(f"TelegramClient: closed ({self.stats()})")
+
+    async def call(self, method: str, payload: Dict[str, Any], **kwargs) -> httpx.Response:
+        """Call a Bot API method (e.g. "sendMessage") with a JSON payload"""
+        client = await self.start()
+
+        if self.in_flight >= self.max_connections:
+            self.saturated_total += 1
+            logger.debug(
+                f"TelegramClient: pool saturated ({self.in_flight}/{self.max_connections} in flight)"
+            )
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self.requests_total += 1
+        try:
+            return await client.post(f"/{method}", json=payload, **kwargs)
+        except httpx.PoolTimeout:
+            self.pool_timeouts += 1
+            self.errors_total += 1
+            logger.warning(f"TelegramClient: pool timeout calling {method}")
+            raise
+        except Exception:
+            self.errors_total += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    async def send_message(
+        self,
+        chat_id: int,
+        text: str,
+        parse_mode: Optional[str] = "Markdown",
+        **fields: Any
+    ) -> httpx.Response:
+        """Send a text message"""
+        payload = {"chat_id": chat_id, "text": text, **fields}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+        return await self.call("sendMessage", payload)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool usage metrics"""
+        return {
+            "open": self._client is not None and not self._client.is_closed,
+            "http2": settings.TELEGRAM_HTTP2 and HTTP2_AVAILABLE,
+            "max_connections": self.max_connections,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+            "saturated_total": self.saturated_total,
+            "pool_timeouts": self.pool_timeouts,
+        }
+
+
+# Shared instance
+telegram_client = TelegramClient()
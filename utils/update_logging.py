@@ -0,0 +1,91 @@
+"""
+Update Logging - lazy, sampled and PII-redacted logging of incoming updates
+تسجيل التحديثات - تسجيل كسول بالعينات مع إخفاء البيانات الشخصية
+"""
+import re
+from typing import Any, Dict
+
+from loguru import logger
+
+from config.settings import settings
+
+
+# Fields whose values are always hidden
+REDACTED_FIELDS = {"phone_number", "email", "vcard", "last_name"}
+
+# Free text may contain what students type during registration
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+PHONE_PATTERN = re.compile(r"\+?\d[\d\s-]{6,}\d")
+
+REDACTED = "***"
+
+
+def redact(value: Any) -> Any:
+    """Copy of a JSON-like value with phone numbers and emails masked"""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if key in REDACTED_FIELDS and item else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    if isinstance(value, str):
+        return PHONE_PATTERN.sub(REDACTED, EMAIL_PATTERN.sub(REDACTED, value))
+    return value
+
+
+class UpdateLogger:
+    """
+    Logs 1 in `sample_rate` updates at `level`, only when `enabled`.
+
+    loguru's default stderr sink accepts DEBUG, so the level alone does not
+    keep updates from being serialized; `enabled` (settings.DEBUG) does.
+    When enabled, serialization (to_dict, redaction, formatting) runs inside
+    loguru's lazy evaluation, so it only happens when a sink accepts the
+    level. Disabled, an update costs one counter increment.
+    """
+
+    def __init__(self, sample_rate: int = 1, level: str = "DEBUG", enabled: bool = True):
+        self.sample_rate = max(1, sample_rate)
+        self.level = level
+        self.enabled = enabled
+
+        # Metrics
+        self.seen_total = 0
+        self.sampled_out = 0  # skipped by sampling
+        self.emitted_total = 0  # serialized and handed to a sink
+
+    def log(self, update: Any, source: str = "update"):
+        """Log an Update (or a raw update dict) if it falls in the sample"""
+        self.seen_total += 1
+        if not self.enabled or self.seen_total % self.sample_rate:
+            self.sampled_out += 1
+            return
+        logger.opt(lazy=True).log(
+            self.level, "Incoming {}: {}", lambda: source, lambda: self._serialize(update)
+        )
+
+    def _serialize(self, update: Any) -> Dict[str, Any]:
+        self.emitted_total += 1
+        try:
+            data = update if isinstance(update, dict) else update.to_dict()
+        except Exception as e:
+            return {"unserializable": type(update).__name__, "error": str(e)}
+        return redact(data)
+
+    def stats(self) -> Dict[str, Any]:
+        sampled = self.seen_total - self.sampled_out
+        return {
+            "enabled": self.enabled,
+            "level": self.level,
+            "sample_rate": self.sample_rate,
+            "seen_total": self.seen_total,
+            "sampled_out": self.sampled_out,  # or skipped while disabled
+            "emitted_total": self.emitted_total,
+            # In the sample but below every sink's level
+            "dropped_by_level": sampled - self.emitted_total,
+        }
+
+
+# Shared instance
+update_logger = UpdateLogger(sample_rate=settings.UPDATE_LOG_SAMPLE_RATE, enabled=settings.DEBUG)
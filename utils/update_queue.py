@@ -0,0 +1,227 @@
+"""
+Webhook Ingestion Queue - acknowledge Telegram updates immediately
+طابور استقبال التحديثات - الرد على Telegram فوراً ومعالجة التحديثات في الخلفية
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Tuple
+
+from loguru import logger
+
+from config.settings import settings
+from utils.json_store import DATA_DIR, JsonDocumentStore
+
+
+def update_chat_key(data: Dict[str, Any]) -> Hashable:
+    """
+    Ordering key of a raw update: its chat id, else the sender's id.
+    Updates without either (polls, chat boosts...) get their own key and
+    are not ordered against anything.
+    """
+    for field, value in data.items():
+        if field == "update_id" or not isinstance(value, dict):
+            continue
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if chat and "id" in chat:
+            return chat["id"]
+        sender = value.get("from") or value.get("user")
+        if sender and "id" in sender:
+            return sender["id"]
+    return ("update", data.get("update_id"))
+
+
+class UpdateIngestionQueue:
+    """
+    Bounded in-process queue between the webhook endpoint and the bot.
+
+    - enqueue() only validates and stores the update, so the webhook answers
+      in milliseconds regardless of how long handlers take.
+    - Updates are kept in one lane per chat. A lane is handed to at most one
+      worker at a time and its updates are processed in arrival order, so a
+      chat's updates never overtake each other while different chats run in
+      parallel on `workers` tasks. After each update the lane goes back to
+      the end of the ready queue, so a busy chat cannot starve the others.
+    - At most `maxsize` updates wait at once; beyond that enqueue() returns
+      False and the webhook answers 503 so Telegram redelivers later.
+    - With `persist`, updates are journaled to data/webhook_updates.json
+      until processed and replayed on the next start (an update interrupted
+      mid-processing may be handled twice).
+    """
+
+    def __init__(self, maxsize: int, workers: int, persist: bool = False):
+        self.maxsize = maxsize
+        self.workers = workers
+        self.journal: Optional[JsonDocumentStore] = (
+            JsonDocumentStore(DATA_DIR / "webhook_updates.json", key_fields=("update_id",))
+            if persist else None
+        )
+
+        self._process: Optional[Callable[[Dict[str, Any]], Awaitable]] = None
+        self._lanes: Dict[Hashable, Deque[Tuple[float, Dict[str, Any]]]] = {}
+        self._ready: Optional[asyncio.Queue] = None
+        self._tasks: list = []
+
+        # Metrics
+        self.pending = 0
+        self.peak_pending = 0
+        self.accepted_total = 0
+        self.rejected_total = 0
+        self.processed_total = 0
+        self.failed_total = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.total_processing_ms = 0.0
+        self.max_processing_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self, process: Callable[[Dict[str, Any]], Awaitable]):
+        """Start the workers; `process` handles one raw update dict"""
+        if self.running:
+            return
+        self._process = process
+        self._ready = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        replayed = await self._replay_journal()
+        logger.info(
+            f"UpdateIngestionQueue: started {self.workers} workers "
+            f"(maxsize={self.maxsize}, persist={self.journal is not None}, replayed={replayed})"
+        )
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """Let queued updates finish for up to `drain_timeout` seconds, then stop"""
+        if not self.running:
+            return
+        deadline = time.monotonic() + drain_timeout
+        while self.pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self.pending:
+            logger.warning(f"UpdateIngestionQueue: stopping with {self.pending} updates pending")
+
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._lanes.clear()
+        self.pending = 0
+        if self.journal is not None:
+            await self.journal.close()
+
+    async def _replay_journal(self) -> int:
+        if self.journal is None:
+            return 0
+        records = sorted(await self.journal.all(), key=lambda r: r["update_id"])
+        for record in records:
+            self._push(record["data"])
+        return len(records)
+
+    # ------------------------------------------------------------------
+    # Ingestion
+    # ------------------------------------------------------------------
+
+    async def enqueue(self, data: Dict[str, Any]) -> bool:
+        """Queue a raw update; False if the queue is full"""
+        if self.pending >= self.maxsize:
+            self.rejected_total += 1
+            logger.warning(f"UpdateIngestionQueue: full ({self.pending}), rejecting update {data.get('update_id')}")
+            return False
+        if self.journal is not None:
+            await self.journal.put({"update_id": data["update_id"], "data": data})
+        self._push(data)
+        self.accepted_total += 1
+        return True
+
+    def _push(self, data: Dict[str, Any]):
+        key = update_chat_key(data)
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = deque()
+            self._ready.put_nowait(key)
+        lane.append((time.monotonic(), data))
+        self.pending += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    async def _worker(self, number: int):
+        while True:
+            key = await self._ready.get()
+            lane = self._lanes[key]
+            enqueued_at, data = lane.popleft()
+
+            started = time.monotonic()
+            wait_ms = (started - enqueued_at) * 1000
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            try:
+                await self._process(data)
+                self.processed_total += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed_total += 1
+                logger.error(
+                    f"UpdateIngestionQueue: update {data.get('update_id')} failed: {repr(e)}",
+                    exc_info=True
+                )
+            finally:
+                processing_ms = (time.monotonic() - started) * 1000
+                self.total_processing_ms += processing_ms
+                self.max_processing_ms = max(self.max_processing_ms, processing_ms)
+                self.pending -= 1
+
+                # Hand the lane back (at the end of the line) or drop it
+                if lane:
+                    self._ready.put_nowait(key)
+                else:
+                    self._lanes.pop(key, None)
+
+            if self.journal is not None:
+                try:
+                    await self.journal.delete(data["update_id"])
+                except Exception as e:
+                    logger.error(f"UpdateIngestionQueue: journal delete failed: {repr(e)}")
+
+    # ------------------------------------------------------------------
+    # Monitoring
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and latency metrics"""
+        done = self.processed_total + self.failed_total
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "maxsize": self.maxsize,
+            "persist": self.journal is not None,
+            "pending": self.pending,
+            "peak_pending": self.peak_pending,
+            "active_chats": len(self._lanes),
+            "accepted_total": self.accepted_total,
+            "rejected_total": self.rejected_total,
+            "processed_total": self.processed_total,
+            "failed_total": self.failed_total,
+            "avg_wait_ms": round(self.total_wait_ms / done, 1) if done else None,
+            "max_wait_ms": round(self.max_wait_ms, 1),
+            "avg_processing_ms": round(self.total_processing_ms / done, 1) if done else None,
+            "max_processing_ms": round(self.max_processing_ms, 1),
+        }
+
+
+# Shared instance
+update_queue = UpdateIngestionQueue(
+    maxsize=settings.WEBHOOK_QUEUE_MAXSIZE,
+    workers=settings.WEBHOOK_QUEUE_WORKERS,
+    persist=settings.WEBHOOK_QUEUE_PERSIST,
+)
@@ -0,0 +1,115 @@
+"""
+User Session Cache - short-lived cache of User documents per telegram_id
+ذاكرة مؤقتة للمستخدمين - تخزين مؤقت قصير لمستندات المستخدمين
+"""
+import functools
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+from config.settings import settings
+from database.models.user import User
+
+
+class UserCache:
+    """
+    Caches User documents (and "not registered" results) by telegram_id for
+    `ttl` seconds, so a navigation sequence (course -> videos -> assignments)
+    loads the user once instead of on every callback.
+
+    Entries are dropped whenever the document is inserted, saved, replaced
+    or deleted in this process (User event hooks), so enrollments and
+    approvals made by the bot or the mounted dashboard are seen at once.
+    Writes from another process are picked up when the entry expires; an
+    access check that fails on a cached user is re-checked against the
+    database before access is denied (see with_user).
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, Tuple[float, Optional[User]]]" = OrderedDict()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(self, telegram_id: int, refresh: bool = False) -> Optional[User]:
+        """User by telegram_id (None if not registered)"""
+        now = time.monotonic()
+        entry = self._entries.get(telegram_id)
+        if entry is not None and not refresh and now - entry[0] < self.ttl:
+            self._entries.move_to_end(telegram_id)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        user = await User.find_one(User.telegram_id == telegram_id)
+        self._entries[telegram_id] = (now, user)
+        self._entries.move_to_end(telegram_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, telegram_id: int):
+        if self._entries.pop(telegram_id, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "invalidations": self.invalidations,
+        }
+
+
+# Shared instance
+user_cache = UserCache(ttl=settings.USER_CACHE_TTL_SECONDS, max_size=settings.USER_CACHE_MAX_SIZE)
+
+
+def with_user(course_prefix: Optional[str] = None, denied_text: str = "❌ ليس لديك صلاحية الوصول لهذا المحتوى"):
+    """
+    Decorator for callback handlers: loads the user through the cache and
+    calls `handler(update, context, user)`.
+
+    With `course_prefix`, the course id is the callback data without the
+    prefix and the user must have approved access to it; otherwise the
+    query is answered with `denied_text` and the handler is not called.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(update, context, *args, **kwargs):
+            query = update.callback_query
+            telegram_id = update.effective_user.id
+            try:
+                user = await user_cache.get(telegram_id)
+                if course_prefix is not None:
+                    course_id = query.data.replace(course_prefix, "")
+                    if not user or not user.has_approved_course(course_id):
+                        # The cached copy may predate an approval made elsewhere
+                        user = await user_cache.get(telegram_id, refresh=True)
+            except Exception as db_error:
+                logger.error(f"Database error while fetching user {telegram_id}: {repr(db_error)}")
+                await query.answer()
+                await query.message.reply_text("❌ خطأ في قاعدة البيانات. يرجى المحاولة لاحقاً.")
+                return
+
+            if course_prefix is not None and (not user or not user.has_approved_course(course_id)):
+                logger.warning(f"User {telegram_id} attempted to access {query.data} without approval")
+                await query.answer()
+                await query.message.reply_text(denied_text)
+                return
+
+            return await func(update, context, user, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,118 @@
+"""
+Webhook Guard - secret-token verification and duplicate update filtering
+حماية الـ Webhook - التحقق من الرمز السري وتجاهل التحديثات المكررة
+"""
+import hmac
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from loguru import logger
+from pymongo.errors import DuplicateKeyError
+
+from config.settings import settings
+from database.models.processed_update import PROCESSED_UPDATE_TTL_SECONDS, ProcessedUpdate
+
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def verify_secret_token(header_value: Optional[str]) -> bool:
+    """
+    True if the request carries the secret token given to set_webhook.
+    Without WEBHOOK_SECRET_TOKEN every request is accepted.
+    """
+    expected = settings.WEBHOOK_SECRET_TOKEN
+    if not expected:
+        return True
+    return hmac.compare_digest((header_value or "").encode(), expected.encode())
+
+
+class UpdateDeduplicator:
+    """
+    Remembers recently received update_ids so Telegram redeliveries (after a
+    timeout or a 5xx) are dropped before any handler runs.
+
+    - Each process keeps an LRU of `max_size` ids, each expiring after `ttl`.
+    - With `shared`, ids are also inserted into the processed_updates
+      collection (unique update_id, TTL index), so a redelivery that lands on
+      another replica is dropped too. If MongoDB is unavailable the check
+      falls back to the local cache rather than rejecting updates.
+    """
+
+    def __init__(self, max_size: int, ttl: float, shared: bool = True):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared = shared
+        self._seen: "OrderedDict[int, float]" = OrderedDict()
+
+        # Metrics
+        self.accepted_total = 0
+        self.duplicates_local = 0
+        self.duplicates_shared = 0
+        self.shared_errors = 0
+
+    def _seen_locally(self, update_id: int, now: float) -> bool:
+        seen_at = self._seen.get(update_id)
+        if seen_at is None:
+            return False
+        if now - seen_at > self.ttl:
+            del self._seen[update_id]
+            return False
+        self._seen.move_to_end(update_id)
+        return True
+
+    def _remember(self, update_id: int, now: float):
+        self._seen[update_id] = now
+        self._seen.move_to_end(update_id)
+        while len(self._seen) > self.max_size:
+            self._seen.popitem(last=False)
+
+    async def claim(self, update_id: int) -> bool:
+        """Record the update; False if it was already received"""
+        now = time.monotonic()
+        if self._seen_locally(update_id, now):
+            self.duplicates_local += 1
+            return False
+        self._remember(update_id, now)
+
+        if self.shared:
+            try:
+                await ProcessedUpdate(update_id=update_id).insert()
+            except DuplicateKeyError:
+                self.duplicates_shared += 1
+                return False
+            except Exception as e:
+                self.shared_errors += 1
+                logger.warning(f"UpdateDeduplicator: shared check failed for {update_id}: {repr(e)}")
+
+        self.accepted_total += 1
+        return True
+
+    async def release(self, update_id: int):
+        """Forget a claimed update so its redelivery is accepted (e.g. queue full)"""
+        self._seen.pop(update_id, None)
+        if self.shared:
+            try:
+                await ProcessedUpdate.find_one(ProcessedUpdate.update_id == update_id).delete()
+            except Exception as e:
+                logger.warning(f"UpdateDeduplicator: failed to release {update_id}: {repr(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "secret_token": bool(settings.WEBHOOK_SECRET_TOKEN),
+            "shared": self.shared,
+            "cached_ids": len(self._seen),
+            "accepted_total": self.accepted_total,
+            "duplicates_local": self.duplicates_local,
+            "duplicates_shared": self.duplicates_shared,
+            "shared_errors": self.shared_errors,
+        }
+
+
+# Shared instance
+update_deduplicator = UpdateDeduplicator(
+    max_size=settings.WEBHOOK_DEDUP_CACHE_SIZE,
+    ttl=PROCESSED_UPDATE_TTL_SECONDS,
+    shared=settings.WEBHOOK_DEDUP_SHARED,
+)